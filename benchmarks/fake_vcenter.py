@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# coding=utf-8
+#
+# Copyright © 2015-2016 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the X11 (MIT) (the “License”) set forth below;
+#
+# you may not use this file except in compliance with the License. Unless required by applicable law or agreed to in
+# writing, software distributed under the License is distributed on an “AS IS” BASIS, without warranties or conditions
+# of any kind, EITHER EXPRESS OR IMPLIED. See the License for the specific language governing permissions and
+# limitations under the License. Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# "THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.”
+
+"""
+Fake vCenter inventory for the benchmarks, answering the PropertyCollector RetrievePropertiesEx calls of
+retrieve_properties with the hosts served by the mock NSX Manager
+"""
+
+__author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
+
+from pyVmomi import vim
+
+
+class FakeManagedObject(object):
+    def __init__(self, moid):
+        self._moId = moid
+
+    def __eq__(self, other):
+        return isinstance(other, FakeManagedObject) and other._moId == self._moId
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._moId)
+
+    def __repr__(self):
+        return "'{}'".format(self._moId)
+
+
+class _Record(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class _FakeView(vim.view.ContainerView):
+    # a real managed object type, as the PropertyCollector specs built by retrieve_properties are type checked
+    def __init__(self):
+        vim.view.ContainerView.__init__(self, 'session[benchmark]view')
+
+    def Destroy(self):
+        pass
+
+
+class _FakeViewManager(object):
+    def CreateContainerView(self, container, types, recursive):
+        return _FakeView()
+
+
+class _FakePropertyCollector(object):
+    def __init__(self, objects):
+        self._objects = objects
+        self._pending = {}
+        self.calls = 0
+
+    def _page(self, records, max_objects):
+        self.calls += 1
+        token = None
+        if max_objects and len(records) > max_objects:
+            token = str(len(self._pending) + 1)
+            self._pending[token] = (records[max_objects:], max_objects)
+            records = records[:max_objects]
+        return _Record(objects=records, token=token)
+
+    def RetrievePropertiesEx(self, specs, options):
+        records = []
+        for spec in specs:
+            for property_spec in spec.propSet:
+                for managed_object, properties in self._objects.get(property_spec.type, []):
+                    prop_set = [_Record(name=path, val=properties[path]) for path in property_spec.pathSet
+                                if path in properties]
+                    records.append(_Record(obj=managed_object, propSet=prop_set))
+        return self._page(records, options.maxObjects)
+
+    def ContinueRetrievePropertiesEx(self, token):
+        records, max_objects = self._pending.pop(token)
+        return self._page(records, max_objects)
+
+
+class FakeVcContent(object):
+    """
+    Stands in for the vCenter content, holding scale hosts with the moids of the mock NSX Manager hosts
+    """
+    def __init__(self, scale, vms_per_host=10):
+        hosts = [(FakeManagedObject('host-{}'.format(index)),
+                  {'name': 'esx{}.local'.format(index), 'hardware.cpuInfo.numCpuPackages': 2,
+                   'vm': [FakeManagedObject('vm-{}-{}'.format(index, vm)) for vm in range(vms_per_host)]})
+                 for index in range(scale)]
+        self.rootFolder = FakeManagedObject('group-d1')
+        self.viewManager = _FakeViewManager()
+        self.propertyCollector = _FakePropertyCollector({vim.HostSystem: hosts})
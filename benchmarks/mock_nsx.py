@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# coding=utf-8
+#
+# Copyright © 2015-2016 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the X11 (MIT) (the “License”) set forth below;
+#
+# you may not use this file except in compliance with the License. Unless required by applicable law or agreed to in
+# writing, software distributed under the License is distributed on an “AS IS” BASIS, without warranties or conditions
+# of any kind, EITHER EXPRESS OR IMPLIED. See the License for the specific language governing permissions and
+# limitations under the License. Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# "THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.”
+
+"""
+Local stand-in of the NSX Manager REST API for the benchmarks. It serves generated paginated edges, logical switches
+and host preparation status as XML over https, with an injected latency per request and a count of the requests
+per resource
+
+    python benchmarks/mock_nsx.py --scale 1000 --latency 20
+"""
+
+__author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
+
+import argparse
+import BaseHTTPServer
+import os
+import re
+import shutil
+import SocketServer
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+import urlparse
+from collections import Counter
+from xml.sax.saxutils import escape
+
+EDGE_PAGE_SIZE = 256
+VIRTUAL_WIRE_PAGE_SIZE = 20
+HOSTS_PER_CLUSTER = 32
+EDGE_FEATURES = ['loadBalancer', 'firewall', 'routing', 'ipsec', 'l2Vpn', 'sslvpnConfig']
+
+
+def _element(name, value):
+    if isinstance(value, dict):
+        return '<{0}>{1}</{0}>'.format(name, ''.join(_element(key, item) for key, item in value.items()))
+    if isinstance(value, list):
+        return ''.join(_element(name, item) for item in value)
+    return '<{0}>{1}</{0}>'.format(name, escape(str(value)))
+
+
+class MockInventory(object):
+    """
+    Generated NSX objects: scale edges (one DLR every fourth edge), scale logical switches and scale hosts spread in
+    clusters of HOSTS_PER_CLUSTER hosts
+    """
+    def __init__(self, scale):
+        self.scale = scale
+        self.edges = [{'objectId': 'edge-{}'.format(index), 'name': 'edge{}'.format(index),
+                       'edgeType': 'distributedRouter' if index % 4 == 0 else 'gatewayServices',
+                       'revision': '1', 'edgeStatus': 'GREEN', 'datacenterMoid': 'datacenter-2'}
+                      for index in range(1, scale + 1)]
+        self.virtual_wires = [{'objectId': 'virtualwire-{}'.format(index), 'name': 'ls{}'.format(index),
+                               'isUniversal': 'false', 'controlPlaneMode': 'UNICAST_MODE'}
+                              for index in range(1, scale + 1)]
+        self.hosts = [{'objectId': 'host-{}'.format(index), 'name': 'esx{}.local'.format(index),
+                       'cluster': 'domain-c{}'.format(index // HOSTS_PER_CLUSTER + 1)}
+                      for index in range(scale)]
+        self.hosts_by_cluster = {}
+        for host in self.hosts:
+            self.hosts_by_cluster.setdefault(host['cluster'], []).append(host)
+        self.clusters = sorted(self.hosts_by_cluster, key=lambda moid: int(moid[8:]))
+        self.static_routes = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _page(items, query, default_page_size):
+        start_index = int(query.get('startindex', ['0'])[0])
+        page_size = int(query.get('pagesize', [str(default_page_size)])[0])
+        paging_info = {'pageSize': page_size, 'startIndex': start_index, 'totalCount': len(items)}
+        return paging_info, items[start_index:start_index + page_size]
+
+    def edges_page(self, query):
+        edges = self.edges
+        if 'datacenter' in query:
+            edges = [edge for edge in edges if edge['datacenterMoid'] == query['datacenter'][0]]
+        paging_info, page = self._page(edges, query, EDGE_PAGE_SIZE)
+        return _element('pagedEdgeList', {'edgePage': {'pagingInfo': paging_info, 'edgeSummary': page}})
+
+    def virtual_wires_page(self, query):
+        paging_info, page = self._page(self.virtual_wires, query, VIRTUAL_WIRE_PAGE_SIZE)
+        return _element('virtualWires', {'dataPage': {'pagingInfo': paging_info, 'virtualWire': page}})
+
+    def edge(self, edge_id):
+        index = int(edge_id.split('-')[1])
+        features = dict((feature, {'enabled': 'true' if (index + position) % 3 == 0 else 'false'})
+                        for position, feature in enumerate(EDGE_FEATURES))
+        return _element('edge', {'id': edge_id, 'name': 'edge{}'.format(index), 'features': features})
+
+    @staticmethod
+    def vnics(edge_id):
+        vnics = [{'label': 'vNic_{}'.format(index), 'name': 'vnic{}'.format(index), 'index': index,
+                  'isConnected': 'true' if index == 0 else 'false', 'type': 'uplink' if index == 0 else 'internal',
+                  'portgroupId': 'dvportgroup-1', 'portgroupName': 'uplink',
+                  'addressGroups': {'addressGroup': {'primaryAddress': '192.168.0.{}'.format(index + 1),
+                                                     'subnetMask': '255.255.255.0'}}}
+                 for index in range(10)]
+        return _element('vnics', {'vnic': vnics})
+
+    def static_routing(self, edge_id, body=None):
+        with self._lock:
+            if body is not None:
+                self.static_routes[edge_id] = body
+            return self.static_routes.get(edge_id, '<staticRouting><staticRoutes></staticRoutes>'
+                                                   '<defaultRoute><vnic>0</vnic><gatewayAddress>192.168.0.254'
+                                                   '</gatewayAddress></defaultRoute></staticRouting>')
+
+    def cluster_status(self):
+        statuses = [{'resource': {'objectId': cluster, 'name': 'cluster{}'.format(cluster[8:])},
+                     'nwFabricFeatureStatus': [{'featureId': 'com.vmware.vshield.firewall', 'enabled': 'true'},
+                                               {'featureId': 'com.vmware.vshield.vsm.nwfabric.hostPrep',
+                                                'enabled': 'true'}]}
+                    for cluster in self.clusters]
+        return _element('resourceStatuses', {'resourceStatus': statuses})
+
+    def host_status(self, cluster):
+        statuses = [{'resource': {'objectId': host['objectId'], 'name': host['name'],
+                                  'scope': {'id': cluster, 'name': 'cluster{}'.format(cluster[8:])}}}
+                    for host in self.hosts_by_cluster.get(cluster, [])]
+        return _element('resourceStatuses', {'resourceStatus': statuses})
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _route(self, method):
+        url = urlparse.urlparse(self.path)
+        query = urlparse.parse_qs(url.query)
+        body = None
+        if method in ('PUT', 'POST'):
+            body = self.rfile.read(int(self.headers.getheader('content-length', 0)))
+        inventory = self.server.inventory
+        path = url.path.rstrip('/')
+        routes = [
+            ('nsxEdges', 'GET', r'/4\.0/edges$', lambda match: inventory.edges_page(query)),
+            ('nsxEdge', 'GET', r'/4\.0/edges/(edge-\d+)$', lambda match: inventory.edge(match.group(1))),
+            ('vnics', 'GET', r'/4\.0/edges/(edge-\d+)/vnics$', lambda match: inventory.vnics(match.group(1))),
+            ('routingConfigStatic', 'GET', r'/4\.0/edges/(edge-\d+)/routing/config/static$',
+             lambda match: inventory.static_routing(match.group(1))),
+            ('routingConfigStatic', 'PUT', r'/4\.0/edges/(edge-\d+)/routing/config/static$',
+             lambda match: inventory.static_routing(match.group(1), body) and None),
+            ('logicalSwitchesGlobal', 'GET', r'/2\.0/vdn/virtualwires$',
+             lambda match: inventory.virtual_wires_page(query)),
+            ('childStatus', 'GET', r'/nwfabric/status/child/([^/]+)$',
+             lambda match: inventory.host_status(match.group(1))),
+            ('statusResourceType', 'GET', r'/nwfabric/status/alllatest',
+             lambda match: inventory.cluster_status()),
+        ]
+        for name, route_method, pattern, handler in routes:
+            match = re.search(pattern, path)
+            if match and route_method == method:
+                return name, handler(match)
+        return None, False
+
+    def _respond(self, method):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        name, payload = self._route(method)
+        self.server.count(name or 'unknown {} {}'.format(method, self.path.split('?')[0]))
+        if payload is False:
+            status, payload = 404, ''
+        elif payload is None:
+            status, payload = 204, ''
+        else:
+            status = 200
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/xml')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._respond('GET')
+
+    def do_PUT(self):
+        self._respond('PUT')
+
+    def do_POST(self):
+        self._respond('POST')
+
+    def do_DELETE(self):
+        self._respond('DELETE')
+
+
+class MockNsxServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    Threaded https server answering the NSX API requests of the benchmarks from a MockInventory
+    """
+    daemon_threads = True
+
+    def __init__(self, scale=100, latency=0.0, port=0):
+        """
+        :param scale: The number of edges, logical switches and hosts served
+        :param latency: (Optional) Time in seconds added to every request
+        :param port: (Optional) The TCP port to listen on, a free port if 0
+        """
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', port), _Handler)
+        self.inventory = MockInventory(scale)
+        self.latency = latency
+        self.requests = Counter()
+        self._requests_lock = threading.Lock()
+        self._cert_dir = tempfile.mkdtemp(prefix='pynsxv-mock-')
+        cert_file = os.path.join(self._cert_dir, 'mock.pem')
+        with open(os.devnull, 'w') as devnull:
+            subprocess.check_call(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                                   '-subj', '/CN=localhost', '-keyout', cert_file, '-out', cert_file],
+                                  stdout=devnull, stderr=devnull)
+        self.socket = ssl.wrap_socket(self.socket, certfile=cert_file, server_side=True)
+
+    @property
+    def address(self):
+        return '{}:{}'.format(*self.server_address)
+
+    def count(self, name):
+        with self._requests_lock:
+            self.requests[name] += 1
+
+    def reset_counts(self):
+        with self._requests_lock:
+            counts = dict(self.requests)
+            self.requests.clear()
+        return counts
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        shutil.rmtree(self._cert_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in of the NSX Manager REST API')
+    parser.add_argument('-p', '--port', help='TCP port to listen on', type=int, default=8443)
+    parser.add_argument('-s', '--scale', help='number of edges, logical switches and hosts', type=int, default=100)
+    parser.add_argument('-l', '--latency', help='latency added to every request in ms', type=float, default=0)
+    args = parser.parse_args()
+
+    server = MockNsxServer(args.scale, args.latency / 1000.0, args.port)
+    print 'mock NSX Manager listening on {}'.format(server.address)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
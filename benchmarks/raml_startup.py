@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# coding=utf-8
+#
+# Copyright © 2015-2016 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the X11 (MIT) (the “License”) set forth below;
+#
+# you may not use this file except in compliance with the License. Unless required by applicable law or agreed to in
+# writing, software distributed under the License is distributed on an “AS IS” BASIS, without warranties or conditions
+# of any kind, EITHER EXPRESS OR IMPLIED. See the License for the specific language governing permissions and
+# limitations under the License. Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# "THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.”
+
+"""
+Compares the NsxClient startup time with a cold and a warm RAML spec cache, each sample is a new python process
+as it is the case for every pynsxv CLI invocation
+
+    python benchmarks/raml_startup.py /path/to/nsxvapi.raml -r 5
+"""
+
+__author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from tabulate import tabulate
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP_SNIPPET = """
+import time
+start = time.time()
+from pynsxv.library.ramlcache import load_nsx_client, body_template
+session = load_nsx_client({raml!r}, 'nsxmanager.invalid', 'admin', 'password', cache_dir={cache_dir!r})
+for resource, method in [('nsxEdges', 'create'), ('routingConfig', 'update'), ('interfaces', 'create'),
+                         ('defaultFirewallPolicy', 'update'), ('logicalSwitches', 'create')]:
+    body_template(session, resource, method)
+print(time.time() - start)
+"""
+
+
+def _startup_time(raml_file, cache_dir):
+    snippet = STARTUP_SNIPPET.format(raml=os.path.abspath(raml_file), cache_dir=cache_dir)
+    output = subprocess.check_output([sys.executable, '-c', snippet], cwd=REPO_ROOT)
+    return float(output.strip().splitlines()[-1])
+
+
+def run(raml_file, repeat):
+    cold_samples = []
+    warm_samples = []
+    for _ in range(repeat):
+        cache_dir = tempfile.mkdtemp(prefix='pynsxv-bench-')
+        try:
+            cold_samples.append(_startup_time(raml_file, cache_dir))
+            warm_samples.append(_startup_time(raml_file, cache_dir))
+        finally:
+            shutil.rmtree(cache_dir)
+    return cold_samples, warm_samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='NsxClient startup time with a cold and a warm RAML spec cache')
+    parser.add_argument('raml_file', help='NSX RAML spec file')
+    parser.add_argument('-r', '--repeat', help='number of cold/warm samples', type=int, default=5)
+    args = parser.parse_args()
+
+    cold_samples, warm_samples = run(args.raml_file, args.repeat)
+    table = []
+    for name, samples in [('cold', cold_samples), ('warm', warm_samples)]:
+        table.append((name, '{:.3f}'.format(min(samples)), '{:.3f}'.format(sum(samples) / len(samples)),
+                      '{:.3f}'.format(max(samples))))
+    print tabulate(table, headers=["Spec cache", "Min (s)", "Mean (s)", "Max (s)"], tablefmt="psql")
+    print 'Speedup (mean): {:.1f}x'.format((sum(cold_samples) / len(cold_samples)) /
+                                          (sum(warm_samples) / len(warm_samples)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# coding=utf-8
+#
+# Copyright © 2015-2016 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the X11 (MIT) (the “License”) set forth below;
+#
+# you may not use this file except in compliance with the License. Unless required by applicable law or agreed to in
+# writing, software distributed under the License is distributed on an “AS IS” BASIS, without warranties or conditions
+# of any kind, EITHER EXPRESS OR IMPLIED. See the License for the specific language governing permissions and
+# limitations under the License. Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# "THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.”
+
+"""
+Runs the pynsxv library functions against the local mock NSX Manager and fake vCenter, and reports per scenario
+the latency, the number of NSX API requests and the peak memory. Each scenario runs in a new python process so that
+its peak memory is its own
+
+    python benchmarks/run_benchmarks.py /path/to/nsxvapi.raml --scale 1000 --latency 20 --json report.json
+    python benchmarks/run_benchmarks.py /path/to/nsxvapi.raml --scale 1000 --baseline report.json
+
+With --baseline the exit status is 1 when a scenario sends more requests, or is slower than the tolerance allows,
+than in the baseline report
+"""
+
+__author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from tabulate import tabulate
+from mock_nsx import MockNsxServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SCENARIOS = ['get_edge', 'esg_list', 'esg_list_interfaces', 'esg_route_add', 'host_prep_state', 'usage']
+
+SCENARIO_SNIPPET = """
+import json, resource, sys, time
+sys.path.insert(0, {benchmarks_dir!r})
+from pynsxv.library.ramlcache import load_nsx_client
+from pynsxv.library.httppool import configure_http_pool
+from pynsxv.library.inventory import invalidate_inventory
+from pynsxv.library.libutils import get_edge
+from pynsxv.library.nsx_esg import esg_list, esg_list_interfaces, esg_route_add
+from pynsxv.library.nsx_usage import host_prep_state, usage_summary
+from fake_vcenter import FakeVcContent
+
+scale = {scale!r}
+session = load_nsx_client({raml!r}, {manager!r}, 'admin', 'password', cache_dir={cache_dir!r})
+configure_http_pool(session)
+vccontent = FakeVcContent(scale)
+last_esg = 'edge{{}}'.format(scale if scale % 4 else scale - 1)
+scenarios = {{
+    'get_edge': lambda run: get_edge(session, last_esg),
+    'esg_list': lambda run: esg_list(session),
+    'esg_list_interfaces': lambda run: esg_list_interfaces(session, 'edge1'),
+    'esg_route_add': lambda run: esg_route_add(session, 'edge1', '10.{{}}.{{}}.0/24'.format(run // 256, run % 256),
+                                               '192.168.0.254', '0'),
+    'host_prep_state': lambda run: host_prep_state(session),
+    'usage': lambda run: usage_summary(session, vccontent, announce=False),
+}}
+samples = []
+for run in range({repeat!r}):
+    invalidate_inventory(session)
+    start = time.time()
+    scenarios[{scenario!r}](run)
+    samples.append(time.time() - start)
+print(json.dumps({{'samples': samples, 'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}))
+"""
+
+
+def run_scenario(server, raml_file, scenario, scale, repeat, cache_dir):
+    """
+    :return: A dictionary with the latency samples in seconds, the NSX API requests per resource and the peak
+             resident memory in KB of the scenario process
+    """
+    server.reset_counts()
+    snippet = SCENARIO_SNIPPET.format(benchmarks_dir=BENCHMARKS_DIR, scale=scale, raml=os.path.abspath(raml_file),
+                                      manager=server.address, cache_dir=cache_dir, repeat=repeat, scenario=scenario)
+    output = subprocess.check_output([sys.executable, '-c', snippet], cwd=REPO_ROOT)
+    result = json.loads(output.strip().splitlines()[-1])
+    result['requests'] = server.reset_counts()
+    return result
+
+
+def run(raml_file, scale, latency, repeat, scenarios):
+    server = MockNsxServer(scale, latency).start()
+    cache_dir = tempfile.mkdtemp(prefix='pynsxv-bench-')
+    try:
+        report = {'scale': scale, 'latency': latency, 'repeat': repeat, 'scenarios': {}}
+        for scenario in scenarios:
+            report['scenarios'][scenario] = run_scenario(server, raml_file, scenario, scale, repeat, cache_dir)
+        return report
+    finally:
+        shutil.rmtree(cache_dir)
+        server.stop()
+
+
+def _summary(result, repeat):
+    samples = result['samples']
+    return (sum(samples) / len(samples) * 1000, min(samples) * 1000, max(samples) * 1000,
+            sum(result['requests'].values()) / float(repeat), result['peak_rss_kb'] / 1024.0)
+
+
+def regressions(report, baseline, tolerance):
+    """
+    :return: A list of messages describing the scenarios that send more requests per run than in the baseline, or
+             whose mean latency exceeds the baseline one by more than tolerance (e.g. 0.2 for 20%)
+    """
+    messages = []
+    for scenario, result in sorted(report['scenarios'].items()):
+        if scenario not in baseline['scenarios']:
+            continue
+        mean, _, _, requests, _ = _summary(result, report['repeat'])
+        base_mean, _, _, base_requests, _ = _summary(baseline['scenarios'][scenario], baseline['repeat'])
+        if requests > base_requests:
+            messages.append('{}: {:.1f} requests per run, {:.1f} in the baseline'.format(scenario, requests,
+                                                                                        base_requests))
+        if mean > base_mean * (1 + tolerance):
+            messages.append('{}: {:.1f} ms mean latency, {:.1f} ms in the baseline'.format(scenario, mean, base_mean))
+    return messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description='pynsxv benchmarks against a local mock NSX Manager')
+    parser.add_argument('raml_file', help='NSX RAML spec file')
+    parser.add_argument('-s', '--scale', help='number of edges, logical switches and hosts, default is 1000',
+                        type=int, default=1000)
+    parser.add_argument('-l', '--latency', help='latency added to every NSX API request in ms', type=float,
+                        default=0)
+    parser.add_argument('-r', '--repeat', help='number of runs per scenario', type=int, default=5)
+    parser.add_argument('--scenario', help='scenario to run, all scenarios by default', action='append',
+                        choices=SCENARIOS)
+    parser.add_argument('--json', help='write the report to this file')
+    parser.add_argument('--baseline', help='report of a previous run to check for regressions')
+    parser.add_argument('--tolerance', help='allowed mean latency increase over the baseline, default is 0.2',
+                        type=float, default=0.2)
+    args = parser.parse_args()
+
+    report = run(args.raml_file, args.scale, args.latency / 1000.0, args.repeat, args.scenario or SCENARIOS)
+
+    table = []
+    for scenario in args.scenario or SCENARIOS:
+        mean, minimum, maximum, requests, peak_rss = _summary(report['scenarios'][scenario], args.repeat)
+        table.append((scenario, '{:.1f}'.format(mean), '{:.1f}'.format(minimum), '{:.1f}'.format(maximum),
+                      '{:.1f}'.format(requests), '{:.1f}'.format(peak_rss)))
+    print 'scale {}, latency {:.0f} ms, {} runs per scenario'.format(args.scale, args.latency, args.repeat)
+    print tabulate(table, headers=["Scenario", "Mean (ms)", "Min (ms)", "Max (ms)", "Requests / run",
+                                   "Peak RSS (MB)"], tablefmt="psql")
+
+    if args.json:
+        with open(args.json, 'w') as report_file:
+            json.dump(report, report_file, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            messages = regressions(report, json.load(baseline_file), args.tolerance)
+        for message in messages:
+            print 'REGRESSION {}'.format(message)
+        if messages:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
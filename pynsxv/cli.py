@@ -25,13 +25,24 @@
 __author__ = 'yfauser'
 
 import argparse
-import library.nsx_logical_switch as lswitch
-import library.nsx_dlr as dlr
-import library.nsx_esg as esg
-import library.nsx_usage as usage
+import os
+import sys
+from library.server import DEFAULT_SOCKET, CommandServer, forward_command
 
 
-def main():
+# the global options of build_parser taking a value, kept here so that forwarding doesn't build the parser
+VALUE_OPTIONS = ('-i', '--ini', '--site', '--site_timeout', '--stats-prometheus', '--stats-jsonl', '--profile-dump',
+                 '--server')
+
+
+def build_parser():
+    # the library modules are imported here so that forwarding a command to a server stays cheap
+    import library.nsx_logical_switch as lswitch
+    import library.nsx_dlr as dlr
+    import library.nsx_esg as esg
+    import library.nsx_usage as usage
+    import library.nsx_apply as nsx_apply
+
     parser = argparse.ArgumentParser(description='PyNSXv Command Line Client for NSX for vSphere')
     parser.add_argument("-i",
                         "--ini",
@@ -45,15 +56,172 @@ def main():
                         "--debug",
                         help="print low level debug of http transactions",
                         action="store_true")
+    parser.add_argument("--no-cache",
+                        dest="no_cache",
+                        help="do not use the on-disk NSX inventory cache",
+                        action="store_true")
+    parser.add_argument("--refresh-cache",
+                        dest="refresh_cache",
+                        help="ignore and rebuild the on-disk NSX inventory cache and the vCenter inventory",
+                        action="store_true")
+    parser.add_argument("--site",
+                        help="comma separated sites of the [nsxv:<site>] sections of the nsx configuration file to "
+                             "run on, 'default' being the [nsxv] section. list, read and usage run on all sites by "
+                             "default, the other commands on the default site")
+    parser.add_argument("--site_timeout",
+                        help="maximum time in seconds to wait for the sites of list, read and usage, the sites "
+                             "not done in time are reported as failed",
+                        type=float)
+    parser.add_argument("--stats",
+                        help="print a summary of the NSX API calls issued by the command",
+                        action="store_true")
+    parser.add_argument("--stats-prometheus",
+                        dest="stats_prometheus",
+                        help="write the NSX API call statistics to this file in the Prometheus text format")
+    parser.add_argument("--stats-jsonl",
+                        dest="stats_jsonl",
+                        help="append every NSX API call to this file as a JSON line")
+    parser.add_argument("--profile",
+                        help="print the time spent in config load, NsxClient init, vCenter connect, API calls, "
+                             "XML/JSON conversion, output formatting and local compute",
+                        action="store_true")
+    parser.add_argument("--profile-dump",
+                        dest="profile_dump",
+                        help="write a cProfile profile of the command to this file, to load with pstats or snakeviz")
+    parser.add_argument("--server",
+                        help="run the command in the 'pynsxv serve' process listening on this unix socket, "
+                             "default is taken from the PYNSXV_SERVER environment variable")
 
     subparsers = parser.add_subparsers()
     lswitch.contruct_parser(subparsers)
     dlr.contruct_parser(subparsers)
     esg.contruct_parser(subparsers)
     usage.contruct_parser(subparsers)
+    nsx_apply.contruct_parser(subparsers)
+
+    serve_parser = subparsers.add_parser('serve', description="Run pynsxv commands sent over a unix socket in a long "
+                                                              "lived process reusing its NSX and vCenter sessions",
+                                         help="Run a pynsxv server for 'pynsxv --server SOCKET' commands")
+    serve_parser.add_argument("-s",
+                              "--socket",
+                              help="unix socket to listen on, default is {}".format(DEFAULT_SOCKET),
+                              default=DEFAULT_SOCKET)
+    serve_parser.set_defaults(func=_serve_main)
+
+    return parser
+
+
+def run(argv):
+    args = build_parser().parse_args(argv)
+    if not (getattr(args, 'profile', False) or getattr(args, 'profile_dump', None)):
+        return _run_with_stats(args)
 
-    args = parser.parse_args()
-    args.func(args)
+    import cProfile
+    from library.profiling import PhaseProfiler
+    from tabulate import tabulate
+    phases = PhaseProfiler()
+    profile = cProfile.Profile() if args.profile_dump else None
+    phases.start()
+    if profile:
+        profile.enable()
+    try:
+        return _run_with_stats(args)
+    finally:
+        if profile:
+            profile.disable()
+            profile.dump_stats(args.profile_dump)
+        phases.stop()
+        if args.profile:
+            print tabulate([(name, '{:.3f}'.format(duration), calls, '{:.1f}'.format(share))
+                            for name, duration, calls, share in phases.summary()],
+                           headers=["Phase", "Time (s)", "Calls", "% of wall time"], tablefmt="psql")
+            print 'Wall time: {:.3f}s'.format(phases.wall_time)
+
+
+def _run_with_stats(args):
+    if not (getattr(args, 'stats', False) or getattr(args, 'stats_prometheus', None) or
+            getattr(args, 'stats_jsonl', None)):
+        return args.func(args)
+
+    from library.instrumentation import add_sink, remove_sink, StatsCollector, JsonLinesSink
+    from tabulate import tabulate
+    stats = StatsCollector()
+    sinks = [stats]
+    jsonl_file = open(args.stats_jsonl, 'a') if args.stats_jsonl else None
+    if jsonl_file:
+        sinks.append(JsonLinesSink(jsonl_file))
+    for sink in sinks:
+        add_sink(sink)
+    try:
+        return args.func(args)
+    finally:
+        for sink in sinks:
+            remove_sink(sink)
+        if jsonl_file:
+            jsonl_file.close()
+        if args.stats_prometheus:
+            with open(args.stats_prometheus, 'w') as prometheus_file:
+                prometheus_file.write(stats.prometheus())
+        if args.stats:
+            print tabulate([(resource, method, count, errors, '{:.3f}'.format(total), '{:.1f}'.format(mean),
+                             '{:.1f}'.format(maximum), size, pages)
+                            for resource, method, count, errors, total, mean, maximum, size, pages in stats.summary()],
+                           headers=["Resource", "Method", "Calls", "Errors", "Total (s)", "Mean (ms)", "Max (ms)",
+                                    "Bytes", "Pages"], tablefmt="psql")
+
+
+def _serve_main(args):
+    from library.libutils import drop_expired_sessions
+    server = CommandServer(args.socket, run, before_command=drop_expired_sessions)
+    print 'pynsxv server listening on {}'.format(args.socket)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def _server_socket(argv):
+    """
+    :return: The socket of the server the command line should be forwarded to and the command line without the
+             --server option
+    """
+    server_socket = os.environ.get('PYNSXV_SERVER')
+    remaining_argv = []
+    arguments = iter(argv)
+    for argument in arguments:
+        if argument == '--server':
+            server_socket = next(arguments, None)
+        elif argument.startswith('--server='):
+            server_socket = argument.split('=', 1)[1]
+        else:
+            remaining_argv.append(argument)
+    if _subcommand(remaining_argv) == 'serve':
+        return None, argv
+    return server_socket, remaining_argv
+
+
+def _subcommand(argv):
+    """
+    :return: The first argument that is neither a global option nor the value of one, or None
+    """
+    arguments = iter(argv)
+    for argument in arguments:
+        if argument in VALUE_OPTIONS:
+            next(arguments, None)
+        elif not argument.startswith('-'):
+            return argument
+    return None
+
+
+def main():
+    server_socket, argv = _server_socket(sys.argv[1:])
+    if server_socket:
+        exit_code = forward_command(server_socket, argv)
+        if exit_code is not None:
+            sys.exit(exit_code)
+    run(argv)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# coding=utf-8
+#
+# Copyright © 2015-2016 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the X11 (MIT) (the “License”) set forth below;
+#
+# you may not use this file except in compliance with the License. Unless required by applicable law or agreed to in
+# writing, software distributed under the License is distributed on an “AS IS” BASIS, without warranties or conditions
+# of any kind, EITHER EXPRESS OR IMPLIED. See the License for the specific language governing permissions and
+# limitations under the License. Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# "THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.”
+
+__author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
+
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+
+DEFAULT_POOL_SIZE = 10
+
+# the attributes holding the requests Session of an NsxClient, NsxClient._httpsession._session in nsxramlclient 2.x
+SESSION_HOOK = ('_httpsession', '_session')
+
+_pool = None
+_pool_lock = threading.Lock()
+_transferred = threading.local()
+
+
+class HttpPool(object):
+    """
+    The bounded keep-alive connection pool shared by the NsxClient Sessions of the process, so that TLS connections
+    to the NSX Manager are reused instead of opened per request
+    """
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE):
+        self.adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+
+    def stats(self):
+        """
+        :return: A tuple with the number of HTTP connections opened and the number of requests sent over an
+                 already opened connection
+        """
+        opened = 0
+        sent = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            connection_pool = pools.get(key)
+            if connection_pool is not None:
+                opened += connection_pool.num_connections
+                sent += connection_pool.num_requests
+        return opened, max(sent - opened, 0)
+
+
+class PooledSession(requests.Session):
+    """
+    Replaces the requests Session of an NsxClient, keeping its credentials and settings but sending every request
+    through the HttpPool adapter and counting the response bytes received by the calling thread
+    """
+    def __init__(self, adapter, session):
+        """
+        :param adapter: The HTTPAdapter of the HttpPool
+        :param session: The requests Session replaced, whose auth, verify, headers etc. are kept
+        """
+        super(PooledSession, self).__init__()
+        for attribute in requests.Session.__attrs__:
+            if attribute != 'adapters':
+                setattr(self, attribute, getattr(session, attribute))
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        response = super(PooledSession, self).request(method, url, **kwargs)
+        _transferred.bytes = transferred_bytes() + len(response.content or '')
+        return response
+
+
+def configure_http_pool(client_session, pool_size=DEFAULT_POOL_SIZE):
+    """
+    This function makes the HTTP requests of an NsxClient Session go through the keep-alive connection pool shared
+    by the whole process, replacing the requests Session found at SESSION_HOOK with a PooledSession
+    :param client_session: An instance of an NsxClient Session
+    :param pool_size: (Optional) Maximum number of kept alive connections per NSX Manager, only used by the first
+                      call in the process
+    :return: The HttpPool instance of the process
+    """
+    global _pool
+    holder = getattr(client_session, SESSION_HOOK[0], None)
+    session = getattr(holder, SESSION_HOOK[1], None)
+    if not isinstance(session, requests.Session):
+        raise TypeError('no requests Session found at NsxClient.{}, this nsxramlclient version is not '
+                        'supported'.format('.'.join(SESSION_HOOK)))
+    with _pool_lock:
+        if _pool is None:
+            _pool = HttpPool(pool_size)
+        if not isinstance(session, PooledSession):
+            setattr(holder, SESSION_HOOK[1], PooledSession(_pool.adapter, session))
+        return _pool
+
+
+def http_pool_stats():
+    """
+    :return: A tuple with the number of HTTP connections opened and the number of requests that reused an opened
+             connection in this process, (0, 0) if the pool is not configured
+    """
+    with _pool_lock:
+        if _pool is None:
+            return 0, 0
+        return _pool.stats()
+
+
+def transferred_bytes():
+    """
+    :return: The number of response body bytes received through the pooled sessions by the calling thread
+    """
+    return getattr(_transferred, 'bytes', 0)
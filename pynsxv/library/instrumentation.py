@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# coding=utf-8
+#
+# Copyright © 2015-2016 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the X11 (MIT) (the “License”) set forth below;
+#
+# you may not use this file except in compliance with the License. Unless required by applicable law or agreed to in
+# writing, software distributed under the License is distributed on an “AS IS” BASIS, without warranties or conditions
+# of any kind, EITHER EXPRESS OR IMPLIED. See the License for the specific language governing permissions and
+# limitations under the License. Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# "THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.”
+
+__author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
+
+import functools
+import itertools
+import json
+import threading
+import time
+from collections import namedtuple, OrderedDict
+from contextlib import contextmanager
+from httppool import transferred_bytes
+
+
+SESSION_METHODS = ('read', 'read_all_pages', 'create', 'update', 'delete')
+
+# listing and page are set on the reads of a listing read page by page, e.g. by inventory.iter_all_pages
+CallRecord = namedtuple('CallRecord', ['resource', 'method', 'status', 'latency', 'bytes', 'pages', 'listing',
+                                       'page'])
+
+_sinks = []
+_sinks_lock = threading.Lock()
+_calls = threading.local()
+_listing_ids = itertools.count(1)
+
+
+def add_sink(sink):
+    """
+    Registers a sink receiving the CallRecord of every NSX API call issued through an instrumented session
+    :param sink: A callable taking a CallRecord as its only argument, e.g. a StatsCollector or a JsonLinesSink
+    """
+    with _sinks_lock:
+        _sinks.append(sink)
+
+
+def remove_sink(sink):
+    with _sinks_lock:
+        if sink in _sinks:
+            _sinks.remove(sink)
+
+
+def _emit(record):
+    with _sinks_lock:
+        sinks = list(_sinks)
+    for sink in sinks:
+        try:
+            sink(record)
+        except Exception:
+            # a failing sink must not fail the NSX API call
+            pass
+
+
+def new_listing():
+    """
+    :return: A new id for the page reads of one listing, to be passed to listing_page
+    """
+    return next(_listing_ids)
+
+
+@contextmanager
+def listing_page(listing, page):
+    """
+    Tags the NSX API calls of the calling thread issued in the with block as the page number page of the listing
+    listing, so that the pages of a listing read with one read per page are counted as the pages of a single call
+    """
+    _calls.listing = (listing, page)
+    try:
+        yield
+    finally:
+        _calls.listing = None
+
+
+def _instrumented(method, func):
+    @functools.wraps(func)
+    def call(resource, *args, **kwargs):
+        if getattr(_calls, 'depth', 0):
+            # the reads of read_all_pages are the pages of its call
+            _calls.pages += 1
+            return func(resource, *args, **kwargs)
+        _calls.depth = 1
+        _calls.pages = 0
+        listing, page = getattr(_calls, 'listing', None) or (None, None)
+        status = None
+        start = time.time()
+        bytes_before = transferred_bytes()
+        try:
+            result = func(resource, *args, **kwargs)
+            status = result.get('status') if isinstance(result, dict) else 200
+            return result
+        except Exception as error:
+            status = type(error).__name__
+            raise
+        finally:
+            _calls.depth = 0
+            _emit(CallRecord(resource, method, status, time.time() - start, transferred_bytes() - bytes_before,
+                             _calls.pages or 1, listing, page))
+    return call
+
+
+def instrument_session(client_session):
+    """
+    This function makes every read, read_all_pages, create, update and delete of an NsxClient Session emit a
+    CallRecord with the resource name, method, status, latency, response bytes and page count to the registered
+    sinks. The session object is left in place, so the caches keyed by session keep working
+    :param client_session: An instance of an NsxClient Session
+    :return: The client session
+    """
+    if not getattr(client_session, '_instrumented', False):
+        for method in SESSION_METHODS:
+            setattr(client_session, method, _instrumented(method, getattr(client_session, method)))
+        client_session._instrumented = True
+    return client_session
+
+
+def _is_error(status):
+    return not isinstance(status, (int, long)) or status >= 400
+
+
+class StatsCollector(object):
+    """
+    In-process sink aggregating the CallRecords per resource and method. The reads of the pages of a listing
+    after its first page are counted as pages of the call reading the first page
+    """
+    def __init__(self):
+        self.calls = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        with self._lock:
+            stats = self.calls.setdefault((record.resource, record.method), [0, 0, 0.0, 0.0, 0, 0])
+            stats[0] += 1 if record.page is None or record.page == 1 else 0
+            stats[1] += 1 if _is_error(record.status) else 0
+            stats[2] += record.latency
+            stats[3] = max(stats[3], record.latency)
+            stats[4] += record.bytes
+            stats[5] += record.pages
+
+    def summary(self):
+        """
+        :return: A list of tuples, one per resource and method by decreasing total latency, with the resource,
+                 method, number of calls, number of errors, total latency in seconds, mean and max latency in
+                 milliseconds, response bytes and pages
+        """
+        with self._lock:
+            rows = [(resource, method, count, errors, total, total / count * 1000, maximum * 1000, size, pages)
+                    for (resource, method), (count, errors, total, maximum, size, pages) in self.calls.items()]
+        return sorted(rows, key=lambda row: row[4], reverse=True)
+
+    def prometheus(self):
+        """
+        :return: The statistics in the Prometheus text exposition format
+        """
+        metrics = [('pynsxv_nsx_api_calls_total', 'NSX API calls issued by pynsxv', 2),
+                   ('pynsxv_nsx_api_errors_total', 'NSX API calls that failed', 3),
+                   ('pynsxv_nsx_api_seconds_total', 'Time spent in NSX API calls', 4),
+                   ('pynsxv_nsx_api_response_bytes_total', 'Response bytes received from the NSX API', 7),
+                   ('pynsxv_nsx_api_pages_total', 'Pages read from the NSX API', 8)]
+        rows = self.summary()
+        lines = []
+        for name, description, column in metrics:
+            lines.append('# HELP {} {}'.format(name, description))
+            lines.append('# TYPE {} counter'.format(name))
+            for row in rows:
+                lines.append('{}{{resource="{}",method="{}"}} {}'.format(name, row[0], row[1], row[column]))
+        return '\n'.join(lines) + '\n'
+
+
+class JsonLinesSink(object):
+    """
+    Sink writing every CallRecord as a JSON line to a stream
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        line = json.dumps(OrderedDict(record._asdict()))
+        with self._lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
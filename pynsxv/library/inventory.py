@@ -0,0 +1,463 @@
+#!/usr/bin/env python
+# coding=utf-8
+#
+# Copyright © 2015-2016 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the X11 (MIT) (the “License”) set forth below;
+#
+# you may not use this file except in compliance with the License. Unless required by applicable law or agreed to in
+# writing, software distributed under the License is distributed on an “AS IS” BASIS, without warranties or conditions
+# of any kind, EITHER EXPRESS OR IMPLIED. See the License for the specific language governing permissions and
+# limitations under the License. Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# "THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.”
+
+__author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
+
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from httppool import transferred_bytes
+from instrumentation import new_listing, listing_page
+
+
+DEFAULT_TTL = 300
+DEFAULT_MAX_INDEXES = 16
+TRANSFER_LOG_SIZE = 1000
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'pynsxv')
+
+_resolvers = weakref.WeakKeyDictionary()
+_resolvers_lock = threading.Lock()
+
+_transfer_log = deque(maxlen=TRANSFER_LOG_SIZE)
+
+# resource and uri parameter reading one object of an indexed collection by its id
+OBJECT_RESOURCES = {'nsxEdges': ('nsxEdge', 'edgeId'),
+                    'logicalSwitchesGlobal': ('logicalSwitch', 'virtualWireID')}
+
+
+class InventoryIndex(object):
+    """
+    Dictionary indexes built from one paginated listing of an NSX collection (e.g. nsxEdges)
+    """
+    def __init__(self, objects):
+        self.by_name = {}
+        self.by_id = {}
+        self.by_type = {}
+        for obj in objects:
+            object_id = obj['objectId']
+            self.by_id[object_id] = obj
+            # the first object found with a name wins, as with the former list scans
+            if 'name' in obj:
+                self.by_name.setdefault(obj['name'], object_id)
+            if 'edgeType' in obj:
+                self.by_type.setdefault(obj['edgeType'], []).append(object_id)
+        self.created = time.time()
+        # True when built from the on-disk cache, whose validation only covers the first page
+        self.cached = False
+
+    def __len__(self):
+        return len(self.by_id)
+
+
+class InventoryResolver(object):
+    """
+    Resolves NSX object names to IDs from cached InventoryIndex instances. Each index is built from a single
+    paginated read, expires after ttl seconds and the least recently used index is evicted once more than
+    max_indexes are held
+    """
+    def __init__(self, loader, ttl=DEFAULT_TTL, max_indexes=DEFAULT_MAX_INDEXES, scanner=None, verifier=None):
+        """
+        :param loader: A callable returning the list of objects of the collection passed as first argument, read
+                       from the NSX API and not from the store when its second argument fresh is True
+        :param ttl: Time in seconds after which an index is rebuilt
+        :param max_indexes: Maximum number of collection indexes held by the resolver
+        :param scanner: (Optional) A callable returning an iterator over the objects of the collection passed as
+                        argument, used by name lookups without a valid index to stop reading once the name is found
+        :param verifier: (Optional) A callable taking a collection, an object id and a name, returning True if the
+                         object with this id still has this name. Names found in an index built from the store are
+                         verified, and the index is read again from the NSX API when the verification fails
+        """
+        self._loader = loader
+        self._scanner = scanner
+        self._verifier = verifier
+        self.store = None
+        self.ttl = ttl
+        self.max_indexes = max_indexes
+        self._indexes = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _valid_index(self, resource):
+        index = self._indexes.pop(resource, None)
+        if index is not None and time.time() - index.created > self.ttl:
+            index = None
+        return index
+
+    def _keep(self, resource, index):
+        self._indexes[resource] = index
+        while len(self._indexes) > self.max_indexes:
+            self._indexes.popitem(last=False)
+        return index
+
+    def _load(self, resource, fresh=False):
+        index = InventoryIndex(self._loader(resource, fresh))
+        index.cached = bool(self.store and not fresh and self.store.from_cache(resource))
+        return index
+
+    def index(self, resource, fresh=False):
+        """
+        :param resource: The NSX collection to index, e.g. 'nsxEdges' or 'logicalSwitchesGlobal'
+        :param fresh: (Optional) Don't use an index built from the on-disk cache, to be set by callers changing
+                      the objects found in the index
+        :return: A valid InventoryIndex of the collection, built from the NSX API if needed
+        """
+        with self._lock:
+            index = self._valid_index(resource)
+            if index is None or (fresh and index.cached):
+                index = self._load(resource, fresh)
+            return self._keep(resource, index)
+
+    def lookup(self, resource, name):
+        """
+        :param resource: The NSX collection searched
+        :param name: The name of the object searched
+        :return: A tuple, with the first item being the object id of the first object found with the right name
+                 and the second item being a copy of the dictionary of the object parameters as returned by the NSX
+                 API. A name missing from an index that was not just read is looked up again in a rebuilt index, as
+                 the object may have been created since
+        """
+        with self._lock:
+            index = self._valid_index(resource)
+            fresh = index is None
+            if index is None and self._scanner and not self.store:
+                # without a valid index, pages are only read until the name is found, a complete scan is indexed
+                scanned = []
+                for obj in self._scanner(resource):
+                    if obj.get('name') == name and obj.get('objectId'):
+                        return obj['objectId'], copy.deepcopy(obj)
+                    scanned.append(obj)
+                index = InventoryIndex(scanned)
+            elif index is None:
+                index = self._load(resource)
+            object_id = index.by_name.get(name)
+            if not object_id and (not fresh or index.cached):
+                index = self._load(resource, fresh=True)
+                object_id = index.by_name.get(name)
+            elif object_id and index.cached and self._verifier and not self._verifier(resource, object_id, name):
+                # the disk copy is only validated against the first page, a later page may have changed
+                index = self._load(resource, fresh=True)
+                object_id = index.by_name.get(name)
+            self._keep(resource, index)
+        if not object_id:
+            return None, None
+        return object_id, copy.deepcopy(index.by_id[object_id])
+
+    def get(self, resource, object_id):
+        """
+        :return: A copy of the dictionary of the object parameters as returned by the NSX API, or None if not found
+        """
+        return copy.deepcopy(self.index(resource).by_id.get(object_id))
+
+    def ids_by_type(self, resource, edge_type):
+        """
+        :return: The list of object ids of the given edgeType (e.g. 'gatewayServices' or 'distributedRouter')
+        """
+        return list(self.index(resource).by_type.get(edge_type, []))
+
+    def invalidate(self, resource=None):
+        """
+        Drops the cached index of one collection, or of all collections when resource is None
+        """
+        with self._lock:
+            if resource:
+                self._indexes.pop(resource, None)
+            else:
+                self._indexes.clear()
+            if self.store:
+                self.store.invalidate(resource)
+
+
+def get_resolver(client_session, ttl=DEFAULT_TTL, max_indexes=DEFAULT_MAX_INDEXES):
+    """
+    :param client_session: An instance of an NsxClient Session
+    :param ttl: Index time to live, only used when the resolver of this session is created
+    :param max_indexes: Maximum number of indexes, only used when the resolver of this session is created
+    :return: The InventoryResolver shared by all lookups done through this session
+    """
+    with _resolvers_lock:
+        resolver = _resolvers.get(client_session)
+        if resolver is None:
+            session_ref = weakref.ref(client_session)
+
+            def loader(resource, fresh=False):
+                if resolver.store:
+                    return resolver.store.load(session_ref(), resource, refresh=fresh)
+                return list(iter_all_pages(session_ref(), resource))
+
+            def scanner(resource):
+                return iter_all_pages(session_ref(), resource)
+
+            def verifier(resource, object_id, name):
+                return object_has_name(session_ref(), resource, object_id, name)
+
+            resolver = InventoryResolver(loader, ttl=ttl, max_indexes=max_indexes, scanner=scanner,
+                                         verifier=verifier)
+            _resolvers[client_session] = resolver
+        return resolver
+
+
+def object_has_name(client_session, resource, object_id, name):
+    """
+    :param client_session: An instance of an NsxClient Session
+    :param resource: The NSX collection of the object, a key of OBJECT_RESOURCES
+    :param object_id: The id of the object
+    :param name: The expected name of the object
+    :return: True if the object with this id exists and has this name, False otherwise or if it can't be read
+    """
+    if resource not in OBJECT_RESOURCES:
+        return False
+    read_resource, id_parameter = OBJECT_RESOURCES[resource]
+    try:
+        body = client_session.read(read_resource, uri_parameters={id_parameter: object_id})['body']
+    except (Exception, SystemExit):
+        # an NsxClient with the default fail_mode 'exit' raises SystemExit when the object is gone
+        return False
+    return any(isinstance(obj, dict) and obj.get('name') == name for obj in (body or {}).values())
+
+
+def invalidate_inventory(client_session, resource=None):
+    """
+    Invalidates the cached indexes of a session, to be called after objects have been created or deleted
+    :param client_session: An instance of an NsxClient Session
+    :param resource: The NSX collection that changed, all collections are invalidated if None
+    """
+    with _resolvers_lock:
+        resolver = _resolvers.get(client_session)
+    if resolver is not None:
+        resolver.invalidate(resource)
+
+
+def find_page(body):
+    """
+    :param body: The body of a paged NSX API response, e.g. the read of 'nsxEdges' or 'logicalSwitchesGlobal'
+    :return: The dictionary holding the 'pagingInfo' and the objects of the page, None if the body is not paged
+    """
+    if isinstance(body, dict):
+        if 'pagingInfo' in body:
+            return body
+        for value in body.values():
+            page = find_page(value)
+            if page is not None:
+                return page
+    return None
+
+
+def page_objects(client_session, page):
+    """
+    :param client_session: An instance of an NsxClient Session
+    :param page: A page dictionary as returned by find_page
+    :return: The list of objects contained in the page
+    """
+    objects = []
+    for key, value in page.items():
+        if key != 'pagingInfo' and value:
+            objects.extend(client_session.normalize_list_return(value))
+    return objects
+
+
+def iter_all_pages(client_session, resource, uri_parameters=None, query_parameters=None, match=None,
+                   first_body=None):
+    """
+    This function yields the objects of a paged NSX collection page by page as they are read, instead of
+    materializing the whole collection as read_all_pages does. Stopping the iteration early stops reading pages,
+    and the pages, objects and bytes transferred are recorded in the transfer log once the iteration ends
+    :param client_session: An instance of an NsxClient Session
+    :param resource: The paged NSX collection, e.g. 'nsxEdges' or 'logicalSwitchesGlobal'
+    :param uri_parameters: (Optional) The uri parameters of the collection
+    :param query_parameters: (Optional) Additional query parameters, e.g. filters supported by the collection or
+                             pagesize
+    :param match: (Optional) A callable used to filter the objects locally, for filters the API does not support
+    :param first_body: (Optional) The body of the first page, when already read by the caller with the same
+                       parameters, so that it is not read again
+    :return: A generator of the object dictionaries as returned by the NSX API
+    """
+    query_parameters = dict(query_parameters or {})
+    filters = dict(query_parameters)
+    start_index = 0
+    pages = received = kept = 0
+    listing = new_listing()
+    bytes_before = transferred_bytes()
+    try:
+        while True:
+            # the NSX API and nsxramlclient's read_all_pages page with the lowercase startindex and pagesize
+            query_parameters['startindex'] = start_index
+            pages += 1
+            if start_index == 0 and first_body is not None:
+                body = first_body
+            else:
+                with listing_page(listing, pages):
+                    body = client_session.read(resource, uri_parameters=uri_parameters,
+                                               query_parameters_dict=query_parameters)['body']
+            page = find_page(body)
+            if page is None:
+                return
+            objects = page_objects(client_session, page)
+            received += len(objects)
+            for obj in objects:
+                if match is None or match(obj):
+                    kept += 1
+                    yield obj
+            start_index += len(objects)
+            if not objects or start_index >= int(page['pagingInfo'].get('totalCount') or 0):
+                return
+    finally:
+        _transfer_log.append((resource, filters, pages, received, kept, transferred_bytes() - bytes_before))
+
+
+def iter_edges(client_session, edge_type=None, datacenter=None, tenant=None, name=None):
+    """
+    This function yields the NSX edges matching the filters, pushing down to the NSX API the filters supported by
+    the edges listing (datacenter and tenant) and applying the others (edge type and name) locally
+    :param client_session: An instance of an NsxClient Session
+    :param edge_type: (Optional) The edgeType of the edges, 'gatewayServices' or 'distributedRouter'
+    :param datacenter: (Optional) The managed object id of the vCenter DC the edges are deployed in
+    :param tenant: (Optional) The tenant of the edges
+    :param name: (Optional) The name of the edges
+    :return: A generator of the edge summary dictionaries as returned by the NSX API
+    """
+    query_parameters = {}
+    if datacenter:
+        query_parameters['datacenter'] = datacenter
+    if tenant:
+        query_parameters['tenant'] = tenant
+    match = None
+    if edge_type or name:
+        def match(edge):
+            return (not edge_type or edge.get('edgeType') == edge_type) and (not name or edge.get('name') == name)
+    return iter_all_pages(client_session, 'nsxEdges', query_parameters=query_parameters, match=match)
+
+
+def transfer_log():
+    """
+    :return: The list of the last paged reads of this process, as tuples of (resource, query filters, pages read,
+             objects received, objects kept after local filtering, bytes received)
+    """
+    return list(_transfer_log)
+
+
+class DiskInventoryCache(object):
+    """
+    SQLite backed copy of the NSX inventories of one NSX Manager, shared between CLI invocations. A cached inventory
+    is revalidated by reading the first page only and comparing its paging info and content with the stored one,
+    changes in later pages go unnoticed, so the resolver verifies the objects it finds in a cached inventory
+    """
+    def __init__(self, nsx_manager, cache_dir=DEFAULT_CACHE_DIR, refresh=False):
+        """
+        :param nsx_manager: The NSX Manager the cached inventories are read from
+        :param cache_dir: The directory holding the cache database
+        :param refresh: When True the cached inventories are ignored and rewritten on first use
+        """
+        self.nsx_manager = nsx_manager
+        self.refresh = refresh
+        self._refreshed = set()
+        self._cached = set()
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, 0o700)
+        self.path = os.path.join(cache_dir, 'inventory.sqlite')
+        self._lock = threading.Lock()
+        self._execute('CREATE TABLE IF NOT EXISTS inventory (manager TEXT, resource TEXT, total_count TEXT, '
+                      'page_size TEXT, fingerprint TEXT, updated REAL, objects TEXT, '
+                      'PRIMARY KEY (manager, resource))')
+
+    def _execute(self, statement, parameters=()):
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                return db.execute(statement, parameters).fetchone()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _first_page_signature(client_session, resource):
+        """
+        :return: A tuple with the total count, the page size and the content fingerprint of the first page of the
+                 collection, and the body of the first page
+        """
+        body = client_session.read(resource, query_parameters_dict={'startindex': 0})['body']
+        first_page = find_page(body)
+        if first_page is None:
+            return (None, None, None), body
+        paging_info = first_page['pagingInfo']
+        fingerprint = hashlib.sha1(json.dumps(page_objects(client_session, first_page), sort_keys=True)).hexdigest()
+        return (paging_info.get('totalCount'), paging_info.get('pageSize'), fingerprint), body
+
+    def load(self, client_session, resource, refresh=False):
+        """
+        :param client_session: An instance of an NsxClient Session
+        :param resource: The NSX collection to load, e.g. 'nsxEdges' or 'logicalSwitchesGlobal'
+        :param refresh: (Optional) Read the collection from the NSX API and rewrite its cached copy
+        :return: The list of objects of the collection, from the cache if still valid or from the NSX API
+        """
+        (total_count, page_size, fingerprint), first_body = self._first_page_signature(client_session, resource)
+        with self._lock:
+            refresh = refresh or (self.refresh and resource not in self._refreshed)
+            row = self._execute('SELECT total_count, page_size, fingerprint, objects FROM inventory '
+                                'WHERE manager = ? AND resource = ?', (self.nsx_manager, resource))
+            if row and not refresh and fingerprint and tuple(row[:3]) == (total_count, page_size, fingerprint):
+                self._cached.add(resource)
+                return json.loads(row[3])
+
+            self._cached.discard(resource)
+            # the full listing starts from the first page read for the signature
+            objects = list(iter_all_pages(client_session, resource, first_body=first_body))
+            self._execute('INSERT OR REPLACE INTO inventory VALUES (?, ?, ?, ?, ?, ?, ?)',
+                          (self.nsx_manager, resource, total_count, page_size, fingerprint, time.time(),
+                           json.dumps(objects)))
+            self._refreshed.add(resource)
+            return objects
+
+    def from_cache(self, resource):
+        """
+        :return: True if the last load of this collection was served from the cached copy
+        """
+        return resource in self._cached
+
+    def invalidate(self, resource=None):
+        """
+        Removes the cached copy of one collection, or of all collections of this NSX Manager when resource is None
+        """
+        with self._lock:
+            if resource:
+                self._execute('DELETE FROM inventory WHERE manager = ? AND resource = ?', (self.nsx_manager, resource))
+            else:
+                self._execute('DELETE FROM inventory WHERE manager = ?', (self.nsx_manager,))
+
+
+def enable_disk_cache(client_session, nsx_manager, cache_dir=DEFAULT_CACHE_DIR, refresh=False):
+    """
+    Makes the lookups of a session use the on-disk inventory cache of its NSX Manager
+    :param client_session: An instance of an NsxClient Session
+    :param nsx_manager: The NSX Manager the session is connected to, used as the cache key
+    :param cache_dir: (Optional) The directory holding the cache database
+    :param refresh: (Optional) Ignore and rewrite the cached inventories
+    :return: The DiskInventoryCache instance attached to the session
+    """
+    store = DiskInventoryCache(nsx_manager, cache_dir=cache_dir, refresh=refresh)
+    get_resolver(client_session).store = store
+    return store
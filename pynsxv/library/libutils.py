@@ -24,16 +24,45 @@
 
 __author__ = 'yfauser'
 
-from pyVim.connect import SmartConnect
-from pyVmomi import vim
+from pyVim.connect import SmartConnect, Disconnect
+from pyVmomi import vim, vmodl
+from inventory import get_resolver, enable_disk_cache, invalidate_inventory, transfer_log, DEFAULT_TTL
+from ramlcache import load_nsx_client
+from httppool import configure_http_pool, http_pool_stats, DEFAULT_POOL_SIZE
+from instrumentation import instrument_session
+import atexit
+import csv
+import json
+import os
 import ssl
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
 
 
 VIM_TYPES = {'datacenter': [vim.Datacenter],
              'dvs_name': [vim.dvs.VmwareDistributedVirtualSwitch],
              'datastore_name': [vim.Datastore],
              'resourcepool_name': [vim.ResourcePool],
-             'host': [vim.HostSystem]}
+             'host': [vim.HostSystem],
+             'folder': [vim.Folder],
+             'compute_resource': [vim.ComputeResource],
+             'network': [vim.Network]}
+
+PROPERTY_BATCH_SIZE = 1000
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+_vc_inventories = weakref.WeakKeyDictionary()
+_vc_inventories_lock = threading.Lock()
 
 
 def get_scope(client_session, transport_zone_name):
@@ -61,34 +90,239 @@ def get_logical_switch(client_session, logical_switch_name):
     :return: A tuple, with the first item being the logical switch id as string of the first Scope found with the
              right name and the second item being a dictionary of the logical parameters as return by the NSX API
     """
-    all_lswitches = client_session.read_all_pages('logicalSwitchesGlobal', 'read')
-    try:
-        logical_switch_params = [scope for scope in all_lswitches if scope['name'] == logical_switch_name][0]
-        logical_switch_id = logical_switch_params['objectId']
-    except IndexError:
-        return None, None
-
-    return logical_switch_id, logical_switch_params
+    return get_resolver(client_session).lookup('logicalSwitchesGlobal', logical_switch_name)
 
 
 def get_mo_by_name(content, searchedname, vim_type):
     mo_dict = get_all_objs(content, vim_type)
-    for obj in mo_dict:
-        if obj.name == searchedname:
+    for obj, name in mo_dict.items():
+        if name == searchedname:
             return obj
     return None
 
 
 def get_all_objs(content, vimtype):
-    obj = {}
-    container = content.viewManager.CreateContainerView(content.rootFolder, vimtype, True)
-    for managed_object_ref in container.view:
-        obj.update({managed_object_ref: managed_object_ref.name})
-    container.Destroy()
-    return obj
+    return dict((managed_object_ref, properties.get('name'))
+                for managed_object_ref, properties in retrieve_properties(content, vimtype, ['name']))
 
 
-def connect_to_vc(vchost, user, pwd):
+def retrieve_properties(content, vimtype, path_set, batch_size=PROPERTY_BATCH_SIZE):
+    """
+    Retrieves properties of all the managed objects of some types with PropertyCollector.RetrievePropertiesEx,
+    instead of one round trip per object and property
+    :param content: The vCenter content, as returned by connect_to_vc
+    :param vimtype: A list of managed object types, e.g. VIM_TYPES['host']
+    :param path_set: The list of property paths to retrieve, e.g. ['name', 'hardware.cpuInfo.numCpuPackages'], or a
+                     dictionary of lists keyed by managed object type to retrieve different properties per type
+    :param batch_size: (Optional) The maximum number of objects returned per round trip
+    :return: A list of tuples with item 0 containing the managed object and item 1 a dictionary of the retrieved
+             properties keyed by property path, unset properties are absent from the dictionary
+    """
+    collector = content.propertyCollector
+    view = content.viewManager.CreateContainerView(content.rootFolder, vimtype, True)
+    try:
+        traversal_spec = vmodl.query.PropertyCollector.TraversalSpec(name='traverseEntities', path='view',
+                                                                     skip=False, type=vim.view.ContainerView)
+        object_spec = vmodl.query.PropertyCollector.ObjectSpec(obj=view, skip=True, selectSet=[traversal_spec])
+        property_specs = [vmodl.query.PropertyCollector.PropertySpec(
+            type=mo_type, pathSet=path_set[mo_type] if isinstance(path_set, dict) else path_set, all=False)
+            for mo_type in vimtype]
+        filter_spec = vmodl.query.PropertyCollector.FilterSpec(objectSet=[object_spec], propSet=property_specs)
+        options = vmodl.query.PropertyCollector.RetrieveOptions(maxObjects=batch_size)
+
+        records = []
+        result = collector.RetrievePropertiesEx([filter_spec], options)
+        while result:
+            for object_content in result.objects:
+                records.append((object_content.obj,
+                                dict((prop.name, prop.val) for prop in object_content.propSet or [])))
+            if not result.token:
+                break
+            result = collector.ContinueRetrievePropertiesEx(result.token)
+    finally:
+        view.Destroy()
+    return records
+
+
+class PropertyWatcher(object):
+    """
+    Tracks properties of all the managed objects of some types with a PropertyCollector filter and
+    WaitForUpdatesEx, so that every poll only transfers the objects that changed since the previous poll. The update
+    versions are only valid in the vCenter session the watcher was created in
+    """
+    def __init__(self, content, vimtype, path_set):
+        """
+        :param content: The vCenter content, as returned by connect_to_vc
+        :param vimtype: A list of managed object types, e.g. VIM_TYPES['host']
+        :param path_set: The list of property paths to track, e.g. ['hardware.cpuInfo.numCpuPackages', 'vm']
+        """
+        # a dedicated collector, so that the versions of this watcher are not shared with other filters
+        self._collector = content.propertyCollector.CreatePropertyCollector()
+        self._view = content.viewManager.CreateContainerView(content.rootFolder, vimtype, True)
+        traversal_spec = vmodl.query.PropertyCollector.TraversalSpec(name='traverseEntities', path='view',
+                                                                     skip=False, type=vim.view.ContainerView)
+        object_spec = vmodl.query.PropertyCollector.ObjectSpec(obj=self._view, skip=True, selectSet=[traversal_spec])
+        property_specs = [vmodl.query.PropertyCollector.PropertySpec(type=mo_type, pathSet=path_set, all=False)
+                          for mo_type in vimtype]
+        filter_spec = vmodl.query.PropertyCollector.FilterSpec(objectSet=[object_spec], propSet=property_specs)
+        self._collector.CreateFilter(filter_spec, partialUpdates=False)
+        self.version = ''
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def poll(self):
+        """
+        Applies the changes that happened since the previous poll, the first poll retrieves all the objects
+        :return: The set of managed objects that entered, changed or left since the previous poll
+        """
+        options = vmodl.query.PropertyCollector.WaitOptions(maxWaitSeconds=0)
+        changed = set()
+        with self._lock:
+            while True:
+                update_set = self._collector.WaitForUpdatesEx(self.version, options)
+                if update_set is None:
+                    break
+                self.version = update_set.version
+                for filter_update in update_set.filterSet or []:
+                    for object_update in filter_update.objectSet or []:
+                        changed.add(object_update.obj)
+                        if object_update.kind == 'leave':
+                            self.objects.pop(object_update.obj, None)
+                            continue
+                        properties = self.objects.setdefault(object_update.obj, {})
+                        for change in object_update.changeSet or []:
+                            if change.op in ('remove', 'indirectRemove'):
+                                properties.pop(change.name, None)
+                            else:
+                                properties[change.name] = change.val
+                if not update_set.truncated:
+                    break
+        return changed
+
+    def destroy(self):
+        """
+        Destroys the PropertyCollector and the ContainerView of the watcher in vCenter. Errors are ignored, as both
+        are already gone when the vCenter session expired
+        """
+        for destroy in (self._collector.DestroyPropertyCollector, self._view.DestroyView):
+            try:
+                destroy()
+            except Exception:
+                pass
+
+
+def get_property_watcher(content, vimtype, path_set):
+    """
+    :param content: The vCenter content, as returned by connect_to_vc or get_vccontent
+    :param vimtype: A list of managed object types, e.g. VIM_TYPES['host']
+    :param path_set: The list of property paths to track
+    :return: The PropertyWatcher of these types and properties kept by a LazyVcContent for as long as its vCenter
+             session lives, a new PropertyWatcher for other contents
+    """
+    if isinstance(content, LazyVcContent):
+        return content.watcher(vimtype, path_set)
+    return PropertyWatcher(content, vimtype, path_set)
+
+
+class VcInventoryIndex(object):
+    """
+    Dictionary indexes of the vCenter datacenters, datastores, compute resources and networks, built from a single
+    paginated PropertyCollector retrieval. Objects are keyed by (datacenter name, object name), the first object
+    found wins when names are duplicated in a datacenter
+    """
+    PATH_SETS = OrderedDict([(vim.Datacenter, ['name']),
+                             (vim.Folder, ['parent']),
+                             (vim.Datastore, ['name', 'parent']),
+                             (vim.ComputeResource, ['name', 'parent', 'resourcePool']),
+                             (vim.Network, ['name', 'parent'])])
+
+    def __init__(self, content):
+        """
+        :param content: The vCenter content, as returned by connect_to_vc
+        """
+        self.created = time.time()
+        self.datacenters = {}
+        self.datastores = {}
+        self.clusters = {}
+        self.networks = {}
+        records = retrieve_properties(content, list(self.PATH_SETS), self.PATH_SETS)
+        parents = dict((managed_object_ref, properties.get('parent')) for managed_object_ref, properties in records)
+        datacenter_names = {}
+        for managed_object_ref, properties in records:
+            if isinstance(managed_object_ref, vim.Datacenter):
+                datacenter_names[managed_object_ref] = properties.get('name')
+                self.datacenters.setdefault(properties.get('name'), managed_object_ref)
+        for managed_object_ref, properties in records:
+            if isinstance(managed_object_ref, vim.Datastore):
+                objects = self.datastores
+            elif isinstance(managed_object_ref, vim.ComputeResource):
+                objects = self.clusters
+            elif isinstance(managed_object_ref, vim.Network):
+                objects = self.networks
+            else:
+                continue
+            parent = properties.get('parent')
+            while parent is not None and parent not in datacenter_names:
+                parent = parents.get(parent)
+            if parent is not None:
+                objects.setdefault((datacenter_names[parent], properties.get('name')), (managed_object_ref, properties))
+
+    def datacenter(self, datacenter_name):
+        """
+        :return: The datacenter managed object with this name, or None
+        """
+        return self.datacenters.get(datacenter_name)
+
+    def datastore(self, datacenter_name, datastore_name):
+        """
+        :return: The datastore managed object with this name in the datacenter, or None
+        """
+        return self.datastores.get((datacenter_name, datastore_name), (None, None))[0]
+
+    def cluster(self, datacenter_name, cluster_name):
+        """
+        :return: A tuple with the compute resource managed object with this name in the datacenter and a dictionary
+                 of its name, parent and resourcePool properties, or (None, None)
+        """
+        return self.clusters.get((datacenter_name, cluster_name), (None, None))
+
+    def network(self, datacenter_name, network_name):
+        """
+        :return: The network or vDS port group managed object with this name in the datacenter, or None
+        """
+        return self.networks.get((datacenter_name, network_name), (None, None))[0]
+
+
+def get_vc_inventory(content, ttl=DEFAULT_TTL, stale=None):
+    """
+    :param content: The vCenter content, as returned by connect_to_vc or get_vccontent
+    :param ttl: Time in seconds after which the index is rebuilt
+    :param stale: (Optional) An index in which a lookup missed, rebuilt unless it was already replaced
+    :return: The VcInventoryIndex of this content, kept by a LazyVcContent for as long as its vCenter session lives
+             and for as long as the content lives otherwise, and rebuilt once older than ttl
+    """
+    if isinstance(content, LazyVcContent):
+        return content.inventory(ttl, stale)
+    with _vc_inventories_lock:
+        index = _vc_inventories.get(content)
+        if index is None or index is stale or time.time() - index.created > ttl:
+            index = VcInventoryIndex(content)
+            _vc_inventories[content] = index
+        return index
+
+
+def _vc_lookup(content, lookup, *args):
+    started = time.time()
+    index = get_vc_inventory(content)
+    result = getattr(index, lookup)(*args)
+    found = result[0] if isinstance(result, tuple) else result
+    if found is None and index.created < started:
+        # the object may have been created since the index was built, which is then rebuilt once
+        result = getattr(get_vc_inventory(content, stale=index), lookup)(*args)
+    return result
+
+
+def _vc_service_instance(vchost, user, pwd):
     # Disabling SSL certificate verification
     if hasattr(ssl, 'SSLContext'):
         context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
@@ -107,7 +341,170 @@ def connect_to_vc(vchost, user, pwd):
     else:
         service_instance = SmartConnect(host=host, port=port, user=user, pwd=pwd)
 
-    return service_instance.RetrieveContent()
+    return service_instance
+
+
+def connect_to_vc(vchost, user, pwd):
+    return _vc_service_instance(vchost, user, pwd).RetrieveContent()
+
+
+class LazyVcContent(object):
+    """
+    Stands in for the vCenter content returned by connect_to_vc. The vCenter login only happens on the first
+    attribute access, so commands that never use vCenter don't pay for it, and the session is logged out at exit
+    """
+    def __init__(self, vchost, user, pwd):
+        self._vc_params = (vchost, user, pwd)
+        self._service_instance = None
+        self._content = None
+        self._watchers = {}
+        self._inventory = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.content, name)
+
+    @property
+    def content(self):
+        """
+        :return: The vCenter ServiceContent, logging in to vCenter if not done yet
+        """
+        with self._lock:
+            if self._content is None:
+                self._service_instance = _vc_service_instance(*self._vc_params)
+                self._content = self._service_instance.RetrieveContent()
+                atexit.register(self.disconnect)
+        return self._content
+
+    @property
+    def connected(self):
+        return self._service_instance is not None
+
+    def watcher(self, vimtype, path_set):
+        """
+        :return: The PropertyWatcher of these types and properties in the current vCenter session
+        """
+        content = self.content
+        key = (tuple(mo_type.__name__ for mo_type in vimtype), tuple(path_set))
+        with self._lock:
+            if key not in self._watchers:
+                self._watchers[key] = PropertyWatcher(content, vimtype, path_set)
+            return self._watchers[key]
+
+    def inventory(self, ttl=DEFAULT_TTL, stale=None):
+        """
+        :param stale: (Optional) An index in which a lookup missed, rebuilt unless it was already replaced
+        :return: The VcInventoryIndex of the current vCenter session, rebuilt once older than ttl seconds
+        """
+        content = self.content
+        with self._lock:
+            if self._inventory is None or self._inventory is stale or time.time() - self._inventory.created > ttl:
+                self._inventory = VcInventoryIndex(content)
+            return self._inventory
+
+    def invalidate_inventory(self):
+        """
+        Drops the VcInventoryIndex, so that the next lookup retrieves the vCenter inventory again
+        """
+        with self._lock:
+            self._inventory = None
+
+    def drop_if_expired(self):
+        """
+        Forgets the vCenter session if it timed out, so that the next attribute access logs in again
+        """
+        with self._lock:
+            if self._content is not None and self._content.sessionManager.currentSession is None:
+                self._forget()
+
+    def disconnect(self):
+        """
+        Logs out of vCenter if a session was opened
+        """
+        with self._lock:
+            if self._service_instance is not None:
+                service_instance = self._service_instance
+                self._forget()
+                Disconnect(service_instance)
+
+    def _forget(self):
+        for watcher in self._watchers.values():
+            watcher.destroy()
+        self._service_instance = None
+        self._content = None
+        self._watchers = {}
+        self._inventory = None
+
+
+def get_vccontent(config):
+    """
+    :param config: A ConfigParser instance holding the vcenter section of the nsx.ini file
+    :return: A LazyVcContent for this vCenter, shared by all the commands run in this process
+    """
+    key = ('vcenter', config.get('vcenter', 'vcenter'), config.get('vcenter', 'vcenter_user'),
+           config.get('vcenter', 'vcenter_passwd'))
+    with _sessions_lock:
+        if key not in _sessions:
+            _sessions[key] = LazyVcContent(*key[1:])
+        return _sessions[key]
+
+
+def drop_expired_sessions():
+    """
+    Forgets the shared vCenter sessions that timed out, to be called by long lived processes before every command
+    """
+    with _sessions_lock:
+        vccontents = [session for session in _sessions.values() if isinstance(session, LazyVcContent)]
+    for vccontent in vccontents:
+        vccontent.drop_if_expired()
+
+
+def _print_http_pool_stats():
+    opened, reused = http_pool_stats()
+    print 'HTTP connections to NSX: {} opened, {} requests reused an opened connection'.format(opened, reused)
+
+
+def _print_transfer_log():
+    for resource, filters, pages, received, kept, received_bytes in transfer_log():
+        print 'NSX read {}{}: {} pages, {} objects received, {} kept, {} bytes'.format(
+            resource, ' {}'.format(filters) if filters else '', pages, received, kept, received_bytes)
+
+
+def connect_to_nsx(config, args):
+    """
+    :param config: A ConfigParser instance holding the nsxraml and nsxv sections of the nsx.ini file, the optional
+                   nsxv http_pool_size option sets the number of kept alive connections to the NSX Manager
+    :param args: The parsed command line arguments, honoring debug, no_cache and refresh_cache
+    :return: An instance of an NsxClient Session built from the RAML spec cache, with its lookups backed by the
+             on-disk inventory cache unless disabled with --no-cache. Sessions are shared by all the commands run
+             in this process, --refresh-cache also drops the vCenter inventory of the shared vCenter sessions
+    """
+    nsx_manager = config.get('nsxv', 'nsx_manager')
+    key = ('nsxv', config.get('nsxraml', 'nsxraml_file'), nsx_manager, config.get('nsxv', 'nsx_username'),
+           config.get('nsxv', 'nsx_password'), bool(getattr(args, 'debug', False)), getattr(args, 'no_cache', False))
+    with _sessions_lock:
+        client_session = _sessions.get(key)
+        if client_session is None:
+            client_session = instrument_session(load_nsx_client(*key[1:6]))
+            if config.has_option('nsxv', 'http_pool_size'):
+                configure_http_pool(client_session, config.getint('nsxv', 'http_pool_size'))
+            else:
+                configure_http_pool(client_session, DEFAULT_POOL_SIZE)
+            if getattr(args, 'debug', False):
+                atexit.register(_print_http_pool_stats)
+                atexit.register(_print_transfer_log)
+            if not getattr(args, 'no_cache', False):
+                enable_disk_cache(client_session, nsx_manager, refresh=getattr(args, 'refresh_cache', False))
+            _sessions[key] = client_session
+        elif getattr(args, 'refresh_cache', False):
+            invalidate_inventory(client_session)
+        vccontents = [session for session in _sessions.values() if isinstance(session, LazyVcContent)]
+    if getattr(args, 'refresh_cache', False):
+        for vccontent in vccontents:
+            vccontent.invalidate_inventory()
+    return client_session
 
 
 def get_edge(client_session, edge_name):
@@ -117,62 +514,106 @@ def get_edge(client_session, edge_name):
     :return: A tuple, with the first item being the edge or dlr id as string of the first Scope found with the
              right name and the second item being a dictionary of the logical parameters as return by the NSX API
     """
-    all_edge = client_session.read_all_pages('nsxEdges', 'read')
+    return get_resolver(client_session).lookup('nsxEdges', edge_name)
 
-    try:
-        edge_params = [scope for scope in all_edge if scope['name'] == edge_name][0]
-        edge_id = edge_params['objectId']
-    except IndexError:
-        return None, None
 
-    return edge_id, edge_params
+def _moid(managed_object_ref):
+    return managed_object_ref._moId.encode("ascii") if managed_object_ref is not None else None
 
 
 def get_datacentermoid(content, datacenter_name):
-    datacenter_list = content.rootFolder.childEntity
-    for datacenter in datacenter_list:
-        if datacenter.name == datacenter_name:
-            datacentermoid = datacenter._moId
-            return datacentermoid.encode("ascii")
-    return None
+    return _moid(_vc_lookup(content, 'datacenter', datacenter_name))
 
 
 def get_datastoremoid(content, datacenter_name, edge_datastore):
-    datacenter_list = content.rootFolder.childEntity
-    for datacenter in datacenter_list:
-        if datacenter.name == datacenter_name:
-            for datastore in datacenter.datastore:
-                if datastore.name == edge_datastore:
-                    datastorename = datastore._moId
-                    return datastorename.encode("ascii")
-    return None
+    return _moid(_vc_lookup(content, 'datastore', datacenter_name, edge_datastore))
 
 
 def get_edgeresourcepoolmoid(content, datacenter_name, edge_cluster):
-    datacenter_list = content.rootFolder.childEntity
-    for datacenter in datacenter_list:
-        if datacenter.name == datacenter_name:
-            cluster_list = datacenter.hostFolder.childEntity
-            for cluster in cluster_list:
-                if cluster.name == edge_cluster:
-                    resourcepoolid = cluster.resourcePool._moId
-                    return resourcepoolid.encode("ascii")
-    return None
+    cluster, properties = _vc_lookup(content, 'cluster', datacenter_name, edge_cluster)
+    return _moid(properties.get('resourcePool')) if properties else None
 
 
 def get_vdsportgroupid(content, datacenter_name, switch_name):
-    datacenter_list = content.rootFolder.childEntity
-    vdsportgroupid = ""
-    for datacenter in datacenter_list:
-        if datacenter.name == datacenter_name:
-            network_list = datacenter.network
-            for network in network_list:
-                if network.name == switch_name:
-                    vdsportgroupid = network._moId
-    if vdsportgroupid:
-        return vdsportgroupid.encode("ascii")
-    else:
-        return None
+    return _moid(_vc_lookup(content, 'network', datacenter_name, switch_name))
+
+
+def get_switch_id(client_session, vccontent, datacenter_name, switch_name):
+    """
+    :param client_session: An instance of an NsxClient Session
+    :param vccontent: The vCenter content, as returned by connect_to_vc
+    :param datacenter_name: The vCenter datacenter of the vDS port group
+    :param switch_name: The name of a vDS port group or of an NSX logical switch
+    :return: The id of the vDS port group with this name if found, else of the NSX logical switch, or None
+    """
+    switch_id = get_vdsportgroupid(vccontent, datacenter_name, switch_name)
+    if not switch_id:
+        switch_id, switch_params = get_logical_switch(client_session, switch_name)
+    return switch_id
+
+
+def read_records(file_name):
+    """
+    This function reads a list of records, e.g. routes or interface specs, or a topology document from a file
+    :param file_name: A .csv file with a header line, or a .json, .yaml or .yml file
+    :return: A list of dictionaries for csv files, empty cells are left out of the dictionaries. The document held by
+             json and yaml files
+    """
+    extension = os.path.splitext(file_name)[1].lower()
+    with open(file_name) as records_file:
+        if extension == '.csv':
+            return [dict((key.strip(), value.strip()) for key, value in row.items() if key and value and value.strip())
+                    for row in csv.DictReader(records_file)]
+        elif extension in ('.yaml', '.yml'):
+            assert yaml, 'PyYAML must be installed to read {}'.format(file_name)
+            return yaml.safe_load(records_file) or []
+        else:
+            return json.load(records_file)
+
+
+def print_list_stream(items):
+    """
+    This function prints items exactly as printing the list of the items would, but one item at a time as the
+    items are generated
+    """
+    sys.stdout.write('[')
+    for count, item in enumerate(items):
+        if count:
+            sys.stdout.write(', ')
+        sys.stdout.write(repr(item))
+    sys.stdout.write(']\n')
+
+
+def _table_line(cells, widths, separator='|', padding=' '):
+    return separator + separator.join(padding + cell.ljust(width, padding) + padding
+                                      for cell, width in zip(cells, widths)) + separator
+
+
+def print_table_stream(rows, headers, batch_size=100):
+    """
+    This function prints rows as a psql formatted table as they are generated. The column widths are computed on the
+    headers and the first batch_size rows, longer values in later rows extend their own row only
+    :param rows: An iterable of tuples
+    :param headers: The list of column headers
+    :param batch_size: (Optional) The number of rows read before the table starts to be printed
+    """
+    rows = iter(rows)
+    first_rows = []
+    for row in rows:
+        first_rows.append(tuple(unicode(cell) for cell in row))
+        if len(first_rows) >= batch_size:
+            break
+    widths = [max([len(header)] + [len(row[column]) for row in first_rows]) for column, header in enumerate(headers)]
+    border = _table_line([''] * len(widths), widths, separator='+', padding='-')
+    print border
+    print _table_line(headers, widths)
+    print _table_line([''] * len(widths), widths, separator='|', padding='-').replace('-|-', '-+-')
+    for row in first_rows:
+        print _table_line(row, widths)
+    sys.stdout.flush()
+    for row in rows:
+        print _table_line([unicode(cell) for cell in row], widths)
+    print border
 
 
 def check_for_parameters(mandatory, args):
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# coding=utf-8
+#
+# Copyright © 2015-2016 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the X11 (MIT) (the “License”) set forth below;
+#
+# you may not use this file except in compliance with the License. Unless required by applicable law or agreed to in
+# writing, software distributed under the License is distributed on an “AS IS” BASIS, without warranties or conditions
+# of any kind, EITHER EXPRESS OR IMPLIED. See the License for the specific language governing permissions and
+# limitations under the License. Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# "THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.”
+
+__author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
+
+import ConfigParser
+from collections import OrderedDict
+from tabulate import tabulate
+from parallel import fan_out
+
+
+SITE_SECTIONS = ('nsxv', 'vcenter', 'defaults')
+DEFAULT_SITE = 'default'
+
+
+def get_sites(config):
+    """
+    :param config: A ConfigParser instance of the nsx.ini file
+    :return: The list of site names, the default site of the [nsxv] section first, followed by the sites defined
+             with [nsxv:<site>] sections in file order
+    """
+    sites = [section.split(':', 1)[1] for section in config.sections() if section.startswith('nsxv:')]
+    assert DEFAULT_SITE not in sites, '[nsxv:{0}] is reserved, the {0} site is the [nsxv] section'.format(
+        DEFAULT_SITE)
+    return [DEFAULT_SITE] + sites
+
+
+def site_config(config, site):
+    """
+    This function returns the configuration of one site, as a ConfigParser instance where the nsxv, vcenter and
+    defaults sections hold the options of the [nsxv:<site>], [vcenter:<site>] and [defaults:<site>] sections, with
+    the options missing in a site section taken from the section without site
+    :param config: A ConfigParser instance of the nsx.ini file
+    :param site: The site name, None or DEFAULT_SITE for the configuration of the sections without site
+    :return: A ConfigParser instance usable by connect_to_nsx and get_vccontent
+    """
+    result = ConfigParser.ConfigParser()
+    for section in config.sections():
+        if ':' not in section:
+            result.add_section(section)
+            for option, value in config.items(section, raw=True):
+                result.set(section, option, value)
+    if site and site != DEFAULT_SITE:
+        for section in SITE_SECTIONS:
+            site_section = '{}:{}'.format(section, site)
+            if config.has_section(site_section):
+                if not result.has_section(section):
+                    result.add_section(section)
+                for option, value in config.items(site_section, raw=True):
+                    result.set(section, option, value)
+    return result
+
+
+def get_site_configs(config, sites=None):
+    """
+    :param config: A ConfigParser instance of the nsx.ini file
+    :param sites: (Optional) Comma separated names of the sites to use, all the sites of the file if None
+    :return: An OrderedDict keyed by site name holding the site configurations, the default site included
+    """
+    all_sites = get_sites(config)
+    selected = [site.strip() for site in sites.split(',') if site.strip()] if sites else all_sites
+    for site in selected:
+        assert site in all_sites, 'unknown site {}, the sites are {}'.format(site, ', '.join(all_sites))
+    return OrderedDict((site, site_config(config, site)) for site in selected)
+
+
+def single_site_config(config, sites=None):
+    """
+    :param config: A ConfigParser instance of the nsx.ini file
+    :param sites: (Optional) The name of the site to use, the default site of the [nsxv] section if None
+    :return: The configuration of one site, for the commands that don't fan out to all sites
+    """
+    if not sites:
+        return site_config(config, DEFAULT_SITE)
+    site_configs = get_site_configs(config, sites)
+    assert len(site_configs) == 1, 'this command runs on one site, select one of {} with --site'.format(
+        ', '.join(site_configs))
+    return site_configs.values()[0]
+
+
+def run_on_sites(site_configs, func, timeout=None):
+    """
+    Runs func for every site concurrently, a slow or failing site doesn't delay the results of the others beyond
+    timeout
+    :param site_configs: An OrderedDict as returned by get_site_configs
+    :param func: The function to call, with a site configuration as its only argument, returning a list of rows
+    :param timeout: (Optional) Maximum time in seconds to wait for all the sites, no limit if None
+    :return: An OrderedDict keyed by site name, with values being tuples with item 0 containing the rows returned
+             by func, item 1 the exception it raised and item 2 its duration in seconds
+    """
+    return fan_out(OrderedDict((site, lambda config=config: func(config)) for site, config in site_configs.items()),
+                   timeout=timeout)
+
+
+def print_site_results(results, headers):
+    """
+    This function prints the rows of all the sites merged in one table with a site column, followed by the result
+    and timing of every site
+    :param results: An OrderedDict as returned by run_on_sites
+    :param headers: The headers of the rows returned by the sites
+    """
+    rows = []
+    timings = []
+    for site, (site_rows, error, duration) in results.items():
+        if error is None:
+            rows.extend((site,) + tuple(row) for row in site_rows)
+        timings.append((site, 'ok' if error is None else 'FAILED: {}'.format(error),
+                        len(site_rows) if error is None else 0, '{:.1f}'.format(duration)))
+    print tabulate(rows, headers=["Site"] + list(headers), tablefmt="psql")
+    print tabulate(timings, headers=["Site", "Result", "Rows", "Time (s)"], tablefmt="psql")
@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# coding=utf-8
+#
+# Copyright © 2015-2016 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the X11 (MIT) (the “License”) set forth below;
+#
+# you may not use this file except in compliance with the License. Unless required by applicable law or agreed to in
+# writing, software distributed under the License is distributed on an “AS IS” BASIS, without warranties or conditions
+# of any kind, EITHER EXPRESS OR IMPLIED. See the License for the specific language governing permissions and
+# limitations under the License. Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# "THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.”
+
+__author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
+
+import argparse
+import ConfigParser
+from collections import OrderedDict
+from argparse import RawTextHelpFormatter
+from tabulate import tabulate
+from libutils import get_logical_switch, get_edge, get_switch_id, read_records
+from libutils import get_datacentermoid, get_datastoremoid, get_edgeresourcepoolmoid
+from libutils import connect_to_nsx, get_vccontent
+from nsx_logical_switch import logical_switch_create
+from nsx_dlr import dlr_create, dlr_add_interface, dlr_list_interfaces
+from nsx_esg import esg_create, esg_cfg_interface, esg_dgw_set, esg_batch_routes, esg_fw_default_set
+from nsx_esg import esg_default_gateway
+from parallel import run_dag, DEFAULT_WORKERS
+
+
+DEFAULT_EDGE_PASSWORD = 'VMware1!VMware1!'
+
+
+def _netmask_or_prefixlen(mask):
+    try:
+        return None, int(mask)
+    except ValueError:
+        return mask, None
+
+
+def _switch_id(client_session, vccontent, defaults, switch_name):
+    switch_id = get_switch_id(client_session, vccontent, defaults['datacenter_name'], switch_name)
+    if not switch_id:
+        raise ValueError('{} does NOT exist as VDS port group nor NSX logical switch'.format(switch_name))
+    return switch_id
+
+
+def _edge_placement(vccontent, defaults, edge):
+    datacenter_name = edge.get('datacenter_name', defaults['datacenter_name'])
+    datacentermoid = get_datacentermoid(vccontent, datacenter_name)
+    datastoremoid = get_datastoremoid(vccontent, datacenter_name, edge.get('edge_datastore',
+                                                                           defaults['edge_datastore']))
+    resourcepoolid = get_edgeresourcepoolmoid(vccontent, datacenter_name, edge.get('edge_cluster',
+                                                                                   defaults['edge_cluster']))
+    if not (datacentermoid and datastoremoid and resourcepoolid):
+        raise ValueError('datacenter, datastore or cluster of {} not found in vCenter'.format(edge['name']))
+    return datacentermoid, datastoremoid, resourcepoolid
+
+
+def _apply_logical_switch(client_session, defaults, logical_switch):
+    logical_switch_id, logical_switch_params = get_logical_switch(client_session, logical_switch['name'])
+    if logical_switch_id:
+        return 'exists with the ID {}'.format(logical_switch_id)
+    logical_switch_id, location = logical_switch_create(client_session, logical_switch.get('transport_zone',
+                                                                                           defaults['transport_zone']),
+                                                        logical_switch['name'],
+                                                        logical_switch.get('control_plane_mode'))
+    if not logical_switch_id:
+        raise ValueError('creation failed')
+    return 'created with the ID {}'.format(logical_switch_id)
+
+
+def _apply_dlr(client_session, vccontent, defaults, dlr):
+    dlr_id, dlr_params = get_edge(client_session, dlr['name'])
+    if dlr_id:
+        return 'exists with the Edge-ID {}'.format(dlr_id)
+    datacentermoid, datastoremoid, resourcepoolid = _edge_placement(vccontent, defaults, dlr)
+    ha_ls_id = _switch_id(client_session, vccontent, defaults, dlr['ha_ls'])
+    uplink_ls_id = _switch_id(client_session, vccontent, defaults, dlr['uplink_ls'])
+    dlr_id, location = dlr_create(client_session, dlr['name'], dlr.get('password', DEFAULT_EDGE_PASSWORD),
+                                  dlr.get('size', 'compact'), datacentermoid, datastoremoid, resourcepoolid,
+                                  ha_ls_id, uplink_ls_id, dlr['uplink_ip'], dlr['uplink_subnet'],
+                                  dlr.get('uplink_dgw'))
+    if not dlr_id:
+        raise ValueError('creation failed')
+    return 'created with the Edge-ID {}'.format(dlr_id)
+
+
+def _apply_dlr_interface(client_session, vccontent, defaults, dlr_name, interface):
+    dlr_id, dlr_params = get_edge(client_session, dlr_name)
+    if not dlr_id:
+        raise ValueError('DLR {} not found'.format(dlr_name))
+    dlr_int_list, dlr_int_list_verbose = dlr_list_interfaces(client_session, dlr_id)
+    if interface['ls'] in [dlr_int[0] for dlr_int in dlr_int_list]:
+        return 'exists'
+    interface_ls_id = _switch_id(client_session, vccontent, defaults, interface['ls'])
+    dlr_add_interface(client_session, dlr_id, interface_ls_id, interface['ip'], interface['subnet'])
+    return 'added'
+
+
+def _apply_esg(client_session, vccontent, defaults, esg):
+    esg_id, esg_params = get_edge(client_session, esg['name'])
+    if esg_id:
+        return 'exists with the ID {}'.format(esg_id)
+    datacentermoid, datastoremoid, resourcepoolid = _edge_placement(vccontent, defaults, esg)
+    portgroup_id = _switch_id(client_session, vccontent, defaults, esg['portgroup'])
+    esg_id, esg_params = esg_create(client_session, esg['name'], esg.get('password', DEFAULT_EDGE_PASSWORD),
+                                    esg.get('size', 'compact'), datacentermoid, datastoremoid, resourcepoolid,
+                                    portgroup_id, esg_remote_access=esg.get('remote_access'))
+    if not esg_id:
+        raise ValueError('creation failed')
+    return 'created with the ID {}'.format(esg_id)
+
+
+def _apply_esg_interface(client_session, vccontent, defaults, esg_name, interface):
+    portgroup_id = None
+    if interface.get('ls'):
+        portgroup_id = _switch_id(client_session, vccontent, defaults, interface['ls'])
+    netmask, prefixlen = _netmask_or_prefixlen(interface['mask']) if interface.get('mask') else (None, None)
+    result = esg_cfg_interface(client_session, esg_name, interface['index'], ipaddr=interface.get('ip'),
+                               netmask=netmask, prefixlen=prefixlen, name=interface.get('name'),
+                               is_connected=interface.get('state', 'true'), portgroup_id=portgroup_id,
+                               vnic_type=interface.get('type'))
+    if not result:
+        raise ValueError('vnic configuration failed')
+    return 'configured'
+
+
+def _apply_esg_routing(client_session, esg):
+    default_gateway = esg_default_gateway(esg)
+    if default_gateway:
+        result = esg_dgw_set(client_session, esg['name'], default_gateway['next_hop'], default_gateway['vnic'])
+        if not result:
+            raise ValueError('default gateway configuration failed')
+    result, (added, deleted) = esg_batch_routes(client_session, esg['name'], add_routes=esg.get('routes'))
+    if not result:
+        raise ValueError('static routes configuration failed')
+    return '{} routes added or updated'.format(added)
+
+
+def _apply_esg_firewall(client_session, esg):
+    result = esg_fw_default_set(client_session, esg['name'], esg['firewall_default'])
+    if not result:
+        raise ValueError('default firewall policy configuration failed')
+    return 'default policy set to {}'.format(esg['firewall_default'])
+
+
+def topology_tasks(client_session, vccontent, defaults, topology):
+    """
+    This function builds the dependency graph of the objects of a topology: logical switches come before the edges
+    and interfaces connected to them, edges before their interfaces. The updates of one edge are chained (DLR
+    and ESG interfaces one after the other, then ESG routing, then ESG firewall) as each of them rewrites part of the
+    same edge configuration, so only the steps of different edges run concurrently
+    :param client_session: An instance of an NsxClient Session
+    :param vccontent: The vCenter content, as returned by connect_to_vc or get_vccontent
+    :param defaults: A dictionary with the default transport_zone, datacenter_name, edge_datastore and edge_cluster
+    :param topology: A dictionary with the optional lists logical_switches, dlrs and esgs, see the apply command help
+    :return: An OrderedDict of tasks as expected by parallel.run_dag, keyed by (object type, object name) tuples
+    """
+    tasks = OrderedDict()
+    logical_switches = [logical_switch['name'] for logical_switch in topology.get('logical_switches') or []]
+
+    def switch_dependencies(*switch_names):
+        return [('lswitch', name) for name in switch_names if name in logical_switches]
+
+    for logical_switch in topology.get('logical_switches') or []:
+        tasks[('lswitch', logical_switch['name'])] = (
+            lambda logical_switch=logical_switch: _apply_logical_switch(client_session, defaults, logical_switch), [])
+
+    for dlr in topology.get('dlrs') or []:
+        dlr_key = ('dlr', dlr['name'])
+        tasks[dlr_key] = (lambda dlr=dlr: _apply_dlr(client_session, vccontent, defaults, dlr),
+                          switch_dependencies(dlr['ha_ls'], dlr['uplink_ls']))
+        previous_key = dlr_key
+        for interface in dlr.get('interfaces') or []:
+            interface_key = ('dlr_interface', '{}/{}'.format(dlr['name'], interface['ls']))
+            tasks[interface_key] = (
+                lambda dlr=dlr, interface=interface: _apply_dlr_interface(client_session, vccontent, defaults,
+                                                                          dlr['name'], interface),
+                [previous_key] + switch_dependencies(interface['ls']))
+            previous_key = interface_key
+
+    for esg in topology.get('esgs') or []:
+        esg_key = ('esg', esg['name'])
+        tasks[esg_key] = (lambda esg=esg: _apply_esg(client_session, vccontent, defaults, esg),
+                          switch_dependencies(esg['portgroup']))
+        previous_key = esg_key
+        for interface in esg.get('interfaces') or []:
+            interface_key = ('esg_interface', '{}/vnic{}'.format(esg['name'], interface['index']))
+            tasks[interface_key] = (
+                lambda esg=esg, interface=interface: _apply_esg_interface(client_session, vccontent, defaults,
+                                                                          esg['name'], interface),
+                [previous_key] + switch_dependencies(interface.get('ls')))
+            previous_key = interface_key
+        if esg.get('default_gateway') or esg.get('routes'):
+            routing_key = ('esg_routing', esg['name'])
+            tasks[routing_key] = (lambda esg=esg: _apply_esg_routing(client_session, esg), [previous_key])
+            previous_key = routing_key
+        if esg.get('firewall_default'):
+            tasks[('esg_firewall', esg['name'])] = (lambda esg=esg: _apply_esg_firewall(client_session, esg),
+                                                    [previous_key])
+    return tasks
+
+
+def apply_topology(client_session, vccontent, defaults, topology, workers=DEFAULT_WORKERS):
+    """
+    This function creates the objects of a topology that don't exist yet, running independent steps concurrently
+    over the same NSX session
+    :param client_session: An instance of an NsxClient Session
+    :param vccontent: The vCenter content, as returned by connect_to_vc or get_vccontent
+    :param defaults: A dictionary with the default transport_zone, datacenter_name, edge_datastore and edge_cluster
+    :param topology: A dictionary with the optional lists logical_switches, dlrs and esgs
+    :param workers: (Optional) Maximum number of concurrent steps
+    :return: A list of tuples, one per step in topology order, with item 0 containing the object type, item 1 the
+             object name, item 2 True on success, item 3 a status message and item 4 the step duration in seconds
+    """
+    results = run_dag(topology_tasks(client_session, vccontent, defaults, topology), workers=workers)
+    return [(object_type, object_name, error is None, message if error is None else str(error), duration)
+            for (object_type, object_name), (message, error, duration) in results.items()]
+
+
+def _apply_print(client_session, vccontent, defaults, **kwargs):
+    topology = read_records(kwargs['topology_file'])
+    steps = apply_topology(client_session, vccontent, defaults, topology, workers=kwargs['workers'])
+    print tabulate([(object_type, object_name, 'ok' if success else 'FAILED', message, '{:.1f}'.format(duration))
+                    for object_type, object_name, success, message, duration in steps],
+                   headers=["Type", "Name", "Result", "Details", "Time (s)"], tablefmt="psql")
+
+
+def contruct_parser(subparsers):
+    parser = subparsers.add_parser('apply', description="Create a topology described in a yaml or json file",
+                                   help="Create a topology described in a yaml or json file",
+                                   formatter_class=RawTextHelpFormatter)
+    parser.add_argument("-f",
+                        "--file",
+                        required=True,
+                        help="""yaml or json topology file, objects that already exist are left untouched:
+    logical_switches: [{name, transport_zone, control_plane_mode}]
+    dlrs: [{name, password, size, ha_ls, uplink_ls, uplink_ip, uplink_subnet, uplink_dgw,
+            interfaces: [{ls, ip, subnet}]}]
+    esgs: [{name, password, size, remote_access, portgroup,
+            interfaces: [{index, ls, ip, mask, name, type, state}],
+            default_gateway: {next_hop, vnic} or next hop with default_gateway_vnic,
+            routes: [{network, next_hop, vnic}], firewall_default}]
+    transport_zone, datacenter_name, edge_datastore and edge_cluster default to the INI file values""")
+    parser.add_argument("-w",
+                        "--workers",
+                        help="maximum number of concurrent steps, default is {}".format(DEFAULT_WORKERS),
+                        type=int,
+                        default=DEFAULT_WORKERS)
+
+    parser.set_defaults(func=_apply_main)
+
+
+def _apply_main(args):
+    config = ConfigParser.ConfigParser()
+    assert config.read(args.ini), 'could not read config file {}'.format(args.ini)
+
+    client_session = connect_to_nsx(config, args)
+
+    vccontent = get_vccontent(config)
+
+    defaults = dict((option, config.get('defaults', option))
+                    for option in ['transport_zone', 'datacenter_name', 'edge_datastore', 'edge_cluster'])
+
+    _apply_print(client_session, vccontent, defaults, topology_file=args.file, workers=args.workers)
+
+
+def main():
+    main_parser = argparse.ArgumentParser()
+    subparsers = main_parser.add_subparsers()
+    contruct_parser(subparsers)
+    args = main_parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# coding=utf-8
+#
+# Copyright © 2015-2016 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the X11 (MIT) (the “License”) set forth below;
+#
+# you may not use this file except in compliance with the License. Unless required by applicable law or agreed to in
+# writing, software distributed under the License is distributed on an “AS IS” BASIS, without warranties or conditions
+# of any kind, EITHER EXPRESS OR IMPLIED. See the License for the specific language governing permissions and
+# limitations under the License. Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# "THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.”
+
+__author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
+
+import functools
+import threading
+from multiprocessing.pool import ThreadPool
+from libutils import connect_to_nsx
+from parallel import TaskExit
+import nsx_logical_switch
+import nsx_dlr
+import nsx_esg
+
+
+DEFAULT_MAX_CONCURRENT = 8
+
+# library functions exposed by AsyncNsxClient, all taking the client session as their first argument
+ASYNC_FUNCTIONS = [
+    nsx_logical_switch.logical_switch_create,
+    nsx_logical_switch.logical_switch_delete,
+    nsx_logical_switch.logical_switch_read,
+    nsx_logical_switch.logical_switch_list,
+    nsx_dlr.dlr_create,
+    nsx_dlr.dlr_delete,
+    nsx_dlr.dlr_read,
+    nsx_dlr.dlr_list,
+    nsx_dlr.dlr_add_interface,
+    nsx_dlr.dlr_del_interface,
+    nsx_dlr.dlr_list_interfaces,
+    nsx_dlr.dlr_set_dgw,
+    nsx_dlr.dlr_del_dgw,
+    nsx_esg.esg_create,
+    nsx_esg.esg_delete,
+    nsx_esg.esg_read,
+    nsx_esg.esg_list,
+    nsx_esg.esg_cfg_interface,
+    nsx_esg.esg_clear_interface,
+    nsx_esg.esg_list_interfaces,
+    nsx_esg.esg_dgw_set,
+    nsx_esg.esg_dgw_clear,
+    nsx_esg.esg_dgw_read,
+    nsx_esg.esg_batch_routes,
+    nsx_esg.esg_route_add,
+    nsx_esg.esg_route_del,
+    nsx_esg.esg_route_list,
+    nsx_esg.esg_fw_default_set,
+]
+
+_semaphores = {}
+_semaphores_lock = threading.Lock()
+
+
+def get_manager_semaphore(nsx_manager, max_concurrent=DEFAULT_MAX_CONCURRENT):
+    """
+    :param nsx_manager: The NSX Manager the calls are sent to
+    :param max_concurrent: (Optional) Maximum number of concurrent calls, only used by the first call for this
+                           NSX Manager
+    :return: The BoundedSemaphore shared by all the AsyncNsxClient instances of this process talking to this
+             NSX Manager
+    """
+    with _semaphores_lock:
+        semaphore = _semaphores.get(nsx_manager)
+        if semaphore is None:
+            semaphore = _semaphores[nsx_manager] = threading.BoundedSemaphore(max_concurrent)
+        return semaphore
+
+
+class AsyncNsxClient(object):
+    """
+    Non blocking facade of the lswitch, dlr and esg library functions. Every function of ASYNC_FUNCTIONS is
+    available as a method with the same name and arguments, without the client session, returning an AsyncResult
+    whose get() returns the same value as the library function or raises the same exception, SystemExit being
+    raised as a parallel.TaskExit. At most max_concurrent calls per NSX Manager run at the same time across the
+    process, the others wait in a queue
+    """
+    def __init__(self, client_session, nsx_manager, max_concurrent=DEFAULT_MAX_CONCURRENT):
+        """
+        :param client_session: An instance of an NsxClient Session
+        :param nsx_manager: The NSX Manager the session is connected to, used to share the concurrency limit
+        :param max_concurrent: (Optional) Maximum number of concurrent calls to the NSX Manager
+        """
+        self.client_session = client_session
+        self.nsx_manager = nsx_manager
+        self._semaphore = get_manager_semaphore(nsx_manager, max_concurrent)
+        self._pool = ThreadPool(max_concurrent)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _call(self, func, args, kwargs):
+        with self._semaphore:
+            try:
+                return func(self.client_session, *args, **kwargs)
+            except SystemExit as error:
+                raise TaskExit(error.code)
+
+    def submit(self, func, *args, **kwargs):
+        """
+        :param func: A library function taking the client session as its first argument
+        :return: An AsyncResult of the call of func with the client session, args and kwargs
+        """
+        return self._pool.apply_async(self._call, (func, args, kwargs))
+
+    def close(self):
+        """
+        Waits for the submitted calls to complete and stops the worker threads
+        """
+        self._pool.close()
+        self._pool.join()
+
+
+def _async_method(func):
+    @functools.wraps(func)
+    def method(self, *args, **kwargs):
+        return self.submit(func, *args, **kwargs)
+    return method
+
+
+for _func in ASYNC_FUNCTIONS:
+    setattr(AsyncNsxClient, _func.__name__, _async_method(_func))
+
+
+def connect_async(config, args, max_concurrent=DEFAULT_MAX_CONCURRENT):
+    """
+    :param config: A ConfigParser instance holding the nsxraml and nsxv sections of the nsx.ini file
+    :param args: The parsed command line arguments, as used by connect_to_nsx
+    :param max_concurrent: (Optional) Maximum number of concurrent calls to the NSX Manager
+    :return: An AsyncNsxClient on the session returned by connect_to_nsx
+    """
+    return AsyncNsxClient(connect_to_nsx(config, args), config.get('nsxv', 'nsx_manager'), max_concurrent)
+
+
+def gather(async_results):
+    """
+    :param async_results: AsyncResult instances returned by AsyncNsxClient methods
+    :return: A list of tuples in the order of async_results, with item 0 containing the return value of the call
+             (None on failure) and item 1 containing the exception it raised (None on success)
+    """
+    results = []
+    for async_result in async_results:
+        try:
+            results.append((async_result.get(), None))
+        except Exception as error:
+            results.append((None, error))
+    return results
@@ -27,10 +27,14 @@ __author__ = 'Dimitri Desmidt'
 import argparse
 import ConfigParser
 import json
-from libutils import get_logical_switch, get_vdsportgroupid, connect_to_vc
+from libutils import get_logical_switch, get_vdsportgroupid, get_vccontent
+from libutils import print_list_stream, print_table_stream
+from libutils import connect_to_nsx
 from libutils import get_datacentermoid, get_edgeresourcepoolmoid, get_edge, get_datastoremoid
+from inventory import invalidate_inventory, iter_edges
+from ramlcache import body_template
+from multisite import get_site_configs, single_site_config, run_on_sites, print_site_results
 from tabulate import tabulate
-from nsxramlclient.client import NsxClient
 from argparse import RawTextHelpFormatter
 
 
@@ -44,7 +48,7 @@ def dlr_add_interface(client_session, dlr_id, interface_ls_id, interface_ip, int
     """
 
     # get a template dict for the dlr interface
-    dlr_interface_dict = client_session.extract_resource_body_example('interfaces', 'create')
+    dlr_interface_dict = body_template(client_session, 'interfaces', 'create')
 
     # add default gateway to the created dlr if dgw entered
     dlr_interface_dict['interfaces']['interface']['addressGroups']['addressGroup']['primaryAddress'] = interface_ip
@@ -178,7 +182,7 @@ def dlr_create(client_session, dlr_name, dlr_pwd, dlr_size,
     """
 
     # get a template dict for the dlr create
-    dlr_create_dict = client_session.extract_resource_body_example('nsxEdges', 'create')
+    dlr_create_dict = body_template(client_session, 'nsxEdges', 'create')
 
     # fill the details for the new dlr in the body dict
     dlr_create_dict['edge']['type'] = "distributedRouter"
@@ -200,6 +204,7 @@ def dlr_create(client_session, dlr_name, dlr_pwd, dlr_size,
     del dlr_create_dict['edge']['appliances']['appliance']['customField']
 
     new_dlr = client_session.create('nsxEdges', request_body_dict=dlr_create_dict)
+    invalidate_inventory(client_session, 'nsxEdges')
 
     # add default gateway to the created dlr if dgw entered
     if uplink_dgw:
@@ -261,7 +266,7 @@ def dlr_set_dgw(client_session, dlr_id, uplink_dgw):
     :param uplink_dgw: default gateway ip address
     """
     # get a template dict for the dlr routes
-    dlr_static_route_dict = client_session.extract_resource_body_example('routingConfig', 'update')
+    dlr_static_route_dict = body_template(client_session, 'routingConfig', 'update')
 
     # add default gateway to the created dlr if dgw entered
     dlr_static_route_dict['routing']['staticRouting']['defaultRoute']['gatewayAddress'] = uplink_dgw
@@ -300,7 +305,7 @@ def dlr_del_dgw(client_session, dlr_id):
     :param dlr_id: dlr uuid
     """
     # get a template dict for the dlr routes
-    dlr_static_route_dict = client_session.extract_resource_body_example('routingConfig', 'update')
+    dlr_static_route_dict = body_template(client_session, 'routingConfig', 'update')
 
     # add default gateway to the created dlr if dgw entered
     # dlr_static_route_dict['routing']['staticRouting']['defaultRoute']['gatewayAddress'] = ""
@@ -343,6 +348,7 @@ def dlr_delete(client_session, dlr_name):
     if not dlr_id:
         return False, None
     client_session.delete('nsxEdge', uri_parameters={'edgeId': dlr_id})
+    invalidate_inventory(client_session, 'nsxEdges')
     return True, dlr_id
 
 
@@ -380,30 +386,43 @@ def _dlr_read(client_session, **kwargs):
         print 'Distributed Logical Router {} not found'.format(dlr_name)
 
 
-def dlr_list(client_session):
+def iter_dlrs(client_session, datacentermoid=None):
+    """
+    This function yields the DLRs found in NSX page by page as they are read
+    :param client_session: An instance of an NsxClient Session
+    :param datacentermoid: (Optional) The managed object id of the vCenter DC to list the DLRs of, filtered by the
+                           NSX API
+    :return: A generator of dictionaries containing the DLR details
+    """
+    return iter_edges(client_session, edge_type='distributedRouter', datacenter=datacentermoid)
+
+
+def dlr_list(client_session, datacentermoid=None):
     """
     This function returns all DLR found in NSX
     :param client_session: An instance of an NsxClient Session
+    :param datacentermoid: (Optional) The managed object id of the vCenter DC to list the DLRs of
     :return: returns a tuple, the first item is a list of tuples with item 0 containing the DLR Name as string
              and item 1 containing the dlr id as string. The second item contains a list of dictionaries containing
              all DLR details
     """
-    all_dist_lr = client_session.read_all_pages('nsxEdges', 'read')
-    dist_lr_list = []
-    dist_lr_list_verbose = []
-    for dlr in all_dist_lr:
-        if dlr['edgeType'] == "distributedRouter":
-            dist_lr_list.append((dlr['name'], dlr['objectId']))
-            dist_lr_list_verbose.append(dlr)
+    dist_lr_list_verbose = list(iter_dlrs(client_session, datacentermoid))
+    dist_lr_list = [(dlr['name'], dlr['objectId']) for dlr in dist_lr_list_verbose]
     return dist_lr_list, dist_lr_list_verbose
 
 
-def _dlr_list_print(client_session, **kwargs):
-    dist_lr_list, dist_lr_params = dlr_list(client_session)
+def _dlr_list_print(client_session, vccontent=None, list_datacenter=None, **kwargs):
+    datacentermoid = None
+    if list_datacenter:
+        datacentermoid = get_datacentermoid(vccontent, list_datacenter)
+        if not datacentermoid:
+            print 'Datacenter {} not found'.format(list_datacenter)
+            return None
     if kwargs['verbose']:
-        print dist_lr_params
+        print_list_stream(iter_dlrs(client_session, datacentermoid))
     else:
-        print tabulate(dist_lr_list, headers=["DLR name", "DLR ID"], tablefmt="psql")
+        print_table_stream(((dlr['name'], dlr['objectId']) for dlr in iter_dlrs(client_session, datacentermoid)),
+                           headers=["DLR name", "DLR ID"])
 
 
 def contruct_parser(subparsers):
@@ -449,26 +468,52 @@ def contruct_parser(subparsers):
                         help="interface ip address in dlr")
     parser.add_argument("--interface_subnet",
                         help="interface subnet in dlr")
+    parser.add_argument("-dc",
+                        "--datacenter_name",
+                        help="vCenter DC name to deploy the dlr in, default is taken from INI File. "
+                             "When given, list only returns the dlrs of this DC")
 
     parser.set_defaults(func=_dlr_main)
 
 
-def _dlr_main(args):
-    if args.debug:
-        debug = True
+def _dlr_sites_main(site_configs, args):
+    if args.command == 'list':
+        def site_rows(config):
+            datacentermoid = None
+            if args.datacenter_name:
+                datacentermoid = get_datacentermoid(get_vccontent(config), args.datacenter_name)
+                if not datacentermoid:
+                    return []
+            return dlr_list(connect_to_nsx(config, args), datacentermoid)[0]
     else:
-        debug = False
+        if not args.name:
+            print 'Mandatory parameter missing, [-n NAME]'
+            return None
+
+        def site_rows(config):
+            dlr_id, dlr_params = dlr_read(connect_to_nsx(config, args), args.name)
+            return [(args.name, dlr_id)] if dlr_id else []
+    print_site_results(run_on_sites(site_configs, site_rows, timeout=getattr(args, 'site_timeout', None)),
+                       headers=["DLR name", "DLR ID"])
+
 
+def _dlr_main(args):
     config = ConfigParser.ConfigParser()
     assert config.read(args.ini), 'could not read config file {}'.format(args.ini)
 
-    client_session = NsxClient(config.get('nsxraml', 'nsxraml_file'), config.get('nsxv', 'nsx_manager'),
-                               config.get('nsxv', 'nsx_username'), config.get('nsxv', 'nsx_password'), debug=debug)
+    site_configs = get_site_configs(config, getattr(args, 'site', None))
+    if args.command in ['list', 'read'] and len(site_configs) > 1:
+        return _dlr_sites_main(site_configs, args)
+    config = single_site_config(config, getattr(args, 'site', None))
+
+    client_session = connect_to_nsx(config, args)
 
-    vccontent = connect_to_vc(config.get('vcenter', 'vcenter'), config.get('vcenter', 'vcenter_user'),
-                              config.get('vcenter', 'vcenter_passwd'))
+    vccontent = get_vccontent(config)
 
-    datacenter_name = config.get('defaults', 'datacenter_name')
+    if args.datacenter_name:
+        datacenter_name = args.datacenter_name
+    else:
+        datacenter_name = config.get('defaults', 'datacenter_name')
     edge_datastore = config.get('defaults', 'edge_datastore')
     edge_cluster = config.get('defaults', 'edge_cluster')
 
@@ -492,6 +537,7 @@ def _dlr_main(args):
                                        uplink_subnet=args.uplink_subnet, uplink_dgw=args.uplink_dgw,
                                        interface_ls_name=args.interface_ls, interface_ip=args.interface_ip,
                                        interface_subnet=args.interface_subnet,
+                                       list_datacenter=args.datacenter_name,
                                        verbose=args.verbose)
 
     except KeyError:
@@ -27,15 +27,28 @@ __author__ = 'yfauser'
 import argparse
 import ConfigParser
 import json
-from libutils import get_logical_switch, get_vdsportgroupid, connect_to_vc, check_for_parameters
+import threading
+import time
+from collections import OrderedDict
+from libutils import get_logical_switch, get_vdsportgroupid, get_vccontent, check_for_parameters, get_switch_id
+from libutils import print_list_stream, print_table_stream
+from libutils import connect_to_nsx, read_records
 from libutils import get_datacentermoid, get_edgeresourcepoolmoid, get_edge, get_datastoremoid
+from inventory import get_resolver, invalidate_inventory, iter_edges
+from parallel import bounded_map, DEFAULT_WORKERS
+from ramlcache import body_template
+from multisite import get_site_configs, single_site_config, run_on_sites, print_site_results
 from tabulate import tabulate
-from nsxramlclient.client import NsxClient
 from argparse import RawTextHelpFormatter
 
 
+DEPLOY_TIMEOUT = 1800
+MIN_POLL_INTERVAL = 5.0
+MAX_POLL_INTERVAL = 60.0
+
+
 def esg_create(client_session, esg_name, esg_pwd, esg_size, datacentermoid, datastoremoid, resourcepoolid, default_pg,
-               esg_username=None, esg_remote_access=None):
+               esg_username=None, esg_remote_access=None, asynchronous=False):
     """
     This function creates a new Edge Services Gateway
     :param client_session: An instance of an NsxClient Session
@@ -49,10 +62,12 @@ def esg_create(client_session, esg_name, esg_pwd, esg_size, datacentermoid, data
                        be connected to a valid portgroup in NSX)
     :param esg_username: The Username for the CLI and SSH access (default: admin)
     :param esg_remote_access: Enables / Disables SSH access to the Edge Host (default: False)
+    :param asynchronous: (Optional) Submit the create with async=true, NSX answers once the deployment is queued
+                         instead of once the appliance is deployed, and the first item returned is the NSX job id
     :return: returns a tuple, the first item is a string containing the Edge ID, the second is a dictionary
              containing the ESG details retrieved from the API
     """
-    esg_create_dict = client_session.extract_resource_body_example('nsxEdges', 'create')
+    esg_create_dict = body_template(client_session, 'nsxEdges', 'create')
 
     if not esg_username:
         esg_username = 'admin'
@@ -75,8 +90,14 @@ def esg_create(client_session, esg_name, esg_pwd, esg_size, datacentermoid, data
     esg_create_dict['edge']['appliances']['appliance']['datastoreId'] = datastoremoid
     esg_create_dict['edge']['appliances']['appliance']['resourcePoolId'] = resourcepoolid
 
-    new_esg = client_session.create('nsxEdges', request_body_dict=esg_create_dict)
-    if new_esg['status'] == 201:
+    if asynchronous:
+        new_esg = client_session.create('nsxEdges', query_parameters_dict={'async': 'true'},
+                                        request_body_dict=esg_create_dict)
+    else:
+        new_esg = client_session.create('nsxEdges', request_body_dict=esg_create_dict)
+    invalidate_inventory(client_session, 'nsxEdges')
+    # nsxramlclient 2.x hands 200, 201, 202 and 204 back to the caller, NSX may answer an async create with 202
+    if new_esg['status'] in [201, 202]:
         return new_esg['objectId'], new_esg['body']
     else:
         return None, None
@@ -116,6 +137,7 @@ def esg_delete(client_session, esg_name):
     if not esg_id:
         return False, None
     client_session.delete('nsxEdge', uri_parameters={'edgeId': esg_id})
+    invalidate_inventory(client_session, 'nsxEdges')
     return True, esg_id
 
 
@@ -162,30 +184,75 @@ def _esg_read(client_session, **kwargs):
         print 'Edge Services Gateway {} not found'.format(kwargs['esg_name'])
 
 
-def esg_list(client_session):
+def iter_esgs(client_session, datacentermoid=None):
+    """
+    This function yields the ESGs found in NSX page by page as they are read
+    :param client_session: An instance of an NsxClient Session
+    :param datacentermoid: (Optional) The managed object id of the vCenter DC to list the ESGs of, filtered by the
+                           NSX API
+    :return: A generator of dictionaries containing the ESG details
+    """
+    return iter_edges(client_session, edge_type='gatewayServices', datacenter=datacentermoid)
+
+
+def esg_list(client_session, datacentermoid=None):
     """
     This function returns all DLR found in NSX
     :param client_session: An instance of an NsxClient Session
+    :param datacentermoid: (Optional) The managed object id of the vCenter DC to list the ESGs of
     :return: returns a tuple, the first item is a list of tuples with item 0 containing the DLR Name as string
              and item 1 containing the dlr id as string. The second item contains a list of dictionaries containing
              all DLR details
     """
-    all_edges = client_session.read_all_pages('nsxEdges', 'read')
-    esg_lst = []
-    esg_list_verbose = []
-    for edge in all_edges:
-        if edge['edgeType'] == "gatewayServices":
-            esg_lst.append((edge['name'], edge['objectId']))
-            esg_list_verbose.append(edge)
+    esg_list_verbose = list(iter_esgs(client_session, datacentermoid))
+    esg_lst = [(edge['name'], edge['objectId']) for edge in esg_list_verbose]
     return esg_lst, esg_list_verbose
 
 
-def _esg_list_print(client_session, **kwargs):
-    esg_list_result, esg_params = esg_list(client_session)
+def _esg_list_print(client_session, vccontent=None, list_datacenter=None, **kwargs):
+    datacentermoid = None
+    if list_datacenter:
+        datacentermoid = get_datacentermoid(vccontent, list_datacenter)
+        if not datacentermoid:
+            print 'Datacenter {} not found'.format(list_datacenter)
+            return None
     if kwargs['verbose']:
-        print esg_params
+        print_list_stream(iter_esgs(client_session, datacentermoid))
     else:
-        print tabulate(esg_list_result, headers=["ESG name", "ESG ID"], tablefmt="psql")
+        print_table_stream(((edge['name'], edge['objectId']) for edge in iter_esgs(client_session, datacentermoid)),
+                           headers=["ESG name", "ESG ID"])
+
+
+def _set_vnic(vnic, ipaddr=None, netmask=None, prefixlen=None, name=None, mtu=None, is_connected=None,
+              portgroup_id=None, vnic_type=None, enable_send_redirects=None, enable_proxy_arp=None):
+    """
+    Applies the parameters of esg_cfg_interface to the vnic dictionary read from the NSX API
+    """
+    if not mtu:
+        mtu = 1500
+    if not vnic_type:
+        vnic_type = 'internal'
+
+    vnic['mtu'] = mtu
+    vnic['type'] = vnic_type
+    if name:
+        vnic['name'] = name
+    if portgroup_id:
+        vnic['portgroupId'] = portgroup_id
+    if enable_send_redirects:
+        vnic['enableSendRedirects'] = enable_send_redirects
+    if enable_proxy_arp:
+        vnic['enableProxyArp'] = enable_proxy_arp
+    if is_connected:
+        vnic['isConnected'] = is_connected
+    if ipaddr and (netmask or prefixlen):
+        address_group = {}
+        if netmask:
+            address_group['subnetMask'] = netmask
+        if prefixlen:
+            address_group['subnetPrefixLength'] = str(prefixlen)
+        address_group['primaryAddress'] = ipaddr
+        vnic['addressGroups'] = {'addressGroup': address_group}
 
 
 def esg_cfg_interface(client_session, esg_name, ifindex, ipaddr=None, netmask=None, prefixlen=None, name=None, mtu=None,
@@ -211,33 +278,26 @@ def esg_cfg_interface(client_session, esg_name, ifindex, ipaddr=None, netmask=No
     esg_id, esg_params = get_edge(client_session, esg_name)
     if not esg_id:
         return False
-    vnic_config = client_session.read('vnic', uri_parameters={'index': ifindex, 'edgeId': esg_id})['body']
+    return esg_cfg_interface_by_id(client_session, esg_id, ifindex, ipaddr=ipaddr, netmask=netmask,
+                                   prefixlen=prefixlen, name=name, mtu=mtu, is_connected=is_connected,
+                                   portgroup_id=portgroup_id, vnic_type=vnic_type,
+                                   enable_send_redirects=enable_send_redirects, enable_proxy_arp=enable_proxy_arp)
 
-    if not mtu:
-        mtu = 1500
-    if not vnic_type:
-        vnic_type = 'internal'
 
-    vnic_config['vnic']['mtu'] = mtu
-    vnic_config['vnic']['type'] = vnic_type
-    if name:
-        vnic_config['vnic']['name'] = name
-    if portgroup_id:
-        vnic_config['vnic']['portgroupId'] = portgroup_id
-    if enable_send_redirects:
-        vnic_config['vnic']['enableSendRedirects'] = enable_send_redirects
-    if enable_proxy_arp:
-        vnic_config['vnic']['enableProxyArp'] = enable_proxy_arp
-    if is_connected:
-        vnic_config['vnic']['isConnected'] = is_connected
-    if ipaddr and (netmask or prefixlen):
-        address_group = {}
-        if netmask:
-            address_group['subnetMask'] = netmask
-        if prefixlen:
-            address_group['subnetPrefixLength'] = str(prefixlen)
-        address_group['primaryAddress'] = ipaddr
-        vnic_config['vnic']['addressGroups'] = {'addressGroup': address_group}
+def esg_cfg_interface_by_id(client_session, esg_id, ifindex, ipaddr=None, netmask=None, prefixlen=None, name=None,
+                            mtu=None, is_connected=None, portgroup_id=None, vnic_type=None, enable_send_redirects=None,
+                            enable_proxy_arp=None):
+    """
+    This function configures vnic interfaces on ESGs known by their Edge ID, the other parameters are the ones of
+    esg_cfg_interface
+    :param client_session: An instance of an NsxClient Session
+    :param esg_id: The Edge ID of the ESG to configure interfaces on
+    :return: Returns True on successful configuration of the Interface
+    """
+    vnic_config = client_session.read('vnic', uri_parameters={'index': ifindex, 'edgeId': esg_id})['body']
+    _set_vnic(vnic_config['vnic'], ipaddr=ipaddr, netmask=netmask, prefixlen=prefixlen, name=name, mtu=mtu,
+              is_connected=is_connected, portgroup_id=portgroup_id, vnic_type=vnic_type,
+              enable_send_redirects=enable_send_redirects, enable_proxy_arp=enable_proxy_arp)
 
     cfg_result = client_session.update('vnic', uri_parameters={'index': ifindex, 'edgeId': esg_id},
                                        request_body_dict=vnic_config)
@@ -247,6 +307,53 @@ def esg_cfg_interface(client_session, esg_name, ifindex, ipaddr=None, netmask=No
         return False
 
 
+def esg_cfg_interfaces(client_session, esg_name, vnic_specs):
+    """
+    This function configures several vnic interfaces of an ESG with a single update of its vnics
+    :param client_session: An instance of an NsxClient Session
+    :param esg_name: The name of the ESG to configure interfaces on
+    :param vnic_specs: A list of dictionaries, one per vnic, with the key index and the optional keys ipaddr, netmask,
+                       prefixlen, name, mtu, is_connected, portgroup_id, vnic_type, enable_send_redirects and
+                       enable_proxy_arp, as the parameters of esg_cfg_interface
+    :return: Returns True on successful configuration of the Interfaces
+    """
+    esg_id, esg_params = get_edge(client_session, esg_name)
+    if not esg_id:
+        return False
+    return esg_cfg_interfaces_by_id(client_session, esg_id, vnic_specs)
+
+
+def esg_cfg_interfaces_by_id(client_session, esg_id, vnic_specs):
+    """
+    This function configures several vnic interfaces of an ESG known by its Edge ID, with one read of all its vnics
+    and one patch of the configured vnics
+    :param client_session: An instance of an NsxClient Session
+    :param esg_id: The Edge ID of the ESG to configure interfaces on
+    :param vnic_specs: A list of dictionaries, one per vnic, as described in esg_cfg_interfaces
+    :return: Returns True on successful configuration of the Interfaces
+    """
+    all_int_response = client_session.read('vnics', uri_parameters={'edgeId': esg_id})
+    vnics = dict((str(vnic['index']), vnic)
+                 for vnic in client_session.normalize_list_return(all_int_response['body']['vnics']['vnic']))
+    patched_vnics = []
+    for vnic_spec in vnic_specs:
+        vnic_params = dict(vnic_spec)
+        ifindex = str(vnic_params.pop('index'))
+        vnic = vnics.get(ifindex) or {'index': ifindex}
+        _set_vnic(vnic, **vnic_params)
+        patched_vnics.append(vnic)
+    if not patched_vnics:
+        return True
+
+    cfg_result = client_session.create('vnics', uri_parameters={'edgeId': esg_id},
+                                       query_parameters_dict={'action': 'patch'},
+                                       request_body_dict={'vnics': {'vnic': patched_vnics}})
+    if cfg_result['status'] in [200, 204]:
+        return True
+    else:
+        return False
+
+
 def _esg_cfg_interface(client_session, vccontent, **kwargs):
     needed_params = ['vnic_index', 'esg_name']
     if not check_for_parameters(needed_params, kwargs):
@@ -290,6 +397,79 @@ def _esg_cfg_interface(client_session, vccontent, **kwargs):
         print 'Edge Services Router {} vnic{} configuration failed'.format(kwargs['esg_name'], kwargs['vnic_index'])
 
 
+def _vnic_specs(client_session, vccontent, datacenter_name, records):
+    """
+    :return: The vnic specs of esg_cfg_interfaces built from the records of a vnics file, with every logical switch
+             and port group name resolved once
+    """
+    switch_ids = {}
+
+    def switch_id(name, is_logical_switch):
+        if (name, is_logical_switch) not in switch_ids:
+            if is_logical_switch:
+                resolved_id, resolved_params = get_logical_switch(client_session, name)
+            else:
+                resolved_id = get_vdsportgroupid(vccontent, datacenter_name, name)
+            if not resolved_id:
+                raise ValueError('{} {} not found'.format('Logical switch' if is_logical_switch else 'Portgroup',
+                                                          name))
+            switch_ids[(name, is_logical_switch)] = resolved_id
+        return switch_ids[(name, is_logical_switch)]
+
+    vnic_specs = []
+    for record in records:
+        if 'index' not in record:
+            raise ValueError('vnic index missing in {}'.format(record))
+        if record.get('ls') and record.get('portgroup'):
+            raise ValueError('vnic{} has both a logical switch and a portgroup'.format(record['index']))
+        netmask, prefixlen = None, None
+        if record.get('mask'):
+            try:
+                prefixlen = int(record['mask'])
+            except ValueError:
+                netmask = record['mask']
+        if record.get('ip') and not (netmask or prefixlen):
+            raise ValueError('vnic{} needs a mask with its IP Address'.format(record['index']))
+        portgroup_id = None
+        if record.get('ls'):
+            portgroup_id = switch_id(record['ls'], True)
+        elif record.get('portgroup'):
+            portgroup_id = switch_id(record['portgroup'], False)
+        vnic_specs.append({'index': record['index'], 'ipaddr': record.get('ip'), 'netmask': netmask,
+                           'prefixlen': prefixlen, 'name': record.get('name'), 'mtu': record.get('mtu'),
+                           'is_connected': record.get('state', 'true'), 'portgroup_id': portgroup_id,
+                           'vnic_type': record.get('type')})
+    return vnic_specs
+
+
+def _esg_cfg_interfaces(client_session, vccontent, **kwargs):
+    needed_params = ['esg_name']
+    if not check_for_parameters(needed_params, kwargs):
+        return None
+    if not kwargs['route_file']:
+        print 'You must specify a file listing the vnics for cfg_interfaces, [-f FILE]'
+        return None
+
+    esg_id, esg_params = get_edge(client_session, kwargs['esg_name'])
+    if not esg_id:
+        print 'Edge Services Router {} not found'.format(kwargs['esg_name'])
+        return None
+    records = read_records(kwargs['route_file'])
+    if isinstance(records, dict):
+        records = records.get('interfaces') or []
+    try:
+        vnic_specs = _vnic_specs(client_session, vccontent, kwargs['datacenter_name'], records)
+    except ValueError as error:
+        print 'Edge Services Router {} vnics configuration failed: {}'.format(kwargs['esg_name'], error)
+        return None
+
+    if esg_cfg_interfaces_by_id(client_session, esg_id, vnic_specs):
+        print 'Edge Services Router {} vnics {} have been configured'.format(
+            kwargs['esg_name'], ', '.join(str(vnic_spec['index']) for vnic_spec in vnic_specs))
+    else:
+        print 'Edge Services Router {} vnics configuration failed'.format(kwargs['esg_name'])
+
+
 def esg_clear_interface(client_session, esg_name, ifindex):
     """
     This function resets the vnic configuration of an ESG to its default state
@@ -400,6 +580,17 @@ def esg_dgw_set(client_session, esg_name, dgw_ip, vnic, mtu=None, admin_distance
     esg_id, esg_params = get_edge(client_session, esg_name)
     if not esg_id:
         return False
+    return esg_dgw_set_by_id(client_session, esg_id, dgw_ip, vnic, mtu=mtu, admin_distance=admin_distance)
+
+
+def esg_dgw_set_by_id(client_session, esg_id, dgw_ip, vnic, mtu=None, admin_distance=None):
+    """
+    This function sets the default gateway on an ESG known by its Edge ID, the other parameters are the ones of
+    esg_dgw_set
+    :param client_session: An instance of an NsxClient Session
+    :param esg_id: The Edge ID of the ESG
+    :return: True on success, False on failure
+    """
     if not mtu:
         mtu = '1500'
     if not admin_distance:
@@ -517,43 +708,86 @@ def _esg_dgw_read(client_session, **kwargs):
         print 'Failed to get default gateway info of Edge {}'.format(kwargs['esg_name'])
 
 
-def esg_route_add(client_session, esg_name, network, next_hop, vnic, mtu=None, admin_distance=None, description=None):
+def esg_batch_routes(client_session, esg_name, add_routes=None, del_routes=None):
     """
-    This function adds a static route to an ESG
+    This function adds and deletes a set of static routes on an ESG with a single read and update of its static
+    routing config. Routes are identified by their (network, next hop) pair, adding a route that already exists
+    updates the fields set by pynsxv and keeps the other fields returned by NSX
     :param client_session: An instance of an NsxClient Session
-    :param esg_name: The name of the ESG where the route should be added
-    :param network: The routes network in the x.x.x.x/yy format, e.g. 192.168.1.0/24
-    :param next_hop: The next hop ip
-    :param vnic: (Optional) The vnic index of were this route is reachable on
-    :param mtu: (Optional) The MTU of the route (default=1500)
-    :param admin_distance: (Optional) Admin distance of the defautl route (default=1)
-    :param description: (Optional) A description for this route
-    :return: True on success, False on failure
+    :param esg_name: The name of the ESG where the routes should be added and deleted
+    :param add_routes: (Optional) A list of dictionaries with the keys network (x.x.x.x/yy format) and next_hop, and
+                       optionally vnic, mtu (default=1500), admin_distance (default=1) and description
+    :param del_routes: (Optional) A list of dictionaries with the keys network and next_hop
+    :return: returns a tuple, the first item is True on success and False on failure, the second item is a tuple
+             with the number of routes added and the number of routes deleted
     """
     esg_id, esg_params = get_edge(client_session, esg_name)
     if not esg_id:
-        return False
-    if not mtu:
-        mtu = '1500'
-    if not admin_distance:
-        admin_distance = '1'
+        return False, (0, 0)
 
     rtg_cfg = client_session.read('routingConfigStatic', uri_parameters={'edgeId': esg_id})['body']
     if rtg_cfg['staticRouting']['staticRoutes']:
-        routes = client_session.normalize_list_return(rtg_cfg['staticRouting']['staticRoutes']['route'])
+        routes_api = client_session.normalize_list_return(rtg_cfg['staticRouting']['staticRoutes']['route'])
     else:
-        routes = []
-    new_route = {'vnic': vnic, 'network': network, 'nextHop': next_hop, 'adminDistance': admin_distance,
-                 'mtu': mtu, 'description': description}
-    routes.append(new_route)
-    rtg_cfg['staticRouting']['staticRoutes'] = {'route': routes}
+        routes_api = []
+    routes = OrderedDict(((route['network'], route['nextHop']), route) for route in routes_api)
+
+    deleted = 0
+    for route in del_routes or []:
+        if routes.pop((route['network'], route['next_hop']), None) is not None:
+            deleted += 1
+
+    added = 0
+    for route in add_routes or []:
+        new_route = {'vnic': route.get('vnic'), 'network': route['network'], 'nextHop': route['next_hop'],
+                     'adminDistance': route.get('admin_distance') or '1', 'mtu': route.get('mtu') or '1500',
+                     'description': route.get('description')}
+        key = (new_route['network'], new_route['nextHop'])
+        existing = routes.get(key) or {}
+        # the NSX API returns string values, omits unset fields and adds fields of its own, e.g. type
+        if any((None if value is None else str(value)) != existing.get(field) for field, value in new_route.items()):
+            merged = dict(existing)
+            for field, value in new_route.items():
+                if value is None:
+                    merged.pop(field, None)
+                else:
+                    merged[field] = value
+            routes[key] = merged
+            added += 1
+
+    if not (added or deleted):
+        return True, (0, 0)
+
+    if routes:
+        rtg_cfg['staticRouting']['staticRoutes'] = {'route': routes.values()}
+    else:
+        rtg_cfg['staticRouting']['staticRoutes'] = None
 
     cfg_result = client_session.update('routingConfigStatic', uri_parameters={'edgeId': esg_id},
                                        request_body_dict=rtg_cfg)
     if cfg_result['status'] == 204:
-        return True
+        return True, (added, deleted)
     else:
-        return False
+        return False, (0, 0)
+
+
+def esg_route_add(client_session, esg_name, network, next_hop, vnic, mtu=None, admin_distance=None, description=None):
+    """
+    This function adds a static route to an ESG
+    :param client_session: An instance of an NsxClient Session
+    :param esg_name: The name of the ESG where the route should be added
+    :param network: The routes network in the x.x.x.x/yy format, e.g. 192.168.1.0/24
+    :param next_hop: The next hop ip
+    :param vnic: (Optional) The vnic index of were this route is reachable on
+    :param mtu: (Optional) The MTU of the route (default=1500)
+    :param admin_distance: (Optional) Admin distance of the defautl route (default=1)
+    :param description: (Optional) A description for this route
+    :return: True on success, False on failure
+    """
+    result, counts = esg_batch_routes(client_session, esg_name,
+                                      add_routes=[{'network': network, 'next_hop': next_hop, 'vnic': vnic, 'mtu': mtu,
+                                                   'admin_distance': admin_distance, 'description': description}])
+    return result
 
 
 def _esg_route_add(client_session, **kwargs):
@@ -579,27 +813,9 @@ def esg_route_del(client_session, esg_name, network, next_hop):
     :param next_hop: The next hop ip
     :return: True on success, False on failure
     """
-    esg_id, esg_params = get_edge(client_session, esg_name)
-    if not esg_id:
-        return False
-
-    rtg_cfg = client_session.read('routingConfigStatic', uri_parameters={'edgeId': esg_id})['body']
-    if rtg_cfg['staticRouting']['staticRoutes']:
-        routes = client_session.normalize_list_return(rtg_cfg['staticRouting']['staticRoutes']['route'])
-    else:
-        return False
-
-    routes_filtered = [route for route in routes if not (route['network'] == network and route['nextHop'] == next_hop)]
-    if len(routes_filtered) == len(routes):
-        return False
-    rtg_cfg['staticRouting']['staticRoutes'] = {'route': routes_filtered}
-
-    cfg_result = client_session.update('routingConfigStatic', uri_parameters={'edgeId': esg_id},
-                                       request_body_dict=rtg_cfg)
-    if cfg_result['status'] == 204:
-        return True
-    else:
-        return False
+    result, (added, deleted) = esg_batch_routes(client_session, esg_name,
+                                                del_routes=[{'network': network, 'next_hop': next_hop}])
+    return result and deleted == 1
 
 
 def _esg_route_del(client_session, **kwargs):
@@ -616,6 +832,34 @@ def _esg_route_del(client_session, **kwargs):
         print 'Deletion of route {} on Edge Services Router {} failed'.format(kwargs['route_net'], kwargs['esg_name'])
 
 
+def _esg_apply_routes(client_session, **kwargs):
+    needed_params = ['route_file']
+    if not check_for_parameters(needed_params, kwargs):
+        return None
+
+    # group the routes per ESG, the ESG is taken from the esg_name column or from [-n ESG_NAME]
+    edge_routes = OrderedDict()
+    for route in read_records(kwargs['route_file']):
+        esg_name = route.get('esg_name') or kwargs['esg_name']
+        if not (esg_name and route.get('network') and route.get('next_hop')):
+            print 'Skipping route {}, esg_name, network and next_hop are mandatory'.format(route)
+            continue
+        add_routes, del_routes = edge_routes.setdefault(esg_name, ([], []))
+        if route.get('action', 'add') in ('del', 'delete'):
+            del_routes.append(route)
+        else:
+            add_routes.append(route)
+
+    for esg_name, (add_routes, del_routes) in edge_routes.items():
+        result, (added, deleted) = esg_batch_routes(client_session, esg_name, add_routes=add_routes,
+                                                    del_routes=del_routes)
+        if result:
+            print 'Edge Services Router {}: {} routes added or updated, {} routes deleted'.format(esg_name, added,
+                                                                                                  deleted)
+        else:
+            print 'Applying routes to Edge Services Router {} failed'.format(esg_name)
+
+
 def esg_route_list(client_session, esg_name):
     """
     This function return the configured static routes
@@ -678,11 +922,22 @@ def esg_fw_default_set(client_session, esg_name, def_action, logging_enabled=Non
     esg_id, esg_params = get_edge(client_session, esg_name)
     if not esg_id:
         return False
+    return esg_fw_default_set_by_id(client_session, esg_id, def_action, logging_enabled=logging_enabled)
+
 
+def esg_fw_default_set_by_id(client_session, esg_id, def_action, logging_enabled=None):
+    """
+    This function sets the default firewall rule of an ESG known by its Edge ID to accept or deny
+    :param client_session: An instance of an NsxClient Session
+    :param esg_id: The Edge ID of the ESG
+    :param def_action: Default firewall action, values are either accept or deny
+    :param logging_enabled: (Optional) Is logging enabled by default (true/false)
+    :return: True on success, False on failure
+    """
     if not logging_enabled:
         logging_enabled = 'false'
 
-    def_policy_body = client_session.extract_resource_body_example('defaultFirewallPolicy', 'update')
+    def_policy_body = body_template(client_session, 'defaultFirewallPolicy', 'update')
     def_policy_body['firewallDefaultPolicy']['action'] = def_action
     def_policy_body['firewallDefaultPolicy']['loggingEnabled'] = logging_enabled
 
@@ -709,6 +964,195 @@ def _esg_fw_default_set(client_session, **kwargs):
         print 'Setting default firewall policy on Edge Services Router {} failed'.format(kwargs['esg_name'])
 
 
+class DeploymentPoller(object):
+    """
+    Waits for ESGs created with async=true to be deployed, by reading their state in the edges listing. The
+    waiting ESGs share one listing per min_interval, and every ESG doubles the delay between its checks from
+    min_interval up to max_interval. ESGs deployed together take about the same time, so once an ESG is deployed
+    the ESGs still deploying skip their checks until they reach the fastest deployment time seen
+    """
+    def __init__(self, client_session, timeout=DEPLOY_TIMEOUT, min_interval=MIN_POLL_INTERVAL,
+                 max_interval=MAX_POLL_INTERVAL):
+        """
+        :param client_session: An instance of an NsxClient Session
+        :param timeout: Time in seconds after the create of an ESG after which it is reported as not deployed
+        :param min_interval: Delay in seconds before the second check of an ESG, and minimum age of the listing
+        :param max_interval: Maximum delay in seconds between two checks of an ESG
+        """
+        self._client_session = client_session
+        self.timeout = timeout
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._fastest = None
+        self._summaries = None
+        self._listed = 0
+        self._lock = threading.Lock()
+        self._listing_lock = threading.Lock()
+
+    def deployed(self, esg_name):
+        """
+        :return: The Edge ID of the ESG with this name once it is deployed, None while it is not
+        """
+        with self._listing_lock:
+            if self._summaries is None or time.time() - self._listed >= self.min_interval:
+                self._summaries = dict((edge.get('name'), edge)
+                                       for edge in iter_edges(self._client_session, edge_type='gatewayServices'))
+                self._listed = time.time()
+            edge = self._summaries.get(esg_name)
+        if edge and edge.get('state') == 'deployed':
+            return edge['objectId']
+        return None
+
+    def wait(self, esg_name, submitted):
+        """
+        :param esg_name: The name of the new ESG
+        :param submitted: The time the create of the ESG was sent at, as returned by time.time()
+        :return: The Edge ID once the ESG is deployed, None if it is not deployed timeout seconds after submitted
+        """
+        interval = self.min_interval
+        while True:
+            esg_id = self.deployed(esg_name)
+            if esg_id:
+                break
+            elapsed = time.time() - submitted
+            with self._lock:
+                delay = max(interval, self._fastest - elapsed if self._fastest else 0)
+            delay = min(delay, self.timeout - elapsed)
+            if delay <= 0:
+                return None
+            time.sleep(delay)
+            interval = min(interval * 2, self.max_interval)
+        with self._lock:
+            elapsed = time.time() - submitted
+            if self._fastest is None or elapsed < self._fastest:
+                self._fastest = elapsed
+        return esg_id
+
+
+def esg_default_gateway(esg):
+    """
+    :param esg: An ESG dictionary of an apply topology file or of an esg bulk_create file
+    :return: A dictionary with the keys next_hop and vnic of its default_gateway, given either as such a dictionary
+             or as the next hop with the vnic in default_gateway_vnic (the only form a csv file can hold), or None
+    """
+    default_gateway = esg.get('default_gateway')
+    if not default_gateway:
+        return None
+    if isinstance(default_gateway, dict):
+        return {'next_hop': default_gateway['next_hop'], 'vnic': default_gateway.get('vnic')}
+    return {'next_hop': default_gateway, 'vnic': esg.get('default_gateway_vnic')}
+
+
+def esg_bulk_create(client_session, vccontent, esgs, defaults, workers=DEFAULT_WORKERS, deploy_timeout=DEPLOY_TIMEOUT):
+    """
+    This function deploys new ESGs, with at most workers ESGs being created, deployed or configured concurrently.
+    The creates are submitted with async=true and the deployments tracked with a DeploymentPoller, every ESG is
+    configured as soon as its own deployment is done: interfaces first, then default gateway and default firewall
+    policy
+    :param client_session: An instance of an NsxClient Session
+    :param vccontent: The vCenter content, as returned by connect_to_vc or get_vccontent
+    :param esgs: A list of dictionaries with the keys name, portgroup and the optional keys password, size,
+                 remote_access, datacenter_name, edge_datastore, edge_cluster, interfaces (a list of dictionaries with
+                 the keys index, ls, ip, mask, name, type and state), default_gateway (a dictionary with the keys
+                 next_hop and vnic, or the next hop with the vnic in default_gateway_vnic) and firewall_default
+    :param defaults: A dictionary with the default password, size, remote_access, datacenter_name, edge_datastore
+                     and edge_cluster
+    :param workers: (Optional) Maximum number of ESGs processed concurrently
+    :param deploy_timeout: (Optional) Time in seconds after which an ESG not deployed yet is reported as failed
+    :return: A list of tuples in the order of esgs, with item 0 containing the ESG name, item 1 True on success,
+             item 2 the Edge ID on success or the error message on failure and item 3 the time in seconds from the
+             create to the end of the configuration
+    """
+    existing = get_resolver(client_session).index('nsxEdges', fresh=True).by_name
+    poller = DeploymentPoller(client_session, timeout=deploy_timeout)
+
+    def deploy(esg):
+        if esg['name'] in existing:
+            raise ValueError('exists with the ID {}'.format(existing[esg['name']]))
+        datacenter_name = esg.get('datacenter_name', defaults['datacenter_name'])
+        datacentermoid = get_datacentermoid(vccontent, datacenter_name)
+        datastoremoid = get_datastoremoid(vccontent, datacenter_name, esg.get('edge_datastore',
+                                                                              defaults['edge_datastore']))
+        resourcepoolid = get_edgeresourcepoolmoid(vccontent, datacenter_name, esg.get('edge_cluster',
+                                                                                      defaults['edge_cluster']))
+        if not (datacentermoid and datastoremoid and resourcepoolid):
+            raise ValueError('datacenter, datastore or cluster not found in vCenter')
+        portgroup_id = get_switch_id(client_session, vccontent, datacenter_name, esg['portgroup'])
+        if not portgroup_id:
+            raise ValueError('{} does NOT exist as VDS port group nor NSX logical switch'.format(esg['portgroup']))
+
+        submitted = time.time()
+        job_id, job_params = esg_create(client_session, esg['name'], esg.get('password', defaults['password']),
+                                        esg.get('size', defaults['size']), datacentermoid, datastoremoid,
+                                        resourcepoolid, portgroup_id,
+                                        esg_remote_access=esg.get('remote_access', defaults['remote_access']),
+                                        asynchronous=True)
+        if not job_id:
+            raise ValueError('creation failed')
+        esg_id = poller.wait(esg['name'], submitted)
+        if not esg_id:
+            raise ValueError('not deployed after {}s, NSX job {}'.format(deploy_timeout, job_id))
+
+        vnic_specs = []
+        for interface in esg.get('interfaces') or []:
+            interface_ls_id = None
+            if interface.get('ls'):
+                interface_ls_id = get_switch_id(client_session, vccontent, datacenter_name, interface['ls'])
+                if not interface_ls_id:
+                    raise ValueError('{} does NOT exist as VDS port group nor NSX logical switch'.format(
+                        interface['ls']))
+            netmask, prefixlen = None, None
+            if interface.get('mask'):
+                try:
+                    prefixlen = int(interface['mask'])
+                except ValueError:
+                    netmask = interface['mask']
+            vnic_specs.append({'index': interface['index'], 'ipaddr': interface.get('ip'), 'netmask': netmask,
+                               'prefixlen': prefixlen, 'name': interface.get('name'),
+                               'is_connected': interface.get('state', 'true'), 'portgroup_id': interface_ls_id,
+                               'vnic_type': interface.get('type')})
+        if vnic_specs and not esg_cfg_interfaces_by_id(client_session, esg_id, vnic_specs):
+            raise ValueError('{} vnics configuration failed'.format(esg_id))
+        default_gateway = esg_default_gateway(esg)
+        if default_gateway:
+            dgw_set = esg_dgw_set_by_id(client_session, esg_id, default_gateway['next_hop'],
+                                        default_gateway.get('vnic'))
+            if not dgw_set:
+                raise ValueError('{} default gateway configuration failed'.format(esg_id))
+        if esg.get('firewall_default'):
+            fw_set = esg_fw_default_set_by_id(client_session, esg_id, esg['firewall_default'])
+            if not fw_set:
+                raise ValueError('{} default firewall policy configuration failed'.format(esg_id))
+        return esg_id
+
+    esgs = list(esgs)
+    results = bounded_map(deploy, esgs, workers=workers)
+    return [(esg['name'], error is None, esg_id if error is None else str(error), duration)
+            for esg, (esg_id, error, duration) in zip(esgs, results)]
+
+
+def _esg_bulk_create(client_session, vccontent, **kwargs):
+    if not kwargs['route_file']:
+        print 'You must specify a file listing the ESGs for bulk_create, [-f FILE]'
+        return None
+    esgs = read_records(kwargs['route_file'])
+    if isinstance(esgs, dict):
+        esgs = esgs.get('esgs') or []
+    defaults = {'password': kwargs['esg_pwd'], 'size': kwargs['esg_size'],
+                'remote_access': kwargs['esg_remote_access'], 'datacenter_name': kwargs['datacenter_name'],
+                'edge_datastore': kwargs['edge_datastore'], 'edge_cluster': kwargs['edge_cluster']}
+    results = esg_bulk_create(client_session, vccontent, esgs, defaults, workers=kwargs['workers'],
+                              deploy_timeout=kwargs['deploy_timeout'])
+    if kwargs['output'] == 'json':
+        for name, success, details, duration in results:
+            print json.dumps({'name': name, 'success': success, 'id' if success else 'error': details,
+                              'duration': round(duration, 3)})
+    else:
+        print tabulate([(name, 'ok' if success else 'FAILED', details, '{:.1f}'.format(duration))
+                        for name, success, details, duration in results],
+                       headers=["ESG name", "Result", "ESG ID / Error", "Time (s)"], tablefmt="psql")
+
+
 def contruct_parser(subparsers):
     parser = subparsers.add_parser('esg', description="nsxv function for edge services gateway'%(prog)s @params.conf'.",
                                    help="Functions for edge services gateways",
@@ -724,11 +1168,21 @@ def contruct_parser(subparsers):
     add_route:        Add a static route to an ESG
     del_route:        Delete a static route from an ESG
     list_routes:      List all configured static routes on an ESG
+    apply_routes:     Add and delete the static routes listed in a file [-f FILE] with a single update per ESG,
+                      columns are esg_name (default [-n ESG_NAME]), action (add/del, default add), network, next_hop,
+                      vnic, mtu, admin_distance and description
     cfg_interface:    Configure IP and other interface details
+    cfg_interfaces:   Configure the vnics listed in a file [-f FILE] with a single update, columns are index, ls or
+                      portgroup, ip, mask, name, mtu, type and state (default true)
     clear_interface:  remove all configuration from an interface
     list_interfaces:  list all interfaces of dlr
     set_size:         Resize ESG
     set_fw_status:    Set the default firewall policy to accept or deny
+    bulk_create:      Deploy the ESGs listed in a file [-f FILE] with at most [-w WORKERS] concurrent deployments,
+                      each ESG being configured as soon as it is deployed. Keys are name, portgroup, password, size,
+                      remote_access, datacenter_name, edge_datastore, edge_cluster, interfaces ([{index, ls, ip,
+                      mask, name, type, state}]), default_gateway ({next_hop, vnic}, or the next hop with the vnic
+                      in default_gateway_vnic) and firewall_default, as in the esgs of an apply topology file
     """)
 
     parser.add_argument("-n",
@@ -780,9 +1234,30 @@ def contruct_parser(subparsers):
     parser.add_argument("-fw",
                         "--fw_default",
                         help="ESG firewall default rule action (accept/deny)")
+    parser.add_argument("-f",
+                        "--file",
+                        help="csv, json or yaml file listing the routes for apply_routes, the vnics for "
+                             "cfg_interfaces or the ESGs for bulk_create")
+    parser.add_argument("-w",
+                        "--workers",
+                        help="maximum number of ESGs deployed concurrently by bulk_create, default is {}".format(
+                            DEFAULT_WORKERS),
+                        type=int,
+                        default=DEFAULT_WORKERS)
+    parser.add_argument("-o",
+                        "--output",
+                        help="bulk_create results format, a table or JSON lines",
+                        choices=['table', 'json'],
+                        default='table')
+    parser.add_argument("--deploy_timeout",
+                        help="time in seconds after which bulk_create reports an ESG not deployed yet as failed, "
+                             "default is {}".format(DEPLOY_TIMEOUT),
+                        type=float,
+                        default=DEPLOY_TIMEOUT)
     parser.add_argument("-dc",
                         "--datacenter_name",
-                        help="vCenter DC name to deploy ESGs in, default is taken from INI File")
+                        help="vCenter DC name to deploy ESGs in, default is taken from INI File. "
+                             "When given, list only returns the ESGs of this DC")
     parser.add_argument("-ds",
                         "--edge_datastore",
                         help="Datastore name to deploy ESGs in, default is taken from INI File")
@@ -793,20 +1268,39 @@ def contruct_parser(subparsers):
     parser.set_defaults(func=_esg_main)
 
 
-def _esg_main(args):
-    if args.debug:
-        debug = True
+def _esg_sites_main(site_configs, args):
+    if args.command == 'list':
+        def site_rows(config):
+            datacentermoid = None
+            if args.datacenter_name:
+                datacentermoid = get_datacentermoid(get_vccontent(config), args.datacenter_name)
+                if not datacentermoid:
+                    return []
+            return esg_list(connect_to_nsx(config, args), datacentermoid)[0]
     else:
-        debug = False
+        if not args.esg_name:
+            print 'Mandatory parameter missing, [-n NAME]'
+            return None
+
+        def site_rows(config):
+            esg_id, esg_params = esg_read(connect_to_nsx(config, args), args.esg_name)
+            return [(args.esg_name, esg_id)] if esg_id else []
+    print_site_results(run_on_sites(site_configs, site_rows, timeout=getattr(args, 'site_timeout', None)),
+                       headers=["ESG name", "ESG ID"])
+
 
+def _esg_main(args):
     config = ConfigParser.ConfigParser()
     assert config.read(args.ini), 'could not read config file {}'.format(args.ini)
 
-    client_session = NsxClient(config.get('nsxraml', 'nsxraml_file'), config.get('nsxv', 'nsx_manager'),
-                               config.get('nsxv', 'nsx_username'), config.get('nsxv', 'nsx_password'), debug=debug)
+    site_configs = get_site_configs(config, getattr(args, 'site', None))
+    if args.command in ['list', 'read'] and len(site_configs) > 1:
+        return _esg_sites_main(site_configs, args)
+    config = single_site_config(config, getattr(args, 'site', None))
+
+    client_session = connect_to_nsx(config, args)
 
-    vccontent = connect_to_vc(config.get('vcenter', 'vcenter'), config.get('vcenter', 'vcenter_user'),
-                              config.get('vcenter', 'vcenter_passwd'))
+    vccontent = get_vccontent(config)
 
     if args.datacenter_name:
         datacenter_name = args.datacenter_name
@@ -833,12 +1327,15 @@ def _esg_main(args):
             'clear_dgw': _esg_dgw_clear,
             'read_dgw':  _esg_dgw_read,
             'cfg_interface': _esg_cfg_interface,
+            'cfg_interfaces': _esg_cfg_interfaces,
             'clear_interface': _esg_clear_interface,
             'list_interfaces': _esg_list_interfaces,
             'set_fw_status': _esg_fw_default_set,
             'add_route': _esg_route_add,
             'del_route': _esg_route_del,
-            'list_routes': _esg_route_list
+            'list_routes': _esg_route_list,
+            'apply_routes': _esg_apply_routes,
+            'bulk_create': _esg_bulk_create
         }
         command_selector[args.command](client_session, vccontent=vccontent, esg_name=args.esg_name,
                                        esg_pwd=args.esg_password, esg_size=args.esg_size,
@@ -847,7 +1344,9 @@ def _esg_main(args):
                                        portgroup=args.portgroup, logical_switch=args.logical_switch,
                                        vnic_index=args.vnic_index, vnic_type=args.vnic_type, vnic_name=args.vnic_name,
                                        vnic_state=args.vnic_state, vnic_ip=args.vnic_ip, vnic_mask=args.vnic_mask,
-                                       route_net=args.route_net, fw_default=args.fw_default,
+                                       route_net=args.route_net, fw_default=args.fw_default, route_file=args.file,
+                                       list_datacenter=args.datacenter_name, workers=args.workers,
+                                       output=args.output, deploy_timeout=args.deploy_timeout,
                                        esg_remote_access=args.esg_remote_access, verbose=args.verbose)
     except KeyError as e:
         print('Unknown command: {}'.format(e))
@@ -26,11 +26,16 @@ __author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
 
 import argparse
 import ConfigParser
+import copy
 import json
 from libutils import get_scope
 from libutils import get_logical_switch
+from libutils import connect_to_nsx, print_list_stream, print_table_stream, read_records
+from inventory import get_resolver, invalidate_inventory, iter_all_pages
+from parallel import bounded_map, DEFAULT_WORKERS
+from multisite import get_site_configs, single_site_config, run_on_sites, print_site_results
 from tabulate import tabulate
-from nsxramlclient.client import NsxClient
+from ramlcache import body_template
 from argparse import RawTextHelpFormatter
 
 
@@ -44,23 +49,34 @@ def logical_switch_create(client_session, transport_zone, logical_switch_name, c
     :return: returns a tuple, the first item is the logical switch ID in NSX as string, the second is string
              containing the logical switch URL location as returned from the API
     """
+    vdn_scope_id, create_spec = _logical_switch_create_spec(client_session, transport_zone, control_plane_mode)
+    new_ls = _logical_switch_create_one(client_session, vdn_scope_id, create_spec, logical_switch_name)
+    invalidate_inventory(client_session, 'logicalSwitchesGlobal')
+    return new_ls['body'], new_ls['location']
+
+
+def _logical_switch_create_spec(client_session, transport_zone, control_plane_mode=None):
     vdn_scope_id, vdn_scope = get_scope(client_session, transport_zone)
     assert vdn_scope_id, 'The Transport Zone you defined could not be found'
     if not control_plane_mode:
         control_plane_mode = vdn_scope['controlPlaneMode']
 
     # get a template dict for the lswitch create
-    lswitch_create_dict = client_session.extract_resource_body_example('logicalSwitches', 'create')
+    lswitch_create_dict = body_template(client_session, 'logicalSwitches', 'create')
 
-    # fill the details for the new lswitch in the body dict
+    # fill the details shared by all the new lswitches in the body dict
     lswitch_create_dict['virtualWireCreateSpec']['controlPlaneMode'] = control_plane_mode
-    lswitch_create_dict['virtualWireCreateSpec']['name'] = logical_switch_name
     lswitch_create_dict['virtualWireCreateSpec']['tenantId'] = ''
+    return vdn_scope_id, lswitch_create_dict['virtualWireCreateSpec']
 
-    # create new lswitch
-    new_ls = client_session.create('logicalSwitches', uri_parameters={'scopeId': vdn_scope_id},
-                                   request_body_dict=lswitch_create_dict)
-    return new_ls['body'], new_ls['location']
+
+def _logical_switch_create_one(client_session, vdn_scope_id, create_spec, logical_switch_name):
+    # the spec is shared, every create sends its own shallow copy holding the name
+    lswitch_create_spec = copy.copy(create_spec)
+    lswitch_create_spec['name'] = logical_switch_name
+    lswitch_create_dict = {'virtualWireCreateSpec': lswitch_create_spec}
+    return client_session.create('logicalSwitches', uri_parameters={'scopeId': vdn_scope_id},
+                                 request_body_dict=lswitch_create_dict)
 
 
 def _logical_switch_create(client_session, **kwargs):
@@ -89,6 +105,7 @@ def logical_switch_delete(client_session, logical_switch_name):
     if not logical_switch_id:
         return False, None
     client_session.delete('logicalSwitch', uri_parameters={'virtualWireID': logical_switch_id})
+    invalidate_inventory(client_session, 'logicalSwitchesGlobal')
     return True, logical_switch_id
 
 
@@ -132,6 +149,107 @@ def _logical_switch_read(client_session, **kwargs):
         print 'Logical Switch {} not found'.format(logical_switch_name)
 
 
+def logical_switch_bulk_create(client_session, transport_zone, logical_switch_names, control_plane_mode=None,
+                               workers=DEFAULT_WORKERS):
+    """
+    This function will create new logical switches in NSX, with at most workers concurrent creates. The Transport
+    Zone is resolved and the body template extracted once for all the logical switches
+    :param client_session: An instance of an NsxClient Session
+    :param transport_zone: The name of the Scope (Transport Zone)
+    :param logical_switch_names: The names that will be assigned to the new logical switches
+    :param control_plane_mode: (Optional) Control Plane Mode, uses the Transport Zone default if not specified
+    :param workers: (Optional) Maximum number of concurrent creates
+    :return: A list of tuples in the order of logical_switch_names, with item 0 containing the logical switch name,
+             item 1 True on success, item 2 the logical switch ID on success or the error message on failure and
+             item 3 the duration of the create in seconds
+    """
+    vdn_scope_id, create_spec = _logical_switch_create_spec(client_session, transport_zone, control_plane_mode)
+    logical_switch_names = list(logical_switch_names)
+    results = bounded_map(lambda name: _logical_switch_create_one(client_session, vdn_scope_id, create_spec,
+                                                                  name)['body'],
+                          logical_switch_names, workers=workers)
+    invalidate_inventory(client_session, 'logicalSwitchesGlobal')
+    return [(name, error is None, logical_switch_id if error is None else str(error), duration)
+            for name, (logical_switch_id, error, duration) in zip(logical_switch_names, results)]
+
+
+def logical_switch_bulk_delete(client_session, logical_switch_names, workers=DEFAULT_WORKERS):
+    """
+    This function will delete logical switches in NSX, with at most workers concurrent deletes. The names are
+    resolved with one listing of the logical switches
+    :param client_session: An instance of an NsxClient Session
+    :param logical_switch_names: The names of the logical switches to delete
+    :param workers: (Optional) Maximum number of concurrent deletes
+    :return: A list of tuples in the order of logical_switch_names, with item 0 containing the logical switch name,
+             item 1 True on success, item 2 the logical switch ID on success or the error message on failure and
+             item 3 the duration of the delete in seconds
+    """
+    index = get_resolver(client_session).index('logicalSwitchesGlobal', fresh=True)
+
+    def delete(name):
+        logical_switch_id = index.by_name.get(name)
+        if not logical_switch_id:
+            raise ValueError('Logical Switch {} not found'.format(name))
+        client_session.delete('logicalSwitch', uri_parameters={'virtualWireID': logical_switch_id})
+        return logical_switch_id
+
+    logical_switch_names = list(logical_switch_names)
+    results = bounded_map(delete, logical_switch_names, workers=workers)
+    invalidate_inventory(client_session, 'logicalSwitchesGlobal')
+    return [(name, error is None, logical_switch_id if error is None else str(error), duration)
+            for name, (logical_switch_id, error, duration) in zip(logical_switch_names, results)]
+
+
+def _bulk_names(**kwargs):
+    if kwargs['names_file']:
+        records = read_records(kwargs['names_file'])
+        return [record['name'] if isinstance(record, dict) else str(record) for record in records]
+    if kwargs['logical_switch_name']:
+        return [name.strip() for name in kwargs['logical_switch_name'].split(',') if name.strip()]
+    return []
+
+
+def _bulk_print(results, output):
+    if output == 'json':
+        for name, success, details, duration in results:
+            print json.dumps({'name': name, 'success': success, 'id' if success else 'error': details,
+                              'duration': round(duration, 3)})
+    else:
+        print tabulate([(name, 'ok' if success else 'FAILED', details, '{:.1f}'.format(duration))
+                        for name, success, details, duration in results],
+                       headers=["LS name", "Result", "LS ID / Error", "Time (s)"], tablefmt="psql")
+
+
+def _logical_switch_bulk_create(client_session, **kwargs):
+    names = _bulk_names(**kwargs)
+    if not names:
+        print 'You must specify logical switch names for bulk_create, [-n NAME,NAME] or [-f FILE]'
+        return None
+    _bulk_print(logical_switch_bulk_create(client_session, kwargs['transport_zone'], names,
+                                           workers=kwargs['workers']), kwargs['output'])
+
+
+def _logical_switch_bulk_delete(client_session, **kwargs):
+    names = _bulk_names(**kwargs)
+    if not names:
+        print 'You must specify logical switch names for bulk_delete, [-n NAME,NAME] or [-f FILE]'
+        return None
+    _bulk_print(logical_switch_bulk_delete(client_session, names, workers=kwargs['workers']), kwargs['output'])
+
+
+def iter_logical_switches(client_session):
+    """
+    This function yields the logical switches found in NSX page by page as they are read
+    :param client_session: An instance of an NsxClient Session
+    :return: A generator of dictionaries containing the logical switch details
+    """
+    return iter_all_pages(client_session, 'logicalSwitchesGlobal')
+
+
+def _logical_switch_row(ls):
+    return ls.get('name', '<empty name>'), ls['objectId']
+
+
 def logical_switch_list(client_session):
     """
     This function returns all logical switches found in NSX
@@ -140,23 +258,17 @@ def logical_switch_list(client_session):
              and item 1 containing the LS id as string. The second item contains a list of dictionaries containing
              all logical switch details
     """
-    all_logical_switches = client_session.read_all_pages('logicalSwitchesGlobal', 'read')
-    switch_list = []
-    for ls in all_logical_switches:
-        try:
-            lsname = ls['name']
-        except KeyError:
-            lsname = '<empty name>'
-        switch_list.append((lsname, ls['objectId']))
+    all_logical_switches = list(iter_logical_switches(client_session))
+    switch_list = [_logical_switch_row(ls) for ls in all_logical_switches]
     return switch_list, all_logical_switches
 
 
 def _logical_switch_list_print(client_session, **kwargs):
-    switches_list, switches_params = logical_switch_list(client_session)
     if kwargs['verbose']:
-        print switches_params
+        print_list_stream(iter_logical_switches(client_session))
     else:
-        print tabulate(switches_list, headers=["LS name", "LS ID"], tablefmt="psql")
+        print_table_stream((_logical_switch_row(ls) for ls in iter_logical_switches(client_session)),
+                           headers=["LS name", "LS ID"])
 
 
 def contruct_parser(subparsers):
@@ -169,6 +281,8 @@ def contruct_parser(subparsers):
     read:   return the virtual wire id of a logical switch
     delete: delete a logical switch"
     list:   return a list of all logical switches
+    bulk_create: create the logical switches given with -n as comma separated names or with -f
+    bulk_delete: delete the logical switches given with -n as comma separated names or with -f
     """)
 
     parser.add_argument("-t",
@@ -176,27 +290,57 @@ def contruct_parser(subparsers):
                         help="nsx transport zone")
     parser.add_argument("-n",
                         "--name",
-                        help="logical switch name, needed for create, read and delete")
+                        help="logical switch name, needed for create, read and delete. "
+                             "Comma separated names for bulk_create and bulk_delete")
+    parser.add_argument("-f",
+                        "--file",
+                        help="csv, json or yaml file listing the logical switch names for bulk_create and "
+                             "bulk_delete, csv files need a name column")
+    parser.add_argument("-w",
+                        "--workers",
+                        help="maximum number of concurrent creates or deletes, default is {}".format(DEFAULT_WORKERS),
+                        type=int,
+                        default=DEFAULT_WORKERS)
+    parser.add_argument("-o",
+                        "--output",
+                        help="bulk_create and bulk_delete results format, a table or JSON lines",
+                        choices=['table', 'json'],
+                        default='table')
 
     parser.set_defaults(func=_lswitch_main)
 
 
-def _lswitch_main(args):
-    if args.debug:
-        debug = True
+def _lswitch_sites_main(site_configs, args):
+    if args.command == 'list':
+        def site_rows(config):
+            return logical_switch_list(connect_to_nsx(config, args))[0]
     else:
-        debug = False
+        if not args.name:
+            print 'You must specify a logical switch name for read'
+            return None
 
+        def site_rows(config):
+            logical_switch_id, logical_switch_params = logical_switch_read(connect_to_nsx(config, args), args.name)
+            return [(args.name, logical_switch_id)] if logical_switch_id else []
+    print_site_results(run_on_sites(site_configs, site_rows, timeout=getattr(args, 'site_timeout', None)),
+                       headers=["LS name", "LS ID"])
+
+
+def _lswitch_main(args):
     config = ConfigParser.ConfigParser()
     assert config.read(args.ini), 'could not read config file {}'.format(args.ini)
 
+    site_configs = get_site_configs(config, getattr(args, 'site', None))
+    if args.command in ['list', 'read'] and len(site_configs) > 1:
+        return _lswitch_sites_main(site_configs, args)
+    config = single_site_config(config, getattr(args, 'site', None))
+
     if args.transport_zone:
         transport_zone = args.transport_zone
     else:
         transport_zone = config.get('defaults', 'transport_zone')
 
-    client_session = NsxClient(config.get('nsxraml', 'nsxraml_file'), config.get('nsxv', 'nsx_manager'),
-                               config.get('nsxv', 'nsx_username'), config.get('nsxv', 'nsx_password'), debug=debug)
+    client_session = connect_to_nsx(config, args)
 
     try:
         command_selector = {
@@ -204,9 +348,12 @@ def _lswitch_main(args):
             'create': _logical_switch_create,
             'delete': _logical_switch_delete,
             'read': _logical_switch_read,
+            'bulk_create': _logical_switch_bulk_create,
+            'bulk_delete': _logical_switch_bulk_delete,
             }
         command_selector[args.command](client_session, transport_zone=transport_zone,
-                                       logical_switch_name=args.name, verbose=args.verbose)
+                                       logical_switch_name=args.name, names_file=args.file, workers=args.workers,
+                                       output=args.output, verbose=args.verbose)
     except KeyError:
         print('Unknown command')
 
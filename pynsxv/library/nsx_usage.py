@@ -26,14 +26,43 @@ __author__ = 'yfauser'
 
 import argparse
 import ConfigParser
+import hashlib
+import json
+import os
+import sqlite3
 from tabulate import tabulate
-from nsxramlclient.client import NsxClient
-from libutils import connect_to_vc
+from libutils import get_vccontent, connect_to_nsx
 from libutils import VIM_TYPES
-from libutils import get_all_objs
-
-
-def host_prep_state(session):
+from libutils import retrieve_properties, get_property_watcher
+from inventory import iter_all_pages, DEFAULT_CACHE_DIR
+from parallel import bounded_map, get_rate_limiter, Progress, DEFAULT_WORKERS
+from multisite import get_site_configs, single_site_config, run_on_sites, print_site_results
+
+
+HOST_PROPERTIES = ['hardware.cpuInfo.numCpuPackages', 'vm']
+# edge summary fields changing without a configuration change of the edge
+EDGE_STATUS_FIELDS = ('edgeStatus', 'appliancesSummary', 'recentJobInfo', 'numberOfConnectedVnics')
+
+
+def _cluster_hosts(session, cluster_moid, dfw_enabled):
+    hosts_status = session.read('childStatus', uri_parameters={'parentResourceID': cluster_moid})
+    enabled_hosts = session.normalize_list_return(hosts_status['body']['resourceStatuses']['resourceStatus'])
+    return [(host['resource']['name'], host['resource']['scope']['name'], host['resource']['objectId'],
+             host['resource']['scope']['id'], dfw_enabled) for host in enabled_hosts]
+
+
+def host_prep_state(session, workers=DEFAULT_WORKERS, rate_limiter=None, cluster_timings=None):
+    """
+    This function returns the hosts prepared for NSX, reading the host status of the clusters concurrently
+    :param session: An instance of an NsxClient Session
+    :param workers: (Optional) Maximum number of concurrent cluster reads
+    :param rate_limiter: (Optional) A RateLimiter shared by all the reads sent to the NSX Manager
+    :param cluster_timings: (Optional) A list extended with a tuple per cluster, with item 0 containing the cluster
+                            name, item 1 the cluster moid and item 2 the duration of the cluster read in seconds
+    :return: returns a tuple, the first item is the number of prepared hosts, the second the number of DFW enabled
+             hosts and the third a list of tuples with the host name, cluster name, host moid, cluster moid and DFW
+             state, in cluster order
+    """
     resource_status = session.read('statusResourceType', uri_parameters={'resourceType': 'ClusterComputeResource'})
     enabled_clusters = session.normalize_list_return(resource_status['body']['resourceStatuses']['resourceStatus'])
     clusters = []
@@ -43,13 +72,16 @@ def host_prep_state(session):
                        if feature['featureId'] == 'com.vmware.vshield.firewall'][0]
         clusters.append((cluster['resource']['objectId'], cluster['resource']['name'], dfw_enabled))
 
+    results = bounded_map(lambda cluster: _cluster_hosts(session, cluster[0], cluster[2]), clusters,
+                          workers=workers, rate_limiter=rate_limiter)
+
     hosts = []
-    for cluster_moid, cluster_name, dfw_enabled in clusters:
-        hosts_status = session.read('childStatus', uri_parameters={'parentResourceID': cluster_moid})
-        enabled_hosts = session.normalize_list_return(hosts_status['body']['resourceStatuses']['resourceStatus'])
-        hosts.extend([(host['resource']['name'], host['resource']['scope']['name'],
-                       host['resource']['objectId'], host['resource']['scope']['id'],
-                       dfw_enabled) for host in enabled_hosts])
+    for (cluster_moid, cluster_name, dfw_enabled), (cluster_hosts, error, duration) in zip(clusters, results):
+        if error:
+            raise error
+        if cluster_timings is not None:
+            cluster_timings.append((cluster_name, cluster_moid, duration))
+        hosts.extend(cluster_hosts)
 
     prepared_hosts_count = len(hosts)
     dfw_enabled_hosts_count = len([host for host in hosts if host[4] == 'true'])
@@ -57,51 +89,90 @@ def host_prep_state(session):
     return prepared_hosts_count, dfw_enabled_hosts_count, hosts
 
 
-def get_host_info(vccontent, host_list):
+def get_host_info(vccontent, host_list, watcher=None):
+    """
+    This function retrieves the hardware and VM details of the NSX prepared hosts from vCenter in one bulk retrieval
+    :param vccontent: The vCenter content, as returned by connect_to_vc
+    :param host_list: The list of host tuples returned by host_prep_state
+    :param watcher: (Optional) A PropertyWatcher of the HOST_PROPERTIES of the hosts, only the hosts that changed
+                    since its previous poll are transferred from vCenter
+    :return: A list of tuples with item 0 containing the host name, item 1 the host moid, item 2 the CPU socket
+             count and item 3 the VM count, hosts not found in vCenter are left out
+    """
+    if watcher:
+        watcher.poll()
+        host_records = dict((host_mo._moId, properties) for host_mo, properties in watcher.objects.items())
+    else:
+        host_records = dict((host_mo._moId, properties) for host_mo, properties in
+                            retrieve_properties(vccontent, VIM_TYPES['host'], HOST_PROPERTIES))
     host_info = []
-    host_modict = get_all_objs(vccontent, VIM_TYPES['host'])
-    for host_name in [host[0] for host in host_list]:
-        print 'retrieving details (hardware & vms) for host {} ....'.format(host_name),
-        host_object = [host_mo for host_mo in host_modict if host_mo.name == host_name][0]
-        cpu_count = host_object.hardware.cpuInfo.numCpuPackages
+    for host_name, cluster_name, host_moid, cluster_moid, dfw_enabled in host_list:
+        host_properties = host_records.get(host_moid)
+        if host_properties is None:
+            print 'host {} ({}) was not found in vCenter'.format(host_name, host_moid)
+            continue
         #TODO: Filter service VMs out of the count
-        vm_moids = [vm._moId for vm in host_object.vm]
-        vm_count = len(vm_moids)
-        host_info.extend([(host_name, cpu_count, vm_count)])
-        print 'Done'
+        host_info.append((host_name, host_moid, host_properties['hardware.cpuInfo.numCpuPackages'],
+                          len(host_properties.get('vm', []))))
     return host_info
 
 
 def calculate_socket_usage(host_list, host_info):
+    dfw_enabled_by_moid = dict((nsx_host[2], nsx_host[4]) for nsx_host in host_list)
     nsx_socket_count = 0
     dfw_scocket_count = 0
-    for host in host_info:
-        for nsx_host in host_list:
-            if host[0] == nsx_host[0]:
-                if nsx_host[4] == 'true':
-                    dfw_scocket_count += int(host[1])
-                nsx_socket_count += int(host[1])
+    for host_name, host_moid, cpu_count, vm_count in host_info:
+        if host_moid in dfw_enabled_by_moid:
+            if dfw_enabled_by_moid[host_moid] == 'true':
+                dfw_scocket_count += int(cpu_count)
+            nsx_socket_count += int(cpu_count)
     return nsx_socket_count, dfw_scocket_count
 
 
 def ls_state(session):
-    all_logical_switches = session.read_all_pages('logicalSwitchesGlobal', 'read')
-    ls_list = [(ls['name'], ls['objectId']) for ls in all_logical_switches if ls['isUniversal'] == 'false']
-    uls_list = [(ls['name'], ls['objectId']) for ls in all_logical_switches if ls['isUniversal'] == 'true']
+    ls_list = []
+    uls_list = []
+    for ls in iter_all_pages(session, 'logicalSwitchesGlobal'):
+        if ls['isUniversal'] == 'false':
+            ls_list.append((ls['name'], ls['objectId']))
+        elif ls['isUniversal'] == 'true':
+            uls_list.append((ls['name'], ls['objectId']))
     return len(ls_list), ls_list, len(uls_list), uls_list
 
 
-def edge_state(session):
-    edge_status = session.read_all_pages('nsxEdges', 'read')
-    esg_list = [(edge['objectId'], edge['name']) for edge in edge_status if edge['edgeType'] == 'gatewayServices']
-    dlr_list = [(edge['objectId'], edge['name']) for edge in edge_status if edge['edgeType'] == 'distributedRouter']
+def edge_version(edge):
+    """
+    :param edge: An edge summary dictionary of the edges listing
+    :return: A string changing whenever the configuration of the edge changes, the edge revision if the listing
+             holds it, else a hash of the summary without its status fields
+    """
+    if edge.get('revision'):
+        return 'revision-{}'.format(edge['revision'])
+    summary = dict((key, value) for key, value in edge.items() if key not in EDGE_STATUS_FIELDS)
+    return hashlib.sha1(json.dumps(summary, sort_keys=True)).hexdigest()
+
+
+def edge_state(session, edge_versions=None):
+    """
+    :param session: An instance of an NsxClient Session
+    :param edge_versions: (Optional) A dictionary updated with the edge_version of every edge, keyed by edge id
+    :return: A tuple with the number of ESGs, the list of (edge id, name) tuples of the ESGs, the number of DLRs and
+             the list of (edge id, name) tuples of the DLRs
+    """
+    esg_list = []
+    dlr_list = []
+    for edge in iter_all_pages(session, 'nsxEdges'):
+        if edge_versions is not None:
+            edge_versions[edge['objectId']] = edge_version(edge)
+        if edge['edgeType'] == 'gatewayServices':
+            esg_list.append((edge['objectId'], edge['name']))
+        elif edge['edgeType'] == 'distributedRouter':
+            dlr_list.append((edge['objectId'], edge['name']))
     return len(esg_list), esg_list, len(dlr_list), dlr_list
 
 
 def _single_esg_feature_collect(session, edge_id, edge_name):
-    print 'retrieving the features for Services Gateway {}/{} ....'.format(edge_name, edge_id),
     edge_details = session.read('nsxEdge', uri_parameters={'edgeId': edge_id})['body']
-    print 'Done'
     feature_map = {}
     for feature in edge_details['edge']['features'].keys():
         try:
@@ -116,62 +187,208 @@ def _single_esg_feature_collect(session, edge_id, edge_name):
     return return_tupple
 
 
-def esg_features_collect(session, edge_list):
+def esg_features_collect(session, edge_list, workers=DEFAULT_WORKERS, rate_limiter=None, announce=True):
+    """
+    This function reads the enabled features of the Services Gateways, with at most workers concurrent reads
+    :param session: An instance of an NsxClient Session
+    :param edge_list: A list of tuples with item 0 containing the edge id and item 1 containing the edge name
+    :param workers: (Optional) Maximum number of concurrent edge reads
+    :param rate_limiter: (Optional) A RateLimiter shared by all the reads sent to the NSX Manager
+    :param announce: (Optional) print the progress of the reads and the edges that could not be read
+    :return: A list of feature tuples in the order of edge_list, the features of edges that could not be read are
+             set to 'n/a'
+    """
+    progress = Progress('retrieving the features of the Services Gateways', len(edge_list)) if announce else None
+    results = bounded_map(lambda edge: _single_esg_feature_collect(session, edge[0], edge[1]), edge_list,
+                          workers=workers, rate_limiter=rate_limiter, progress=progress)
+    if progress:
+        progress.finish()
+
     feature_list = []
-    for edge_name, edge_id in edge_list:
-        feature_list.append(_single_esg_feature_collect(session, edge_name, edge_id))
+    for (edge_id, edge_name), (features, error, duration) in zip(edge_list, results):
+        if error and announce:
+            print 'failed to retrieve the features for Services Gateway {}/{}: {}'.format(edge_name, edge_id, error)
+        if error:
+            features = (edge_name, edge_id) + ('n/a',) * 6
+        feature_list.append(features)
     return feature_list
 
 
+class UsageSnapshot(object):
+    """
+    SQLite snapshot of the ESG features read by the previous usage run of an NSX Manager, reused for the edges
+    whose edge_version did not change since
+    """
+    def __init__(self, nsx_manager, cache_dir=DEFAULT_CACHE_DIR):
+        """
+        :param nsx_manager: The NSX Manager the snapshot is taken from
+        :param cache_dir: (Optional) The directory holding the snapshot database
+        """
+        self.nsx_manager = nsx_manager
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, 0o700)
+        self.path = os.path.join(cache_dir, 'usage.sqlite')
+        db = sqlite3.connect(self.path)
+        try:
+            with db:
+                db.execute('CREATE TABLE IF NOT EXISTS esg_features (manager TEXT, edge_id TEXT, version TEXT, '
+                           'features TEXT, PRIMARY KEY (manager, edge_id))')
+        finally:
+            db.close()
+
+    def esg_features(self):
+        """
+        :return: A dictionary keyed by edge id, with values being tuples with item 0 containing the edge version and
+                 item 1 the feature tuple of the edge
+        """
+        db = sqlite3.connect(self.path)
+        try:
+            rows = db.execute('SELECT edge_id, version, features FROM esg_features WHERE manager = ?',
+                              (self.nsx_manager,)).fetchall()
+        finally:
+            db.close()
+        return dict((edge_id, (version, tuple(json.loads(features)))) for edge_id, version, features in rows)
+
+    def save_esg_features(self, features_by_edge):
+        """
+        Replaces the snapshot of this NSX Manager
+        :param features_by_edge: A dictionary keyed by edge id, with values being tuples with item 0 containing the
+                                 edge version and item 1 the feature tuple of the edge
+        """
+        db = sqlite3.connect(self.path)
+        try:
+            with db:
+                db.execute('DELETE FROM esg_features WHERE manager = ?', (self.nsx_manager,))
+                db.executemany('INSERT INTO esg_features VALUES (?, ?, ?, ?)',
+                               [(self.nsx_manager, edge_id, version, json.dumps(features))
+                                for edge_id, (version, features) in features_by_edge.items()])
+        finally:
+            db.close()
+
+
+def esg_features_incremental(session, edge_list, edge_versions, snapshot, workers=DEFAULT_WORKERS,
+                             rate_limiter=None, announce=True):
+    """
+    This function returns the features of the Services Gateways as esg_features_collect does, but only reads the
+    edges that are not in the snapshot with the same edge version, and updates the snapshot
+    :param session: An instance of an NsxClient Session
+    :param edge_list: A list of tuples with item 0 containing the edge id and item 1 containing the edge name
+    :param edge_versions: A dictionary of the edge versions keyed by edge id, as filled by edge_state
+    :param snapshot: A UsageSnapshot of the NSX Manager
+    :return: A tuple, the first item is the list of feature tuples in the order of edge_list, the second the number
+             of edges read from the NSX Manager
+    """
+    known = snapshot.esg_features()
+    changed = [edge for edge in edge_list
+               if edge[0] not in known or known[edge[0]][0] != edge_versions.get(edge[0])]
+    read = dict((features[1], features) for features in
+                esg_features_collect(session, changed, workers=workers, rate_limiter=rate_limiter,
+                                     announce=announce))
+
+    feature_list = []
+    features_by_edge = {}
+    for edge_id, edge_name in edge_list:
+        if edge_id in read:
+            features = read[edge_id]
+        else:
+            features = (edge_name,) + known[edge_id][1][1:]
+        feature_list.append(features)
+        if 'n/a' not in features:
+            features_by_edge[edge_id] = (edge_versions.get(edge_id), features)
+    snapshot.save_esg_features(features_by_edge)
+    return feature_list, len(changed)
+
+
 def contruct_parser(subparsers):
     parser = subparsers.add_parser('usage', description="Functions to retrieve NSX-v usage statistics",
                                    help="Functions to retrieve NSX-v usage statistics")
+    parser.add_argument("-w",
+                        "--workers",
+                        help="maximum number of concurrent NSX API reads, default is {}".format(DEFAULT_WORKERS),
+                        type=int,
+                        default=DEFAULT_WORKERS)
+    parser.add_argument("--rate_limit",
+                        help="maximum number of NSX API reads per second sent to the NSX Manager, default is no limit",
+                        type=float)
+    parser.add_argument("--incremental",
+                        help="only read the ESGs changed since the previous incremental run. The hosts are only "
+                             "read incrementally when run through 'pynsxv serve', as the vCenter update versions "
+                             "live as long as the vCenter session: a standalone run reads all the hosts",
+                        action="store_true")
     parser.set_defaults(func=_usage_main)
 
 
-def _usage_main(args):
-    if args.debug:
-        debug = True
-    else:
-        debug = False
-
-    config = ConfigParser.ConfigParser()
-    assert config.read(args.ini), 'could not read config file {}'.format(args.ini)
-
-    client_session = NsxClient(config.get('nsxraml', 'nsxraml_file'), config.get('nsxv', 'nsx_manager'),
-                               config.get('nsxv', 'nsx_username'), config.get('nsxv', 'nsx_password'), debug=debug)
-
-    vccontent = connect_to_vc(config.get('vcenter', 'vcenter'), config.get('vcenter', 'vcenter_user'),
-                              config.get('vcenter', 'vcenter_passwd'))
-
-    print 'retrieving the hosts prepared for NSX ....',
-    host_count, dfw_enabled_hosts, host_list = host_prep_state(client_session)
-    print 'Done'
-    if args.verbose:
+def usage_summary(client_session, vccontent, workers=DEFAULT_WORKERS, rate_limiter=None, verbose=False,
+                  announce=True, snapshot=None):
+    """
+    This function collects the NSX usage of one NSX Manager and its vCenter
+    :param client_session: An instance of an NsxClient Session
+    :param vccontent: The vCenter content, as returned by connect_to_vc or get_vccontent
+    :param workers: (Optional) Maximum number of concurrent NSX API reads
+    :param rate_limiter: (Optional) A RateLimiter shared by all the reads sent to the NSX Manager
+    :param verbose: (Optional) print the details collected in every step
+    :param announce: (Optional) print the steps as they run
+    :param snapshot: (Optional) A UsageSnapshot of the NSX Manager for an incremental run, only the changed ESGs are
+                     read and the hosts are tracked with a PropertyWatcher of the vCenter session
+    :return: A list of tuples with item 0 containing the feature, property or type counted and item 1 the count
+             as string
+    """
+    def step(message, same_line=True):
+        if announce and same_line:
+            print message,
+        elif announce:
+            print message
+
+    def done():
+        if announce:
+            print 'Done'
+
+    step('retrieving the hosts prepared for NSX ....')
+    cluster_timings = []
+    host_count, dfw_enabled_hosts, host_list = host_prep_state(client_session, workers=workers,
+                                                               rate_limiter=rate_limiter,
+                                                               cluster_timings=cluster_timings)
+    done()
+    if verbose:
         print tabulate(host_list, headers=["Host name", "Cluster name", "Host moid", "Cluster moid", "DFW enabled"],
                        tablefmt="psql")
-
-    print 'retrieving the hosts detailed information ....'
-    host_info = get_host_info(vccontent, host_list)
-    if args.verbose:
-        print tabulate(host_info, headers=["Host name", "CPU Socket count", "VM count"], tablefmt="psql")
-
-    print 'retrieving the number of NSX logical switches ....',
+        cluster_timings.sort(key=lambda timing: timing[2], reverse=True)
+        print tabulate([(name, moid, '{:.3f}'.format(duration)) for name, moid, duration in cluster_timings],
+                       headers=["Cluster name", "Cluster moid", "Host status read time (s)"], tablefmt="psql")
+
+    step('retrieving the hosts detailed information ....', same_line=False)
+    watcher = get_property_watcher(vccontent, VIM_TYPES['host'], HOST_PROPERTIES) if snapshot else None
+    host_info = get_host_info(vccontent, host_list, watcher=watcher)
+    done()
+    if verbose:
+        print tabulate(host_info, headers=["Host name", "Host moid", "CPU Socket count", "VM count"], tablefmt="psql")
+
+    step('retrieving the number of NSX logical switches ....')
     ls_count, ls_list, uls_count, uls_list = ls_state(client_session)
-    print 'Done'
-    if args.verbose:
+    done()
+    if verbose:
         print tabulate(ls_list, headers=["Logical switch name", "Logical switch Id"], tablefmt="psql")
         print tabulate(uls_list, headers=["Universal Logical switch name", "Logical switch Id"], tablefmt="psql")
 
-    print 'retrieving the number of NSX gateways (ESGs and DLRs) ....',
-    esg_count, esg_list, dlr_count, dlr_list = edge_state(client_session)
-    print 'Done'
-    if args.verbose:
+    step('retrieving the number of NSX gateways (ESGs and DLRs) ....')
+    edge_versions = {}
+    esg_count, esg_list, dlr_count, dlr_list = edge_state(client_session, edge_versions=edge_versions)
+    done()
+    if verbose:
         print tabulate(esg_list, headers=["Edge service gw name", "Edge service gw Id"], tablefmt="psql")
         print tabulate(dlr_list, headers=["Logical router name", "Logical router Id"], tablefmt="psql")
 
-    edge_feature_list = esg_features_collect(client_session, esg_list)
-    if args.verbose:
+    if snapshot:
+        edge_feature_list, read_count = esg_features_incremental(client_session, esg_list, edge_versions, snapshot,
+                                                                 workers=workers, rate_limiter=rate_limiter,
+                                                                 announce=announce)
+        if announce:
+            print '{} of {} Services Gateways changed since the previous incremental run'.format(read_count,
+                                                                                                  esg_count)
+    else:
+        edge_feature_list = esg_features_collect(client_session, esg_list, workers=workers,
+                                                 rate_limiter=rate_limiter, announce=announce)
+    if verbose:
         print tabulate(edge_feature_list, headers=["Edge service gw name", "Edge service gw Id", "Loadbalancer",
                                                    "Firewall", "Routing", "IPSec", "L2VPN", "SSL-VPN"], tablefmt="psql")
 
@@ -183,20 +400,45 @@ def _usage_main(args):
     sslvpn_esg = len([edge for edge in edge_feature_list if edge[7] == 'true'])
     nsx_sockets, dfw_sockets = calculate_socket_usage(host_list, host_info)
 
-    output_table = [('Number of hosts prepared for NSX', str(host_count)),
-                    ('Number of hosts enabled to use DFW', str(dfw_enabled_hosts)),
-                    ('Number of CPU Sockets enabled for NSX', str(nsx_sockets)),
-                    ('Number of CPU Sockets enabled for DFW', str(dfw_sockets)),
-                    ('Number of local logical switches', str(ls_count)),
-                    ('Number of universal logical switches', str(uls_count)),
-                    ('Number of Edge services Gateways', str(esg_count)),
-                    ('Number of Distributed Routers', str(dlr_count)),
-                    ('Number of Service Gateways with Loadbalancing Enabled', str(lb_esg)),
-                    ('Number of Service Gateways with Firewall Enabled', str(fw_esg)),
-                    ('Number of Service Gateways with Routing Enabled', str(rt_esg)),
-                    ('Number of Service Gateways with IPSec Enabled', str(ipsec_esg)),
-                    ('Number of Service Gateways with L2VPN Enabled', str(l2vpn_esg)),
-                    ('Number of Service Gateways with SSL-VPN Enabled', str(sslvpn_esg))]
+    return [('Number of hosts prepared for NSX', str(host_count)),
+            ('Number of hosts enabled to use DFW', str(dfw_enabled_hosts)),
+            ('Number of CPU Sockets enabled for NSX', str(nsx_sockets)),
+            ('Number of CPU Sockets enabled for DFW', str(dfw_sockets)),
+            ('Number of local logical switches', str(ls_count)),
+            ('Number of universal logical switches', str(uls_count)),
+            ('Number of Edge services Gateways', str(esg_count)),
+            ('Number of Distributed Routers', str(dlr_count)),
+            ('Number of Service Gateways with Loadbalancing Enabled', str(lb_esg)),
+            ('Number of Service Gateways with Firewall Enabled', str(fw_esg)),
+            ('Number of Service Gateways with Routing Enabled', str(rt_esg)),
+            ('Number of Service Gateways with IPSec Enabled', str(ipsec_esg)),
+            ('Number of Service Gateways with L2VPN Enabled', str(l2vpn_esg)),
+            ('Number of Service Gateways with SSL-VPN Enabled', str(sslvpn_esg))]
+
+
+def _usage_site(config, args, verbose=False, announce=True):
+    client_session = connect_to_nsx(config, args)
+    rate_limiter = get_rate_limiter(config.get('nsxv', 'nsx_manager'), args.rate_limit)
+    vccontent = get_vccontent(config)
+    snapshot = UsageSnapshot(config.get('nsxv', 'nsx_manager')) if getattr(args, 'incremental', False) else None
+    return usage_summary(client_session, vccontent, workers=args.workers, rate_limiter=rate_limiter,
+                         verbose=verbose, announce=announce, snapshot=snapshot)
+
+
+def _usage_main(args):
+    config = ConfigParser.ConfigParser()
+    assert config.read(args.ini), 'could not read config file {}'.format(args.ini)
+
+    site_configs = get_site_configs(config, getattr(args, 'site', None))
+    if len(site_configs) > 1:
+        print 'retrieving the NSX usage of the sites {} ....'.format(', '.join(site_configs))
+        results = run_on_sites(site_configs, lambda site_config: _usage_site(site_config, args, announce=False),
+                               timeout=getattr(args, 'site_timeout', None))
+        print '\n\nNSX usage summary:'
+        print_site_results(results, headers=["Feature / Property / Type", "Count"])
+        return None
+
+    output_table = _usage_site(single_site_config(config, getattr(args, 'site', None)), args, verbose=args.verbose)
 
     print '\n\nNSX usage summary:'
     print tabulate(output_table, headers=["Feature / Property / Type", "Count"], tablefmt="psql")
@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# coding=utf-8
+#
+# Copyright © 2015-2016 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the X11 (MIT) (the “License”) set forth below;
+#
+# you may not use this file except in compliance with the License. Unless required by applicable law or agreed to in
+# writing, software distributed under the License is distributed on an “AS IS” BASIS, without warranties or conditions
+# of any kind, EITHER EXPRESS OR IMPLIED. See the License for the specific language governing permissions and
+# limitations under the License. Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# "THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.”
+
+__author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
+
+import Queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
+
+DEFAULT_WORKERS = 8
+_WAIT_FOREVER = 365 * 24 * 3600
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+class RateLimiter(object):
+    """
+    Spaces the calls of all threads sharing this limiter to at most rate calls per second
+    """
+    def __init__(self, rate=None):
+        """
+        :param rate: (Optional) Maximum number of calls per second, no limit if None or 0
+        """
+        self.interval = 1.0 / rate if rate else 0
+        self._next_call = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """
+        Blocks until the calling thread is allowed to issue its call
+        """
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.time()
+            call_time = max(now, self._next_call)
+            self._next_call = call_time + self.interval
+        if call_time > now:
+            time.sleep(call_time - now)
+
+
+def get_rate_limiter(key, rate=None):
+    """
+    :param key: The key the limit applies to, e.g. the NSX Manager address
+    :param rate: (Optional) Maximum number of calls per second for this key, no limit if None or 0
+    :return: The RateLimiter shared by all callers using the same key in this process
+    """
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(key)
+        if limiter is None:
+            limiter = _rate_limiters[key] = RateLimiter(rate)
+        elif rate is not None:
+            limiter.interval = 1.0 / rate if rate else 0
+        return limiter
+
+
+class Progress(object):
+    """
+    Progress line of a concurrent task, updated in place on a terminal and every 10% otherwise, so concurrent
+    workers never interleave their output
+    """
+    def __init__(self, label, total, stream=None):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.stream = stream or sys.stdout
+        self._is_tty = hasattr(self.stream, 'isatty') and self.stream.isatty()
+        self._last_decile = 0
+        self._lock = threading.Lock()
+
+    def step(self):
+        with self._lock:
+            self.done += 1
+            decile = self.done * 10 // self.total if self.total else 10
+            if self._is_tty:
+                self.stream.write('\r{} .... {}/{}'.format(self.label, self.done, self.total))
+            elif decile > self._last_decile:
+                self.stream.write('{} .... {}/{}\n'.format(self.label, self.done, self.total))
+            self._last_decile = decile
+            self.stream.flush()
+
+    def finish(self):
+        with self._lock:
+            if self._is_tty:
+                self.stream.write('\r{} .... {}/{} Done\n'.format(self.label, self.done, self.total))
+            else:
+                self.stream.write('{} .... Done\n'.format(self.label))
+            self.stream.flush()
+
+
+class SkippedTask(Exception):
+    """
+    Result error of a run_dag task that was not run because one of its dependencies failed or was skipped
+    """
+    pass
+
+
+class TaskExit(Exception):
+    """
+    Result error of a task that raised SystemExit, e.g. through an NsxClient with the default fail_mode 'exit'
+    receiving an unexpected status. A SystemExit left to a ThreadPool worker kills it and its result never comes
+    """
+    def __init__(self, code):
+        Exception.__init__(self, 'exited with status {}'.format(code))
+        self.code = code
+
+
+def _timed_call(func):
+    start = time.time()
+    try:
+        result = (func(), None)
+    except SystemExit as error:
+        result = (None, TaskExit(error.code))
+    except Exception as error:
+        result = (None, error)
+    return result + (time.time() - start,)
+
+
+def bounded_map(func, items, workers=DEFAULT_WORKERS, rate_limiter=None, progress=None):
+    """
+    Calls func on every item with at most workers concurrent calls
+    :param func: The function to call, with one item as its only argument
+    :param items: The items to process
+    :param workers: (Optional) Maximum number of concurrent calls, items are processed serially if 1 or less
+    :param rate_limiter: (Optional) A RateLimiter every call waits for
+    :param progress: (Optional) A Progress stepped after every call
+    :return: A list of tuples in the order of items, with item 0 containing the return value of func (None on
+             failure), item 1 containing the exception raised by func (None on success, a TaskExit if func raised
+             SystemExit) and item 2 the duration of the call in seconds. A failing call doesn't stop the processing
+             of the other items
+    """
+    def call(item):
+        if rate_limiter:
+            rate_limiter.wait()
+        result = _timed_call(lambda: func(item))
+        if progress:
+            progress.step()
+        return result
+
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        return [call(item) for item in items]
+
+    pool = ThreadPool(min(workers, len(items)))
+    try:
+        # map_async with a timeout keeps the main thread interruptible with ctrl-c
+        return pool.map_async(call, items).get(_WAIT_FOREVER)
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def run_dag(tasks, workers=DEFAULT_WORKERS):
+    """
+    Runs tasks as soon as all the tasks they depend on succeeded, with at most workers concurrent tasks
+    :param tasks: An OrderedDict keyed by task key, with values being tuples with item 0 containing the function to
+                  call without arguments and item 1 containing the list of keys of the tasks it depends on
+    :param workers: (Optional) Maximum number of concurrent tasks
+    :return: An OrderedDict keyed by task key in the order of tasks, with values being tuples with item 0 containing
+             the return value of the task, item 1 the exception it raised and item 2 its duration in seconds. Tasks
+             depending on a failed task, or part of a dependency cycle, are not run and get a SkippedTask error
+    """
+    for key, (func, dependencies) in tasks.items():
+        for dependency in dependencies:
+            if dependency not in tasks:
+                raise ValueError('Task {} depends on the unknown task {}'.format(key, dependency))
+
+    pending = dict((key, set(dependencies)) for key, (func, dependencies) in tasks.items())
+    dependents = dict((key, []) for key in tasks)
+    for key, (func, dependencies) in tasks.items():
+        for dependency in set(dependencies):
+            dependents[dependency].append(key)
+
+    results = {}
+    completed = Queue.Queue()
+    pool = ThreadPool(max(workers, 1))
+
+    def submit(task_key):
+        pool.apply_async(_timed_call, (tasks[task_key][0],), callback=lambda result: completed.put((task_key, result)))
+
+    def skip(task_key, cause):
+        if task_key in results:
+            return
+        results[task_key] = (None, SkippedTask('dependency {} did not succeed'.format(cause)), 0.0)
+        for dependent in dependents[task_key]:
+            skip(dependent, task_key)
+
+    try:
+        running = 0
+        for key in tasks:
+            if not pending[key]:
+                submit(key)
+                running += 1
+        while running:
+            key, result = completed.get(timeout=_WAIT_FOREVER)
+            running -= 1
+            results[key] = result
+            for dependent in dependents[key]:
+                if result[1] is not None:
+                    skip(dependent, key)
+                elif dependent not in results:
+                    pending[dependent].discard(key)
+                    if not pending[dependent]:
+                        submit(dependent)
+                        running += 1
+    finally:
+        pool.terminate()
+        pool.join()
+
+    for key in tasks:
+        if key not in results:
+            results[key] = (None, SkippedTask('dependency cycle'), 0.0)
+    return OrderedDict((key, results[key]) for key in tasks)
+
+
+class TaskTimeout(Exception):
+    """
+    Result error of a fan_out task that did not complete in time
+    """
+    pass
+
+
+def fan_out(tasks, timeout=None):
+    """
+    Runs every task in its own thread, returning once all tasks completed or timeout expired. Tasks still running
+    at the timeout are left running in the background and their results are discarded
+    :param tasks: An OrderedDict keyed by task key, with values being the functions to call without arguments
+    :param timeout: (Optional) Maximum time in seconds to wait for all the tasks, no limit if None
+    :return: An OrderedDict keyed by task key in the order of tasks, with values being tuples with item 0 containing
+             the return value of the task, item 1 the exception it raised and item 2 its duration in seconds
+    """
+    completed = Queue.Queue()
+    start = time.time()
+    for key, func in tasks.items():
+        thread = threading.Thread(target=lambda key=key, func=func: completed.put((key, _timed_call(func))))
+        thread.daemon = True
+        thread.start()
+
+    results = {}
+    deadline = start + timeout if timeout else start + _WAIT_FOREVER
+    while len(results) < len(tasks):
+        try:
+            key, result = completed.get(timeout=max(deadline - time.time(), 0.001))
+        except Queue.Empty:
+            break
+        results[key] = result
+    for key in tasks:
+        if key not in results:
+            results[key] = (None, TaskTimeout('no result after {:.1f}s'.format(time.time() - start)),
+                            time.time() - start)
+    return OrderedDict((key, results[key]) for key in tasks)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# coding=utf-8
+#
+# Copyright © 2015-2016 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the X11 (MIT) (the “License”) set forth below;
+#
+# you may not use this file except in compliance with the License. Unless required by applicable law or agreed to in
+# writing, software distributed under the License is distributed on an “AS IS” BASIS, without warranties or conditions
+# of any kind, EITHER EXPRESS OR IMPLIED. See the License for the specific language governing permissions and
+# limitations under the License. Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# "THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.”
+
+__author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
+
+import ConfigParser
+import functools
+import json
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict
+
+try:
+    from nsxramlclient import xmloperations
+except ImportError:
+    xmloperations = None
+
+
+LOCAL_COMPUTE = 'local compute'
+
+
+class _TimedStream(object):
+    def __init__(self, stream, profiler):
+        self._stream = stream
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def write(self, data):
+        self._profiler.enter('output formatting')
+        try:
+            return self._stream.write(data)
+        finally:
+            self._profiler.exit()
+
+
+class PhaseProfiler(object):
+    """
+    Splits the wall time of a command in phases by timing the functions of every phase. The time is exclusive, a
+    phase called from another phase is not counted twice, and the time of the main thread spent outside of all
+    the phases is counted as local compute. Worker threads only count the time spent in phases, so phases running
+    in concurrent threads can add up to more than the wall time
+    """
+    def __init__(self):
+        self.totals = OrderedDict()
+        self.wall_time = 0.0
+        self._start = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._patches = []
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _add(self, name, duration, calls):
+        with self._lock:
+            totals = self.totals.setdefault(name, [0.0, 0])
+            totals[0] += duration
+            totals[1] += calls
+
+    def enter(self, name):
+        now = time.time()
+        stack = self._stack()
+        if stack:
+            self._add(stack[-1][0], now - stack[-1][1], 0)
+        stack.append([name, now])
+
+    def exit(self):
+        now = time.time()
+        stack = self._stack()
+        name, start = stack.pop()
+        self._add(name, now - start, 1)
+        if stack:
+            stack[-1][1] = now
+
+    def timed(self, func, name):
+        """
+        :return: A function calling func with its time counted in the phase name
+        """
+        @functools.wraps(func)
+        def call(*args, **kwargs):
+            self.enter(name)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.exit()
+        return call
+
+    def patch(self, owner, attribute, name):
+        """
+        Counts the time of a function in the phase name until stop() is called. A module function is also replaced
+        in the modules that imported it by name
+        :param owner: The module or class holding the function
+        :param attribute: The function name
+        :param name: The phase name
+        """
+        original = vars(owner).get(attribute)
+        if original is None:
+            return
+        wrapper = self.timed(original, name)
+        holders = [owner]
+        if isinstance(owner, types.ModuleType):
+            holders.extend(module for module in sys.modules.values()
+                           if module is not None and module is not owner and
+                           getattr(module, attribute, None) is original)
+        for holder in holders:
+            setattr(holder, attribute, wrapper)
+            self._patches.append((holder, attribute, original))
+
+    def start(self):
+        """
+        Starts timing the phases of the calling thread and of the known phase functions
+        """
+        import httppool
+        import libutils
+        self.patch(ConfigParser.RawConfigParser, 'read', 'config load')
+        self.patch(libutils, 'load_nsx_client', 'NsxClient init')
+        self.patch(libutils, '_vc_service_instance', 'vCenter connect')
+        self.patch(libutils, 'retrieve_properties', 'vCenter API')
+        self.patch(httppool.PooledSession, 'request', 'NSX API')
+        if xmloperations:
+            # nsxramlclient converts the response XML once the request returned, and the request body before
+            self.patch(xmloperations, 'xml_to_dict', 'XML/JSON conversion')
+            self.patch(xmloperations, 'dict_to_xml', 'XML/JSON conversion')
+        self.patch(json, 'loads', 'XML/JSON conversion')
+        self.patch(json, 'dumps', 'XML/JSON conversion')
+        tabulate_module = sys.modules.get('tabulate')
+        if tabulate_module:
+            self.patch(tabulate_module, 'tabulate', 'output formatting')
+        self._patches.append((sys, 'stdout', sys.stdout))
+        sys.stdout = _TimedStream(sys.stdout, self)
+        self._start = time.time()
+        self.enter(LOCAL_COMPUTE)
+
+    def stop(self):
+        """
+        Stops timing and restores the patched functions
+        """
+        self.exit()
+        self.wall_time = time.time() - self._start
+        for holder, attribute, original in reversed(self._patches):
+            setattr(holder, attribute, original)
+        self._patches = []
+
+    def summary(self):
+        """
+        :return: A list of tuples, one per phase by decreasing time, with the phase name, its time in seconds, the
+                 number of timed calls and its share of the wall time in percent
+        """
+        rows = [(name, duration, calls, duration / self.wall_time * 100 if self.wall_time else 0.0)
+                for name, (duration, calls) in self.totals.items()]
+        return sorted(rows, key=lambda row: row[1], reverse=True)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# coding=utf-8
+#
+# Copyright © 2015-2016 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the X11 (MIT) (the “License”) set forth below;
+#
+# you may not use this file except in compliance with the License. Unless required by applicable law or agreed to in
+# writing, software distributed under the License is distributed on an “AS IS” BASIS, without warranties or conditions
+# of any kind, EITHER EXPRESS OR IMPLIED. See the License for the specific language governing permissions and
+# limitations under the License. Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# "THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.”
+
+__author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
+
+import atexit
+import copy
+import cPickle
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+import pyraml.parser
+from nsxramlclient.client import NsxClient
+from inventory import DEFAULT_CACHE_DIR
+
+
+CACHE_VERSION = 1
+
+_loader_lock = threading.Lock()
+_template_stores = weakref.WeakKeyDictionary()
+
+_LITERAL_TYPES = (type(None), bool, int, long, float, str, unicode)
+
+
+class RamlSpecCache(object):
+    """
+    Versioned binary cache of a parsed RAML spec and of the body templates extracted from it. The cache file name
+    is derived from the RAML file content hash and mtime, so an updated RAML file never hits a stale entry
+    """
+    def __init__(self, raml_file=None, cache_dir=DEFAULT_CACHE_DIR):
+        """
+        :param raml_file: (Optional) The RAML spec file, the cache is only held in memory if not specified
+        :param cache_dir: (Optional) The directory holding the spec cache files
+        """
+        self.cache_dir = cache_dir
+        self.path = None
+        self.spec = None
+        self.templates = {}
+        self.constructors = {}
+        self.dirty = False
+        self._save_at_exit = False
+        self._lock = threading.Lock()
+        if raml_file:
+            with open(raml_file, 'rb') as raml:
+                raml_hash = hashlib.sha1(raml.read()).hexdigest()
+            key = '{}-{}-py{}{}'.format(raml_hash, int(os.path.getmtime(raml_file)), *sys.version_info[:2])
+            self.path = os.path.join(cache_dir, 'raml-v{}-{}.pickle'.format(CACHE_VERSION, key))
+            self._read()
+
+    def _read(self):
+        try:
+            with open(self.path, 'rb') as cache_file:
+                version, spec, templates = cPickle.load(cache_file)
+        except (IOError, EOFError, ValueError, TypeError, AttributeError, ImportError, cPickle.UnpicklingError):
+            return
+        if version == CACHE_VERSION:
+            self.spec = spec
+            self.templates = templates
+
+    def mark_dirty(self):
+        """
+        Records that templates were added since the cache file was written, the file is then written once at exit
+        """
+        with self._lock:
+            self.dirty = True
+            if not self._save_at_exit:
+                self._save_at_exit = True
+                atexit.register(self.save)
+
+    def save(self):
+        """
+        Atomically writes the parsed spec and the known templates to the cache file if they changed, failures are
+        ignored as the cache is only an optimization
+        """
+        if self.spec is None or self.path is None:
+            return
+        with self._lock:
+            if not self.dirty:
+                return
+            self.dirty = False
+            try:
+                if not os.path.isdir(self.cache_dir):
+                    os.makedirs(self.cache_dir, 0o700)
+                fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+                with os.fdopen(fd, 'wb') as cache_file:
+                    cPickle.dump((CACHE_VERSION, self.spec, self.templates), cache_file, cPickle.HIGHEST_PROTOCOL)
+                os.rename(tmp_path, self.path)
+            except (IOError, OSError, TypeError, cPickle.PicklingError):
+                pass
+
+
+@contextmanager
+def _raml_loader(loader):
+    original_load = pyraml.parser.load
+    pyraml.parser.load = loader
+    try:
+        yield original_load
+    finally:
+        pyraml.parser.load = original_load
+
+
+def load_nsx_client(raml_file, nsx_manager, nsx_username, nsx_password, debug=False, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    This function creates an NsxClient Session, parsing the RAML spec only if it is not found in the spec cache
+    :param raml_file: The NSX RAML spec file
+    :param nsx_manager: The NSX Manager IP or hostname
+    :param nsx_username: The NSX Manager username
+    :param nsx_password: The NSX Manager password
+    :param debug: (Optional) print low level debug of http transactions
+    :param cache_dir: (Optional) The directory holding the spec cache files
+    :return: An instance of an NsxClient Session
+    """
+    spec_cache = RamlSpecCache(raml_file, cache_dir=cache_dir)
+
+    def cached_load(raml_path):
+        if spec_cache.spec is None:
+            spec_cache.spec = original_load(raml_path)
+            spec_cache.dirty = True
+        return spec_cache.spec
+
+    with _loader_lock:
+        with _raml_loader(cached_load) as original_load:
+            client_session = NsxClient(raml_file, nsx_manager, nsx_username, nsx_password, debug=debug)
+    if spec_cache.dirty:
+        spec_cache.save()
+    _template_stores[client_session] = spec_cache
+    return client_session
+
+
+def _constructor_source(value):
+    value_type = type(value)
+    if value_type in _LITERAL_TYPES:
+        return repr(value)
+    if value_type is OrderedDict:
+        return 'OrderedDict([{}])'.format(', '.join('({!r}, {})'.format(key, _constructor_source(item))
+                                                    for key, item in value.items()))
+    if value_type is dict:
+        return '{{{}}}'.format(', '.join('{!r}: {}'.format(key, _constructor_source(item))
+                                         for key, item in value.items()))
+    if value_type is list:
+        return '[{}]'.format(', '.join(_constructor_source(item) for item in value))
+    raise TypeError('no constructor for {}'.format(value_type))
+
+
+def compile_constructor(template):
+    """
+    This function compiles a function building fresh copies of a body template, which is several times faster than
+    copy.deepcopy as the structure is not walked again on every copy
+    :param template: A body template made of dicts, OrderedDicts, lists and literals, as returned by
+                     extract_resource_body_example
+    :return: A function without arguments returning a new copy of the template on every call. A function returning
+             a deepcopy if the template holds other types
+    """
+    try:
+        source = _constructor_source(template)
+    except TypeError:
+        return lambda: copy.deepcopy(template)
+    return eval(compile('lambda: ' + source, '<body template>', 'eval'), {'OrderedDict': OrderedDict})
+
+
+def body_template(client_session, resource, method):
+    """
+    This function returns the body example of a resource method as extract_resource_body_example does, but
+    extracts it only once per RAML spec and copies it with a compiled constructor
+    :param client_session: An instance of an NsxClient Session
+    :param resource: The RAML resource name, e.g. 'nsxEdges'
+    :param method: The resource method, e.g. 'create'
+    :return: A fresh dictionary that the caller is free to modify
+    """
+    spec_cache = _template_stores.get(client_session)
+    if spec_cache is None:
+        spec_cache = _template_stores.setdefault(client_session, RamlSpecCache())
+    constructor = spec_cache.constructors.get((resource, method))
+    if constructor is None:
+        template = spec_cache.templates.get((resource, method))
+        if template is None:
+            template = client_session.extract_resource_body_example(resource, method)
+            spec_cache.templates[(resource, method)] = template
+            spec_cache.mark_dirty()
+        constructor = spec_cache.constructors[(resource, method)] = compile_constructor(template)
+    return constructor()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# coding=utf-8
+#
+# Copyright © 2015-2016 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the X11 (MIT) (the “License”) set forth below;
+#
+# you may not use this file except in compliance with the License. Unless required by applicable law or agreed to in
+# writing, software distributed under the License is distributed on an “AS IS” BASIS, without warranties or conditions
+# of any kind, EITHER EXPRESS OR IMPLIED. See the License for the specific language governing permissions and
+# limitations under the License. Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# "THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.”
+
+__author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
+
+import json
+import os
+import socket
+import SocketServer
+import sys
+import threading
+import traceback
+from inventory import DEFAULT_CACHE_DIR
+
+
+DEFAULT_SOCKET = os.path.join(DEFAULT_CACHE_DIR, 'pynsxv.sock')
+
+
+class _ClientStream(object):
+    """
+    File like object forwarding the output of a command to the client, as one json message per write
+    """
+    def __init__(self, wfile, name):
+        self._wfile = wfile
+        self._name = name
+        self._lock = threading.Lock()
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.decode('utf-8', 'replace')
+        with self._lock:
+            self._wfile.write(json.dumps({'stream': self._name, 'data': data}) + '\n')
+
+    def flush(self):
+        with self._lock:
+            self._wfile.flush()
+
+    def isatty(self):
+        return False
+
+
+def _run_command(run_command, argv):
+    try:
+        run_command(argv)
+    except SystemExit as exit_request:
+        if exit_request.code is None or isinstance(exit_request.code, int):
+            return exit_request.code or 0
+        print >> sys.stderr, exit_request.code
+        return 1
+    except Exception:
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+class _CommandHandler(SocketServer.StreamRequestHandler):
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        # commands run one at a time as they share the process working directory and standard streams
+        with self.server.command_lock:
+            saved_streams = sys.stdout, sys.stderr
+            saved_cwd = os.getcwd()
+            sys.stdout = _ClientStream(self.wfile, 'out')
+            sys.stderr = _ClientStream(self.wfile, 'err')
+            try:
+                os.chdir(request['cwd'])
+            except OSError as error:
+                # e.g. the directory of the client was removed or is not accessible to the server
+                print >> sys.stderr, 'pynsxv server could not run the command in {}: {}'.format(request['cwd'],
+                                                                                                error.strerror)
+                exit_code = 1
+            else:
+                exit_code = _run_command(self._run_command, request['argv'])
+            finally:
+                sys.stdout, sys.stderr = saved_streams
+                os.chdir(saved_cwd)
+        self.wfile.write(json.dumps({'exit': exit_code}) + '\n')
+
+    def _run_command(self, argv):
+        if self.server.before_command:
+            self.server.before_command()
+        self.server.run_command(argv)
+
+
+class CommandServer(SocketServer.UnixStreamServer):
+    """
+    Unix domain socket server running pynsxv command lines in a long lived process, so that the NSX and vCenter
+    sessions, the parsed RAML spec and the inventory indexes are reused from one command to the next
+    """
+    def __init__(self, socket_path, run_command, before_command=None):
+        """
+        :param socket_path: The path of the unix domain socket to listen on
+        :param run_command: A callable running a command, taking the list of command line arguments
+        :param before_command: (Optional) A callable without arguments run before every command
+        """
+        self.run_command = run_command
+        self.before_command = before_command
+        self.command_lock = threading.Lock()
+        socket_dir = os.path.dirname(socket_path)
+        if socket_dir and not os.path.isdir(socket_dir):
+            os.makedirs(socket_dir, 0o700)
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        # only the user running the server can connect to the socket
+        saved_umask = os.umask(0o077)
+        try:
+            SocketServer.UnixStreamServer.__init__(self, socket_path, _CommandHandler)
+        finally:
+            os.umask(saved_umask)
+
+    def server_close(self):
+        SocketServer.UnixStreamServer.server_close(self)
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def forward_command(socket_path, argv):
+    """
+    This function runs a command line in a pynsxv server, printing its output as it comes
+    :param socket_path: The path of the unix domain socket of the server
+    :param argv: The list of command line arguments
+    :return: The exit code of the command, or None if the server could not be reached
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except socket.error:
+        client.close()
+        return None
+    try:
+        client.sendall(json.dumps({'argv': argv, 'cwd': os.getcwd()}) + '\n')
+        for line in client.makefile('rb'):
+            message = json.loads(line)
+            if 'exit' in message:
+                return message['exit']
+            stream = sys.stdout if message['stream'] == 'out' else sys.stderr
+            stream.write(message['data'].encode('utf-8'))
+            stream.flush()
+    finally:
+        client.close()
+    return 1
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# coding=utf-8
+#
+# Copyright © 2015-2016 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the X11 (MIT) (the “License”) set forth below;
+#
+# you may not use this file except in compliance with the License. Unless required by applicable law or agreed to in
+# writing, software distributed under the License is distributed on an “AS IS” BASIS, without warranties or conditions
+# of any kind, EITHER EXPRESS OR IMPLIED. See the License for the specific language governing permissions and
+# limitations under the License. Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# "THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.”
+
+__author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
+
+from collections import OrderedDict
+
+
+class FakeNsxSession(object):
+    """
+    In-memory stand-in for an NsxClient Session. Collections are served in pages of page_size objects honoring the
+    startindex query parameter, other resources are answered with the bodies of the bodies dictionary, keyed by
+    resource and then by the sorted tuple of the uri parameter items. Every call is recorded in calls
+    """
+    def __init__(self, collections=None, bodies=None, page_size=2):
+        self.collections = collections or {}
+        self.bodies = bodies or {}
+        self.page_size = page_size
+        self.calls = []
+
+    def _record(self, method, resource, uri_parameters, query_parameters_dict, request_body_dict=None):
+        self.calls.append((method, resource, dict(uri_parameters or {}), dict(query_parameters_dict or {}),
+                           request_body_dict))
+
+    def reads(self, resource):
+        """
+        :return: The list of the query parameters of the reads of a resource
+        """
+        return [query for method, called, uri, query, body in self.calls if method == 'read' and called == resource]
+
+    def read(self, resource, uri_parameters=None, query_parameters_dict=None):
+        self._record('read', resource, uri_parameters, query_parameters_dict)
+        if resource in self.collections:
+            start_index = int((query_parameters_dict or {}).get('startindex', 0))
+            objects = self.collections[resource]
+            page = OrderedDict([('pagingInfo', {'pageSize': str(self.page_size), 'startIndex': str(start_index),
+                                                'totalCount': str(len(objects))}),
+                                ('object', [dict(obj) for obj in objects[start_index:start_index + self.page_size]])])
+            return {'status': 200, 'body': {'pagedList': {'dataPage': page}}}
+        key = tuple(sorted((uri_parameters or {}).items()))
+        if key not in self.bodies.get(resource, {}):
+            raise SystemExit('receive bad status code 404')
+        return {'status': 200, 'body': self.bodies[resource][key]}
+
+    def update(self, resource, uri_parameters=None, query_parameters_dict=None, request_body_dict=None):
+        self._record('update', resource, uri_parameters, query_parameters_dict, request_body_dict)
+        return {'status': 204, 'body': None}
+
+    def delete(self, resource, uri_parameters=None, query_parameters_dict=None):
+        self._record('delete', resource, uri_parameters, query_parameters_dict)
+        return {'status': 200, 'body': None}
+
+    @staticmethod
+    def normalize_list_return(input_object):
+        if not input_object:
+            return []
+        if isinstance(input_object, dict):
+            return [input_object]
+        return input_object
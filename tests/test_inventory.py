@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# coding=utf-8
+#
+# Copyright © 2015-2016 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the X11 (MIT) (the “License”) set forth below;
+#
+# you may not use this file except in compliance with the License. Unless required by applicable law or agreed to in
+# writing, software distributed under the License is distributed on an “AS IS” BASIS, without warranties or conditions
+# of any kind, EITHER EXPRESS OR IMPLIED. See the License for the specific language governing permissions and
+# limitations under the License. Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# "THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.”
+
+__author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pynsxv', 'library'))
+
+from inventory import InventoryResolver, DiskInventoryCache, get_resolver, invalidate_inventory, enable_disk_cache
+from fake_nsx import FakeNsxSession
+
+
+def _edges(*names):
+    return [{'objectId': 'edge-{}'.format(index), 'name': name, 'edgeType': 'gatewayServices'}
+            for index, name in enumerate(names, 1)]
+
+
+class CountingLoader(object):
+    def __init__(self, objects):
+        self.objects = objects
+        self.loads = []
+
+    def __call__(self, resource, fresh=False):
+        self.loads.append((resource, fresh))
+        return [dict(obj) for obj in self.objects]
+
+
+class TestInventoryResolver(unittest.TestCase):
+    def test_index_is_reused_until_ttl(self):
+        loader = CountingLoader(_edges('esg1'))
+        resolver = InventoryResolver(loader, ttl=60)
+        self.assertEqual(resolver.lookup('nsxEdges', 'esg1')[0], 'edge-1')
+        self.assertEqual(resolver.lookup('nsxEdges', 'esg1')[0], 'edge-1')
+        self.assertEqual(len(loader.loads), 1)
+        resolver.index('nsxEdges').created -= 120
+        self.assertEqual(resolver.lookup('nsxEdges', 'esg1')[0], 'edge-1')
+        self.assertEqual(len(loader.loads), 2)
+
+    def test_miss_rebuilds_index_once(self):
+        loader = CountingLoader(_edges('esg1'))
+        resolver = InventoryResolver(loader)
+        resolver.lookup('nsxEdges', 'esg1')
+        loader.objects = _edges('esg1', 'esg2')
+        self.assertEqual(resolver.lookup('nsxEdges', 'esg2')[0], 'edge-2')
+        self.assertEqual(loader.loads, [('nsxEdges', False), ('nsxEdges', True)])
+        self.assertEqual(resolver.lookup('nsxEdges', 'missing'), (None, None))
+        self.assertEqual(len(loader.loads), 3)
+
+    def test_miss_in_new_index_is_not_rebuilt(self):
+        loader = CountingLoader(_edges('esg1'))
+        resolver = InventoryResolver(loader)
+        self.assertEqual(resolver.lookup('nsxEdges', 'missing'), (None, None))
+        self.assertEqual(len(loader.loads), 1)
+
+    def test_lookup_returns_copies(self):
+        resolver = InventoryResolver(CountingLoader(_edges('esg1')))
+        edge_id, edge = resolver.lookup('nsxEdges', 'esg1')
+        edge['name'] = 'changed'
+        self.assertEqual(resolver.lookup('nsxEdges', 'esg1')[1]['name'], 'esg1')
+        resolver.get('nsxEdges', edge_id)['name'] = 'changed'
+        self.assertEqual(resolver.get('nsxEdges', edge_id)['name'], 'esg1')
+
+    def test_invalidate_drops_index(self):
+        loader = CountingLoader(_edges('esg1'))
+        resolver = InventoryResolver(loader)
+        resolver.index('nsxEdges')
+        resolver.invalidate('nsxEdges')
+        resolver.index('nsxEdges')
+        self.assertEqual(len(loader.loads), 2)
+
+    def test_least_recently_used_index_is_evicted(self):
+        loader = CountingLoader(_edges('esg1'))
+        resolver = InventoryResolver(loader, max_indexes=1)
+        resolver.index('nsxEdges')
+        resolver.index('logicalSwitchesGlobal')
+        resolver.index('nsxEdges')
+        self.assertEqual([resource for resource, fresh in loader.loads],
+                         ['nsxEdges', 'logicalSwitchesGlobal', 'nsxEdges'])
+
+
+class TestSessionResolver(unittest.TestCase):
+    def test_lookup_reads_all_pages_with_startindex(self):
+        session = FakeNsxSession({'nsxEdges': _edges('esg1', 'esg2', 'esg3', 'esg4', 'esg5')})
+        get_resolver(session).index('nsxEdges')
+        self.assertEqual([query['startindex'] for query in session.reads('nsxEdges')], [0, 2, 4])
+        self.assertEqual(get_resolver(session).lookup('nsxEdges', 'esg5')[0], 'edge-5')
+
+    def test_scan_stops_at_the_name(self):
+        session = FakeNsxSession({'nsxEdges': _edges('esg1', 'esg2', 'esg3', 'esg4', 'esg5')})
+        self.assertEqual(get_resolver(session).lookup('nsxEdges', 'esg2')[0], 'edge-2')
+        self.assertEqual(len(session.reads('nsxEdges')), 1)
+
+    def test_invalidate_inventory_rereads(self):
+        session = FakeNsxSession({'nsxEdges': _edges('esg1')})
+        get_resolver(session).index('nsxEdges')
+        invalidate_inventory(session, 'nsxEdges')
+        get_resolver(session).index('nsxEdges')
+        self.assertEqual(len(session.reads('nsxEdges')), 2)
+
+
+class TestDiskInventoryCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def load(self, session, refresh=False):
+        store = DiskInventoryCache('nsxmgr', cache_dir=self.cache_dir, refresh=refresh)
+        return store, store.load(session, 'nsxEdges')
+
+    def test_unchanged_first_page_is_served_from_cache(self):
+        edges = _edges('esg1', 'esg2', 'esg3')
+        self.load(FakeNsxSession({'nsxEdges': edges}))
+        session = FakeNsxSession({'nsxEdges': edges})
+        store, objects = self.load(session)
+        self.assertEqual(objects, edges)
+        self.assertTrue(store.from_cache('nsxEdges'))
+        self.assertEqual(session.reads('nsxEdges'), [{'startindex': 0}])
+
+    def test_changed_first_page_reloads_without_reading_it_twice(self):
+        self.load(FakeNsxSession({'nsxEdges': _edges('esg1', 'esg2', 'esg3')}))
+        session = FakeNsxSession({'nsxEdges': _edges('renamed', 'esg2', 'esg3')})
+        store, objects = self.load(session)
+        self.assertEqual([edge['name'] for edge in objects], ['renamed', 'esg2', 'esg3'])
+        self.assertFalse(store.from_cache('nsxEdges'))
+        self.assertEqual([query['startindex'] for query in session.reads('nsxEdges')], [0, 2])
+
+    def test_changed_total_count_reloads(self):
+        self.load(FakeNsxSession({'nsxEdges': _edges('esg1', 'esg2', 'esg3')}))
+        store, objects = self.load(FakeNsxSession({'nsxEdges': _edges('esg1', 'esg2', 'esg3', 'esg4')}))
+        self.assertEqual(len(objects), 4)
+        self.assertFalse(store.from_cache('nsxEdges'))
+
+    def test_refresh_ignores_cache(self):
+        edges = _edges('esg1', 'esg2', 'esg3')
+        self.load(FakeNsxSession({'nsxEdges': edges}))
+        store, objects = self.load(FakeNsxSession({'nsxEdges': edges}), refresh=True)
+        self.assertFalse(store.from_cache('nsxEdges'))
+
+    def test_names_from_cache_are_verified(self):
+        # a rename on a later page keeps the first page signature
+        self.load(FakeNsxSession({'nsxEdges': _edges('esg1', 'esg2', 'esg3')}))
+        edges = _edges('esg1', 'esg2', 'esg4')
+        session = FakeNsxSession({'nsxEdges': edges},
+                                 {'nsxEdge': dict(((('edgeId', edge['objectId']),), {'edge': edge}) for edge in edges)})
+        enable_disk_cache(session, 'nsxmgr', cache_dir=self.cache_dir)
+        self.assertEqual(get_resolver(session).lookup('nsxEdges', 'esg3'), (None, None))
+        self.assertEqual(get_resolver(session).lookup('nsxEdges', 'esg4')[0], 'edge-3')
+        self.assertEqual(get_resolver(session).lookup('nsxEdges', 'esg1')[0], 'edge-1')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# coding=utf-8
+#
+# Copyright © 2015-2016 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the X11 (MIT) (the “License”) set forth below;
+#
+# you may not use this file except in compliance with the License. Unless required by applicable law or agreed to in
+# writing, software distributed under the License is distributed on an “AS IS” BASIS, without warranties or conditions
+# of any kind, EITHER EXPRESS OR IMPLIED. See the License for the specific language governing permissions and
+# limitations under the License. Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# "THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.”
+
+__author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
+
+import ConfigParser
+import os
+import sys
+import time
+import unittest
+from StringIO import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pynsxv', 'library'))
+
+from multisite import get_sites, site_config, get_site_configs, single_site_config, run_on_sites
+from parallel import TaskTimeout
+
+NSX_INI = """
+[nsxv]
+nsx_manager = nsx-default
+nsx_username = admin
+
+[vcenter]
+vcenter = vc-default
+
+[nsxv:west]
+nsx_manager = nsx-west
+
+[defaults]
+datacenter_name = dc-default
+
+[nsxv:east]
+nsx_manager = nsx-east
+
+[defaults:east]
+datacenter_name = dc-east
+"""
+
+
+def _config():
+    config = ConfigParser.ConfigParser()
+    config.readfp(StringIO(NSX_INI))
+    return config
+
+
+class TestSites(unittest.TestCase):
+    def test_default_site_first_then_file_order(self):
+        self.assertEqual(get_sites(_config()), ['default', 'west', 'east'])
+
+    def test_site_options_override_the_sections_without_site(self):
+        config = site_config(_config(), 'east')
+        self.assertEqual(config.get('nsxv', 'nsx_manager'), 'nsx-east')
+        self.assertEqual(config.get('nsxv', 'nsx_username'), 'admin')
+        self.assertEqual(config.get('vcenter', 'vcenter'), 'vc-default')
+        self.assertEqual(config.get('defaults', 'datacenter_name'), 'dc-east')
+        self.assertEqual(site_config(_config(), 'default').get('nsxv', 'nsx_manager'), 'nsx-default')
+        self.assertEqual(site_config(_config(), 'west').get('defaults', 'datacenter_name'), 'dc-default')
+
+    def test_site_selection_keeps_the_selected_order(self):
+        self.assertEqual(list(get_site_configs(_config())), ['default', 'west', 'east'])
+        self.assertEqual(list(get_site_configs(_config(), 'east, default')), ['east', 'default'])
+        self.assertRaises(AssertionError, get_site_configs, _config(), 'north')
+
+    def test_single_site(self):
+        self.assertEqual(single_site_config(_config()).get('nsxv', 'nsx_manager'), 'nsx-default')
+        self.assertEqual(single_site_config(_config(), 'west').get('nsxv', 'nsx_manager'), 'nsx-west')
+        self.assertRaises(AssertionError, single_site_config, _config(), 'west,east')
+
+
+class TestRunOnSites(unittest.TestCase):
+    delays = {'nsx-default': 0.2, 'nsx-west': 0.1, 'nsx-east': 0}
+
+    def _rows(self, config):
+        manager = config.get('nsxv', 'nsx_manager')
+        time.sleep(self.delays[manager])
+        if manager == 'nsx-west':
+            raise RuntimeError('{} unreachable'.format(manager))
+        return [(manager,)]
+
+    def test_results_keep_the_site_order(self):
+        results = run_on_sites(get_site_configs(_config()), self._rows)
+        self.assertEqual(list(results), ['default', 'west', 'east'])
+        self.assertEqual(results['default'][:2], ([('nsx-default',)], None))
+        self.assertEqual(results['east'][:2], ([('nsx-east',)], None))
+        self.assertIsNone(results['west'][0])
+        self.assertEqual(str(results['west'][1]), 'nsx-west unreachable')
+
+    def test_slow_site_times_out(self):
+        self.delays = {'nsx-default': 2, 'nsx-west': 0, 'nsx-east': 0}
+        start = time.time()
+        results = run_on_sites(get_site_configs(_config()), self._rows, timeout=0.3)
+        self.assertLess(time.time() - start, 1.5)
+        self.assertEqual(list(results), ['default', 'west', 'east'])
+        self.assertIsInstance(results['default'][1], TaskTimeout)
+        self.assertEqual(results['east'][:2], ([('nsx-east',)], None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# coding=utf-8
+#
+# Copyright © 2015-2016 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the X11 (MIT) (the “License”) set forth below;
+#
+# you may not use this file except in compliance with the License. Unless required by applicable law or agreed to in
+# writing, software distributed under the License is distributed on an “AS IS” BASIS, without warranties or conditions
+# of any kind, EITHER EXPRESS OR IMPLIED. See the License for the specific language governing permissions and
+# limitations under the License. Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# "THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.”
+
+__author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pynsxv', 'library'))
+
+from nsx_apply import topology_tasks
+
+TOPOLOGY = {
+    'logical_switches': [{'name': 'transit'}, {'name': 'web'}, {'name': 'app'}],
+    'dlrs': [{'name': 'dlr1', 'ha_ls': 'transit', 'uplink_ls': 'transit',
+              'interfaces': [{'ls': 'web'}, {'ls': 'app'}, {'ls': 'existing'}]}],
+    'esgs': [{'name': 'esg1', 'portgroup': 'VM Network',
+              'interfaces': [{'index': 1, 'ls': 'transit'}, {'index': 2, 'portgroup': 'VM Network'}],
+              'default_gateway': '10.0.0.1', 'default_gateway_vnic': 0,
+              'firewall_default': 'accept'},
+             {'name': 'esg2', 'portgroup': 'transit', 'firewall_default': 'deny'}],
+}
+
+
+def _dependencies(topology):
+    return [(key, dependencies) for key, (func, dependencies) in topology_tasks(None, None, {}, topology).items()]
+
+
+class TestTopologyTasks(unittest.TestCase):
+    def test_tasks_and_dependencies(self):
+        self.assertEqual(_dependencies(TOPOLOGY), [
+            (('lswitch', 'transit'), []),
+            (('lswitch', 'web'), []),
+            (('lswitch', 'app'), []),
+            (('dlr', 'dlr1'), [('lswitch', 'transit'), ('lswitch', 'transit')]),
+            (('dlr_interface', 'dlr1/web'), [('dlr', 'dlr1'), ('lswitch', 'web')]),
+            (('dlr_interface', 'dlr1/app'), [('dlr_interface', 'dlr1/web'), ('lswitch', 'app')]),
+            (('dlr_interface', 'dlr1/existing'), [('dlr_interface', 'dlr1/app')]),
+            (('esg', 'esg1'), []),
+            (('esg_interface', 'esg1/vnic1'), [('esg', 'esg1'), ('lswitch', 'transit')]),
+            (('esg_interface', 'esg1/vnic2'), [('esg_interface', 'esg1/vnic1')]),
+            (('esg_routing', 'esg1'), [('esg_interface', 'esg1/vnic2')]),
+            (('esg_firewall', 'esg1'), [('esg_routing', 'esg1')]),
+            (('esg', 'esg2'), [('lswitch', 'transit')]),
+            (('esg_firewall', 'esg2'), [('esg', 'esg2')]),
+        ])
+
+    def test_empty_sections(self):
+        self.assertEqual(_dependencies({'logical_switches': None, 'esgs': [{'name': 'esg1', 'portgroup': 'pg'}]}),
+                         [(('esg', 'esg1'), [])])
+        self.assertEqual(_dependencies({}), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# coding=utf-8
+#
+# Copyright © 2015-2016 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the X11 (MIT) (the “License”) set forth below;
+#
+# you may not use this file except in compliance with the License. Unless required by applicable law or agreed to in
+# writing, software distributed under the License is distributed on an “AS IS” BASIS, without warranties or conditions
+# of any kind, EITHER EXPRESS OR IMPLIED. See the License for the specific language governing permissions and
+# limitations under the License. Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# "THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.”
+
+__author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
+
+import copy
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pynsxv', 'library'))
+
+from nsx_esg import esg_batch_routes
+from fake_nsx import FakeNsxSession
+
+NSX_ROUTE = {'network': '10.0.0.0/24', 'nextHop': '192.168.0.1', 'vnic': '0', 'mtu': '1500', 'adminDistance': '1',
+             'type': 'user'}
+
+
+def _session(routes):
+    static_routes = {'route': copy.deepcopy(routes)} if routes else None
+    routing = {'staticRouting': {'staticRoutes': static_routes, 'defaultRoute': None}}
+    return FakeNsxSession({'nsxEdges': [{'objectId': 'edge-1', 'name': 'esg1', 'edgeType': 'gatewayServices'}]},
+                          {'routingConfigStatic': {(('edgeId', 'edge-1'),): routing}})
+
+
+def _updates(session):
+    return [body for method, resource, uri, query, body in session.calls if method == 'update']
+
+
+class TestBatchRoutes(unittest.TestCase):
+    def test_existing_route_is_not_updated(self):
+        session = _session(NSX_ROUTE)
+        self.assertEqual(esg_batch_routes(session, 'esg1', add_routes=[{'network': '10.0.0.0/24',
+                                                                        'next_hop': '192.168.0.1', 'vnic': 0}]),
+                         (True, (0, 0)))
+        self.assertEqual(_updates(session), [])
+
+    def test_duplicates_in_one_batch_count_once(self):
+        session = _session(None)
+        route = {'network': '10.1.0.0/24', 'next_hop': '192.168.0.1'}
+        self.assertEqual(esg_batch_routes(session, 'esg1', add_routes=[route, dict(route)]), (True, (1, 0)))
+        self.assertEqual(len(_updates(session)[0]['staticRouting']['staticRoutes']['route']), 1)
+
+    def test_changed_route_is_merged(self):
+        session = _session([NSX_ROUTE])
+        self.assertEqual(esg_batch_routes(session, 'esg1', add_routes=[{'network': '10.0.0.0/24',
+                                                                        'next_hop': '192.168.0.1', 'vnic': 0,
+                                                                        'mtu': 9000}]),
+                         (True, (1, 0)))
+        route, = _updates(session)[0]['staticRouting']['staticRoutes']['route']
+        self.assertEqual(route['mtu'], 9000)
+        self.assertEqual(route['type'], 'user')
+        self.assertEqual(route['adminDistance'], '1')
+
+    def test_unset_field_is_removed(self):
+        session = _session([dict(NSX_ROUTE, description='old')])
+        esg_batch_routes(session, 'esg1', add_routes=[{'network': '10.0.0.0/24', 'next_hop': '192.168.0.1',
+                                                       'vnic': 0}])
+        route, = _updates(session)[0]['staticRouting']['staticRoutes']['route']
+        self.assertNotIn('description', route)
+
+    def test_deleting_the_last_route_clears_static_routes(self):
+        session = _session([NSX_ROUTE])
+        self.assertEqual(esg_batch_routes(session, 'esg1', del_routes=[{'network': '10.0.0.0/24',
+                                                                        'next_hop': '192.168.0.1'}]),
+                         (True, (0, 1)))
+        self.assertIsNone(_updates(session)[0]['staticRouting']['staticRoutes'])
+
+    def test_deleting_unknown_route_does_not_update(self):
+        session = _session([NSX_ROUTE])
+        self.assertEqual(esg_batch_routes(session, 'esg1', del_routes=[{'network': '10.9.0.0/24',
+                                                                        'next_hop': '192.168.0.1'}]),
+                         (True, (0, 0)))
+        self.assertEqual(_updates(session), [])
+
+    def test_unknown_esg(self):
+        self.assertEqual(esg_batch_routes(_session(None), 'esg2', add_routes=[]), (False, (0, 0)))
+
+
+if __name__ == '__main__':
+    unittest.main()
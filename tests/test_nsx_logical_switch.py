@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# coding=utf-8
+#
+# Copyright © 2015-2016 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the X11 (MIT) (the “License”) set forth below;
+#
+# you may not use this file except in compliance with the License. Unless required by applicable law or agreed to in
+# writing, software distributed under the License is distributed on an “AS IS” BASIS, without warranties or conditions
+# of any kind, EITHER EXPRESS OR IMPLIED. See the License for the specific language governing permissions and
+# limitations under the License. Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# "THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.”
+
+__author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pynsxv', 'library'))
+
+from nsx_logical_switch import logical_switch_bulk_delete
+from fake_nsx import FakeNsxSession
+
+
+class FailingDeleteSession(FakeNsxSession):
+    def delete(self, resource, uri_parameters=None, query_parameters_dict=None):
+        FakeNsxSession.delete(self, resource, uri_parameters, query_parameters_dict)
+        if uri_parameters['virtualWireID'] == 'virtualwire-2':
+            # as an NsxClient with the default fail_mode 'exit' does on an error status
+            raise SystemExit('receive bad status code 400')
+        return {'status': 200, 'body': None}
+
+
+def _session(session_class=FakeNsxSession):
+    return session_class({'logicalSwitchesGlobal': [{'objectId': 'virtualwire-{}'.format(index),
+                                                     'name': 'ls{}'.format(index)} for index in range(1, 4)]})
+
+
+def _deleted(session):
+    return sorted(uri['virtualWireID'] for method, resource, uri, query, body in session.calls if method == 'delete')
+
+
+class TestBulkDelete(unittest.TestCase):
+    def test_unknown_names_are_reported_per_item(self):
+        session = _session()
+        results = logical_switch_bulk_delete(session, ['ls1', 'unknown', 'ls3'], workers=2)
+        self.assertEqual([result[:3] for result in results],
+                         [('ls1', True, 'virtualwire-1'),
+                          ('unknown', False, 'Logical Switch unknown not found'),
+                          ('ls3', True, 'virtualwire-3')])
+        self.assertEqual(_deleted(session), ['virtualwire-1', 'virtualwire-3'])
+
+    def test_failed_delete_is_reported_per_item(self):
+        session = _session(FailingDeleteSession)
+        results = logical_switch_bulk_delete(session, ['ls1', 'ls2', 'ls3'], workers=3)
+        self.assertEqual([result[1] for result in results], [True, False, True])
+        self.assertIn('exited with status', results[1][2])
+
+    def test_index_is_reread_after_delete(self):
+        session = _session()
+        logical_switch_bulk_delete(session, ['ls1'])
+        logical_switch_bulk_delete(session, ['ls2'])
+        self.assertEqual(len(session.reads('logicalSwitchesGlobal')), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
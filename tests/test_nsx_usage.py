@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# coding=utf-8
+#
+# Copyright © 2015-2016 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the X11 (MIT) (the “License”) set forth below;
+#
+# you may not use this file except in compliance with the License. Unless required by applicable law or agreed to in
+# writing, software distributed under the License is distributed on an “AS IS” BASIS, without warranties or conditions
+# of any kind, EITHER EXPRESS OR IMPLIED. See the License for the specific language governing permissions and
+# limitations under the License. Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# "THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.”
+
+__author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pynsxv', 'library'))
+
+from nsx_usage import UsageSnapshot, esg_features_incremental
+from fake_nsx import FakeNsxSession
+
+FEATURES = ('loadBalancer', 'firewall', 'routing', 'ipsec', 'l2Vpn', 'sslvpnConfig')
+
+
+def _edge_body(enabled):
+    return {'edge': {'features': dict((feature, {'enabled': 'true' if feature in enabled else 'false'})
+                                      for feature in FEATURES)}}
+
+
+def _session(enabled_by_edge):
+    return FakeNsxSession(bodies={'nsxEdge': dict(((('edgeId', edge_id),), _edge_body(enabled))
+                                                  for edge_id, enabled in enabled_by_edge.items())})
+
+
+def _read_edges(session):
+    return sorted(uri['edgeId'] for method, resource, uri, query, body in session.calls
+                  if method == 'read' and resource == 'nsxEdge')
+
+
+class TestUsageSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_save_load_round_trip_per_manager(self):
+        features = ('esg1', 'edge-1', 'true', 'false', 'true', 'false', 'false', 'false')
+        UsageSnapshot('nsx-a', self.cache_dir).save_esg_features({'edge-1': ('3', features)})
+        self.assertEqual(UsageSnapshot('nsx-a', self.cache_dir).esg_features(), {'edge-1': ('3', features)})
+        self.assertEqual(UsageSnapshot('nsx-b', self.cache_dir).esg_features(), {})
+
+    def test_save_replaces_the_previous_snapshot(self):
+        snapshot = UsageSnapshot('nsx-a', self.cache_dir)
+        snapshot.save_esg_features({'edge-1': ('1', ('esg1', 'edge-1'))})
+        snapshot.save_esg_features({'edge-2': ('1', ('esg2', 'edge-2'))})
+        self.assertEqual(list(snapshot.esg_features()), ['edge-2'])
+
+
+class TestEsgFeaturesIncremental(unittest.TestCase):
+    edge_list = [('edge-1', 'esg1'), ('edge-2', 'esg2')]
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.snapshot = UsageSnapshot('nsx-a', self.cache_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_only_changed_and_new_edges_are_read(self):
+        session = _session({'edge-1': ['firewall'], 'edge-2': ['routing'], 'edge-3': []})
+        features, read = esg_features_incremental(session, self.edge_list, {'edge-1': '1', 'edge-2': '1'},
+                                                  self.snapshot, announce=False)
+        self.assertEqual(read, 2)
+        self.assertEqual(features[0], ('esg1', 'edge-1', 'false', 'true', 'false', 'false', 'false', 'false'))
+
+        session = _session({'edge-1': ['firewall', 'ipsec'], 'edge-2': [], 'edge-3': ['l2Vpn']})
+        edge_list = [('edge-1', 'esg1-renamed'), ('edge-2', 'esg2'), ('edge-3', 'esg3')]
+        features, read = esg_features_incremental(session, edge_list, {'edge-1': '1', 'edge-2': '2', 'edge-3': '1'},
+                                                  self.snapshot, announce=False)
+        self.assertEqual(read, 2)
+        self.assertEqual(_read_edges(session), ['edge-2', 'edge-3'])
+        self.assertEqual([feature[:3] for feature in features],
+                         [('esg1-renamed', 'edge-1', 'false'), ('esg2', 'edge-2', 'false'),
+                          ('esg3', 'edge-3', 'false')])
+        self.assertEqual(features[0][3], 'true')
+        self.assertEqual(features[1][4], 'false')
+        self.assertEqual(sorted(self.snapshot.esg_features()), ['edge-1', 'edge-2', 'edge-3'])
+
+    def test_unreadable_edges_are_not_saved(self):
+        session = _session({'edge-1': ['firewall']})
+        features, read = esg_features_incremental(session, self.edge_list, {'edge-1': '1', 'edge-2': '1'},
+                                                  self.snapshot, announce=False)
+        self.assertEqual(read, 2)
+        self.assertEqual(features[1], ('esg2', 'edge-2') + ('n/a',) * 6)
+        self.assertEqual(list(self.snapshot.esg_features()), ['edge-1'])
+
+        features, read = esg_features_incremental(_session({'edge-2': []}), self.edge_list,
+                                                  {'edge-1': '1', 'edge-2': '1'}, self.snapshot, announce=False)
+        self.assertEqual(read, 1)
+        self.assertEqual(features[1], ('esg2', 'edge-2') + ('false',) * 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# coding=utf-8
+#
+# Copyright © 2015-2016 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the X11 (MIT) (the “License”) set forth below;
+#
+# you may not use this file except in compliance with the License. Unless required by applicable law or agreed to in
+# writing, software distributed under the License is distributed on an “AS IS” BASIS, without warranties or conditions
+# of any kind, EITHER EXPRESS OR IMPLIED. See the License for the specific language governing permissions and
+# limitations under the License. Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# "THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.”
+
+__author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
+
+import os
+import sys
+import threading
+import unittest
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pynsxv', 'library'))
+
+from parallel import bounded_map, run_dag, fan_out, TaskExit, SkippedTask
+
+
+def _fail_with_exit(item):
+    if item == 'bad':
+        sys.exit(1)
+    return item
+
+
+class TimeoutTestCase(unittest.TestCase):
+    def run_bounded(self, func, timeout=20):
+        """
+        Runs func in a thread and fails the test if it does not return within timeout seconds
+        """
+        results = []
+        thread = threading.Thread(target=lambda: results.append(func()))
+        thread.daemon = True
+        thread.start()
+        thread.join(timeout)
+        self.assertFalse(thread.is_alive(), 'no result after {}s'.format(timeout))
+        return results[0]
+
+
+class TestExitingTasks(TimeoutTestCase):
+    def test_bounded_map_reports_exit(self):
+        results = self.run_bounded(lambda: bounded_map(_fail_with_exit, ['a', 'bad', 'c'], workers=2))
+        self.assertEqual([result[0] for result in results], ['a', None, 'c'])
+        self.assertIsNone(results[0][1])
+        self.assertIsInstance(results[1][1], TaskExit)
+        self.assertEqual(results[1][1].code, 1)
+
+    def test_run_dag_reports_exit_and_skips_dependents(self):
+        tasks = OrderedDict([('a', (lambda: _fail_with_exit('a'), [])),
+                             ('bad', (lambda: _fail_with_exit('bad'), [])),
+                             ('after_bad', (lambda: 'after_bad', ['bad']))])
+        results = self.run_bounded(lambda: run_dag(tasks, workers=2))
+        self.assertEqual(results['a'][0], 'a')
+        self.assertIsInstance(results['bad'][1], TaskExit)
+        self.assertIsInstance(results['after_bad'][1], SkippedTask)
+
+    def test_fan_out_without_timeout_reports_exit(self):
+        tasks = OrderedDict([('a', lambda: _fail_with_exit('a')), ('bad', lambda: _fail_with_exit('bad'))])
+        results = self.run_bounded(lambda: fan_out(tasks))
+        self.assertEqual(results['a'][0], 'a')
+        self.assertIsInstance(results['bad'][1], TaskExit)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# coding=utf-8
+#
+# Copyright © 2015-2016 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the X11 (MIT) (the “License”) set forth below;
+#
+# you may not use this file except in compliance with the License. Unless required by applicable law or agreed to in
+# writing, software distributed under the License is distributed on an “AS IS” BASIS, without warranties or conditions
+# of any kind, EITHER EXPRESS OR IMPLIED. See the License for the specific language governing permissions and
+# limitations under the License. Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# "THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.”
+
+__author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
+
+import copy
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pynsxv', 'library'))
+
+from ramlcache import RamlSpecCache, compile_constructor, load_nsx_client, body_template
+
+RAML = """#%RAML 0.8
+title: pynsxv test
+baseUri: https://{nsxmanager}/api
+/edges:
+  displayName: nsxEdges
+  post:
+    body:
+      application/xml:
+        example: |
+          <edge><name></name><vnics><vnic><index></index></vnic></vnics></edge>
+"""
+
+
+class TestCompileConstructor(unittest.TestCase):
+    TEMPLATE = OrderedDict([('edge', OrderedDict([('name', None), ('size', 'compact'), ('enabled', True),
+                                                  ('vnics', {'vnic': [{'index': 0, 'mtu': 1500L},
+                                                                      {'index': 1, 'ratio': 0.5}]}),
+                                                  ('description', u'édge')]))])
+
+    def test_copy_equals_deepcopy(self):
+        built = compile_constructor(self.TEMPLATE)()
+        self.assertEqual(built, copy.deepcopy(self.TEMPLATE))
+        self.assertIs(type(built), OrderedDict)
+        self.assertEqual(list(built['edge']), list(self.TEMPLATE['edge']))
+        self.assertIs(type(built['edge']['vnics']), dict)
+
+    def test_copies_are_independent(self):
+        constructor = compile_constructor(self.TEMPLATE)
+        first = constructor()
+        first['edge']['vnics']['vnic'][0]['index'] = 7
+        first['edge']['name'] = 'esg1'
+        self.assertEqual(constructor(), copy.deepcopy(self.TEMPLATE))
+        self.assertEqual(self.TEMPLATE['edge']['vnics']['vnic'][0]['index'], 0)
+
+    def test_other_types_fall_back_to_deepcopy(self):
+        template = {'edge': {'tags': set(['a']), 'pair': (1, 2)}}
+        constructor = compile_constructor(template)
+        built = constructor()
+        self.assertEqual(built, template)
+        built['edge']['tags'].add('b')
+        self.assertEqual(constructor(), template)
+
+
+class TestRamlSpecCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.directory, 'cache')
+        self.raml_file = os.path.join(self.directory, 'nsxvapi.raml')
+        self.write_raml(RAML)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_raml(self, content, mtime=1000000000):
+        with open(self.raml_file, 'w') as raml:
+            raml.write(content)
+        os.utime(self.raml_file, (mtime, mtime))
+
+    def test_cache_key_follows_content_and_mtime(self):
+        path = RamlSpecCache(self.raml_file, cache_dir=self.cache_dir).path
+        self.assertEqual(RamlSpecCache(self.raml_file, cache_dir=self.cache_dir).path, path)
+        self.write_raml(RAML + '\n')
+        self.assertNotEqual(RamlSpecCache(self.raml_file, cache_dir=self.cache_dir).path, path)
+        self.write_raml(RAML, mtime=1000000001)
+        self.assertNotEqual(RamlSpecCache(self.raml_file, cache_dir=self.cache_dir).path, path)
+
+    def test_parsed_spec_is_cached(self):
+        load_nsx_client(self.raml_file, 'nsxmanager.invalid', 'admin', 'password', cache_dir=self.cache_dir)
+        self.assertIsNotNone(RamlSpecCache(self.raml_file, cache_dir=self.cache_dir).spec)
+
+    def test_dirty_cache_is_only_written_by_save(self):
+        spec_cache = RamlSpecCache(self.raml_file, cache_dir=self.cache_dir)
+        spec_cache.spec = {'resources': []}
+        spec_cache.templates[('nsxEdges', 'create')] = {'edge': None}
+        spec_cache.mark_dirty()
+        self.assertFalse(os.path.exists(spec_cache.path))
+        spec_cache.save()
+        self.assertFalse(spec_cache.dirty)
+        self.assertEqual(RamlSpecCache(self.raml_file, cache_dir=self.cache_dir).templates,
+                         {('nsxEdges', 'create'): {'edge': None}})
+        os.remove(spec_cache.path)
+        spec_cache.save()
+        self.assertFalse(os.path.exists(spec_cache.path))
+
+    def test_body_template(self):
+        session = load_nsx_client(self.raml_file, 'nsxmanager.invalid', 'admin', 'password',
+                                  cache_dir=self.cache_dir)
+        template = body_template(session, 'nsxEdges', 'create')
+        self.assertEqual(template, session.extract_resource_body_example('nsxEdges', 'create'))
+        template['edge']['name'] = 'esg1'
+        self.assertIsNone(body_template(session, 'nsxEdges', 'create')['edge']['name'])
+        # template misses are written at exit, not on every miss
+        self.assertEqual(RamlSpecCache(self.raml_file, cache_dir=self.cache_dir).templates, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
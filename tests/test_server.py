@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# coding=utf-8
+#
+# Copyright © 2015-2016 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the X11 (MIT) (the “License”) set forth below;
+#
+# you may not use this file except in compliance with the License. Unless required by applicable law or agreed to in
+# writing, software distributed under the License is distributed on an “AS IS” BASIS, without warranties or conditions
+# of any kind, EITHER EXPRESS OR IMPLIED. See the License for the specific language governing permissions and
+# limitations under the License. Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# "THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN
+# AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.”
+
+__author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
+
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from StringIO import StringIO
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS_DIR, '..', 'pynsxv', 'library'))
+sys.path.insert(0, os.path.join(TESTS_DIR, '..', 'pynsxv'))
+
+from server import forward_command
+from cli import _server_socket
+
+SERVER_SCRIPT = """
+import os
+import sys
+sys.path.insert(0, {library!r})
+from server import CommandServer
+
+
+def run(argv):
+    print 'running', ' '.join(argv)
+    if argv[0] == 'exit':
+        sys.exit(int(argv[1]))
+    elif argv[0] == 'message':
+        sys.exit('failed on purpose')
+    elif argv[0] == 'raise':
+        raise ValueError('boom')
+    elif argv[0] == 'cwd':
+        print os.getcwd()
+
+CommandServer({socket!r}, run).serve_forever()
+"""
+
+
+class TestCommandServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.socket = os.path.join(cls.directory, 'pynsxv.sock')
+        script = SERVER_SCRIPT.format(library=os.path.join(TESTS_DIR, '..', 'pynsxv', 'library'), socket=cls.socket)
+        cls.server = subprocess.Popen([sys.executable, '-c', script])
+        deadline = time.time() + 20
+        while not os.path.exists(cls.socket) and time.time() < deadline:
+            time.sleep(0.05)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.terminate()
+        cls.server.wait()
+        shutil.rmtree(cls.directory)
+
+    def forward(self, argv):
+        saved_streams = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = StringIO(), StringIO()
+        try:
+            exit_code = forward_command(self.socket, argv)
+            return exit_code, sys.stdout.getvalue(), sys.stderr.getvalue()
+        finally:
+            sys.stdout, sys.stderr = saved_streams
+
+    def test_output_and_success(self):
+        self.assertEqual(self.forward(['list', 'esg']), (0, 'running list esg\n', ''))
+
+    def test_exit_code(self):
+        exit_code, out, err = self.forward(['exit', '3'])
+        self.assertEqual(exit_code, 3)
+
+    def test_exit_message(self):
+        exit_code, out, err = self.forward(['message'])
+        self.assertEqual(exit_code, 1)
+        self.assertIn('failed on purpose', err)
+
+    def test_exception(self):
+        exit_code, out, err = self.forward(['raise'])
+        self.assertEqual(exit_code, 1)
+        self.assertIn('ValueError: boom', err)
+
+    def test_command_runs_in_client_directory(self):
+        exit_code, out, err = self.forward(['cwd'])
+        self.assertEqual(out.splitlines()[-1], os.getcwd())
+
+    def test_missing_client_directory(self):
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(self.socket)
+        try:
+            client.sendall(json.dumps({'argv': ['list'], 'cwd': os.path.join(self.directory, 'removed')}) + '\n')
+            messages = [json.loads(line) for line in client.makefile('rb')]
+        finally:
+            client.close()
+        self.assertEqual(messages[-1], {'exit': 1})
+        self.assertIn('removed', ''.join(message['data'] for message in messages[:-1] if message['stream'] == 'err'))
+        self.assertEqual(self.forward(['list'])[0], 0)
+
+    def test_unreachable_server(self):
+        self.assertIsNone(forward_command(os.path.join(self.directory, 'missing.sock'), ['list']))
+
+
+class TestServerSocket(unittest.TestCase):
+    def test_server_option_is_removed(self):
+        self.assertEqual(_server_socket(['--server', '/run/pynsxv.sock', 'esg', 'list']),
+                         ('/run/pynsxv.sock', ['esg', 'list']))
+        self.assertEqual(_server_socket(['--server=/run/pynsxv.sock', '-i', 'nsx.ini', 'esg', 'list']),
+                         ('/run/pynsxv.sock', ['-i', 'nsx.ini', 'esg', 'list']))
+
+    def test_serve_runs_locally(self):
+        self.assertEqual(_server_socket(['--server', '/run/pynsxv.sock', '--site', 'a', 'serve', '-s', '/x']),
+                         (None, ['--server', '/run/pynsxv.sock', '--site', 'a', 'serve', '-s', '/x']))
+
+    def test_serve_as_a_value_is_forwarded(self):
+        self.assertEqual(_server_socket(['--server', '/s', 'esg', 'create', '-n', 'serve'])[0], '/s')
+        self.assertEqual(_server_socket(['--server', '/s', '-i', 'serve', 'esg', 'list'])[0], '/s')
+
+
+if __name__ == '__main__':
+    unittest.main()